@@ -0,0 +1,100 @@
+"""add contato_id to bot_clientes
+
+Revision ID: c4e6a8b0d2f1
+Revises: a1c3e5f7b9d2
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4e6a8b0d2f1"
+down_revision: Union[str, Sequence[str], None] = "a1c3e5f7b9d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Mesma regra de normalizar_contato_id() (message_unit_of_work): dígitos antes do '@',
+# ou a parte antes do '@' quando não há dígitos.
+CONTATO_ID_SQL = (
+    "COALESCE(NULLIF(regexp_replace(split_part(whatsapp_id, '@', 1), '[^0-9]', '', 'g'), ''), "
+    "btrim(split_part(whatsapp_id, '@', 1)))"
+)
+
+# Por contato_id, o cliente mais antigo sobrevive e absorve os demais
+RANKED_SQL = """
+    SELECT id, contato_id,
+           first_value(id) OVER (PARTITION BY contato_id ORDER BY created_at NULLS LAST, id) AS sobrevivente
+    FROM bot_clientes
+"""
+
+# Backfill e merge, em ordem. SQL comum ao PostgreSQL e ao SQLite (3.33+) para o teste da
+# migration rodar os mesmos statements; só o CONTATO_ID_SQL depende de funções do Postgres.
+MERGE_SQL = (
+    f"UPDATE bot_clientes SET contato_id = {CONTATO_ID_SQL}",
+    # Mensagens dos duplicados vão para o sobrevivente
+    f"""
+    WITH ranked AS ({RANKED_SQL})
+    UPDATE bot_mensagens AS m SET id_cliente = r.sobrevivente
+    FROM ranked AS r
+    WHERE m.id_cliente = r.id AND r.id <> r.sobrevivente
+    """,
+    # Nome vazio é preenchido pelo mais recente do grupo que tem nome
+    """
+    UPDATE bot_clientes SET nome = (
+        SELECT d.nome FROM bot_clientes AS d
+        WHERE d.contato_id = bot_clientes.contato_id AND COALESCE(d.nome, '') <> ''
+        ORDER BY d.created_at DESC NULLS LAST
+        LIMIT 1
+    )
+    WHERE COALESCE(nome, '') = ''
+    """,
+    # Oculto só se todas as linhas do grupo estavam ocultas
+    """
+    UPDATE bot_clientes AS c SET oculta = g.oculta
+    FROM (
+        SELECT contato_id, count(*) FILTER (WHERE NOT oculta) = 0 AS oculta
+        FROM bot_clientes GROUP BY contato_id HAVING count(*) > 1
+    ) AS g
+    WHERE c.contato_id = g.contato_id
+    """,
+    f"""
+    WITH ranked AS ({RANKED_SQL})
+    DELETE FROM bot_clientes
+    WHERE id IN (SELECT id FROM ranked WHERE id <> sobrevivente)
+    """,
+)
+
+
+def upgrade() -> None:
+    """Adiciona bot_clientes.contato_id (único), com backfill e merge dos contatos duplicados.
+
+    O mesmo contato podia estar gravado como número, @s.whatsapp.net e @lid em linhas
+    diferentes, cada uma com parte do histórico. As mensagens vão para o cliente mais
+    antigo do grupo; nome vazio é preenchido pelo mais recente dos demais; o contato só
+    fica oculto se todas as linhas estavam ocultas.
+    """
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("bot_clientes"):
+        return  # banco novo: init_db() cria a tabela já com a coluna
+    cols = [c["name"] for c in inspector.get_columns("bot_clientes")]
+    if "contato_id" in cols:
+        return
+
+    op.add_column("bot_clientes", sa.Column("contato_id", sa.String(length=50), nullable=True))
+    for sql in MERGE_SQL:
+        op.execute(sql)
+
+    op.alter_column("bot_clientes", "contato_id", nullable=False)
+    op.create_index(op.f("ix_bot_clientes_contato_id"), "bot_clientes", ["contato_id"], unique=True)
+
+
+def downgrade() -> None:
+    """Remove bot_clientes.contato_id. O merge dos contatos duplicados não é desfeito."""
+    op.drop_index(op.f("ix_bot_clientes_contato_id"), table_name="bot_clientes")
+    op.drop_column("bot_clientes", "contato_id")
@@ -0,0 +1,36 @@
+"""add (id_cliente, data_hora) index to bot_mensagens
+
+Revision ID: e5a7c9d1f3b4
+Revises: c4e6a8b0d2f1
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a7c9d1f3b4"
+down_revision: Union[str, Sequence[str], None] = "c4e6a8b0d2f1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = "ix_bot_mensagens_id_cliente_data_hora"
+
+
+def upgrade() -> None:
+    """Índice (id_cliente, data_hora): histórico recente e última mensagem do contato sem varrer a conversa."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("bot_mensagens"):
+        return  # banco novo: init_db() cria a tabela já com o índice
+    indexes = [i["name"] for i in inspector.get_indexes("bot_mensagens")]
+    if INDEX_NAME not in indexes:
+        op.create_index(INDEX_NAME, "bot_mensagens", ["id_cliente", "data_hora"], unique=False)
+
+
+def downgrade() -> None:
+    """Remove o índice (id_cliente, data_hora) de bot_mensagens."""
+    op.drop_index(INDEX_NAME, table_name="bot_mensagens")
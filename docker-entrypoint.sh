@@ -9,5 +9,6 @@ else
 fi
 
 echo "▶ Iniciando servidor FastAPI (uvicorn)..."
-exec uvicorn app.main:app --host 0.0.0.0 --port 8000
+# Workers compartilham o índice RAG via mmap (ver: python -m app.domain.services.rag_service memory)
+exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --workers "${UVICORN_WORKERS:-1}"
 
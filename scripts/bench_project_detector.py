@@ -0,0 +1,158 @@
+"""
+Benchmark do ProjectDetector: índice de trigramas vs laço aninhado com SequenceMatcher.
+
+Gera catálogos sintéticos de projetos (50, 500 e 5.000 markdowns em um diretório
+temporário) e mede, por query, a detecção original (projetos × keywords × palavras,
+com read_text a cada match) contra o ProjectDetector atual. Também reporta a taxa
+de concordância entre os dois (mesmo projeto detectado, ou nenhum) e as perdas da
+poda: queries em que o projeto do algoritmo original nem chegou a ser candidato.
+Divergências sem perda vêm da prioridade do match exato sobre o fuzzy.
+
+Uso:
+    python scripts/bench_project_detector.py
+    python scripts/bench_project_detector.py --sizes 50,500 --queries 300
+"""
+import sys
+import time
+import random
+import argparse
+import tempfile
+from difflib import SequenceMatcher
+from pathlib import Path
+
+# Garante que o pacote 'app' está no PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app.domain.services.rag_service import ProjectDetector
+
+_SILABAS = [
+    "ba", "ca", "da", "fa", "ga", "la", "ma", "na", "pa", "ra", "sa", "ta", "va",
+    "be", "ce", "de", "le", "me", "ne", "re", "se", "te", "bi", "ci", "di", "li",
+    "mi", "ni", "ri", "si", "ti", "bo", "co", "do", "lo", "mo", "no", "ro", "so", "to",
+]
+_FRASES = [
+    "me fala sobre o projeto {}",
+    "como foi feito o {}?",
+    "quais tecnologias você usou no {}",
+    "tem algum projeto parecido com {} no github",
+]
+_SEM_PROJETO = [
+    "qual sua experiência com java e spring boot?",
+    "você trabalha remoto?",
+    "me manda seu currículo",
+    "quais linguagens você domina",
+]
+
+
+def _palavra(rng: random.Random) -> str:
+    return "".join(rng.choice(_SILABAS) for _ in range(rng.randint(2, 4)))
+
+
+def _gerar_catalogo(directory: Path, n: int, rng: random.Random) -> list[str]:
+    nomes: set[str] = set()
+    while len(nomes) < n:
+        nomes.add("-".join(_palavra(rng) for _ in range(rng.randint(1, 3))))
+    for nome in nomes:
+        (directory / f"{nome}.md").write_text(f"# {nome}\n\n" + "Descrição do projeto. " * 200, encoding="utf-8")
+    return sorted(nomes)
+
+
+def _com_typo(texto: str, rng: random.Random) -> str:
+    pos = rng.randrange(len(texto))
+    return texto[:pos] + rng.choice("aeiou") + texto[pos + 1:]
+
+
+def _gerar_queries(nomes: list[str], n: int, rng: random.Random) -> list[str]:
+    queries = []
+    for i in range(n):
+        tipo = i % 3
+        if tipo == 2:
+            queries.append(rng.choice(_SEM_PROJETO))
+            continue
+        parte = rng.choice(rng.choice(nomes).split("-"))
+        mencao = parte if tipo == 0 else _com_typo(parte, rng)
+        queries.append(rng.choice(_FRASES).format(mencao))
+    return queries
+
+
+def _legacy_detect(detector: ProjectDetector, query: str):
+    """Algoritmo original: para cada projeto × keyword, substring e depois SequenceMatcher por palavra."""
+    query_lower = query.lower()
+    query_words = query_lower.split()
+    for nome, info in detector._cache.items():
+        matched = False
+        for kw in info["keywords"]:
+            if kw in query_lower:
+                matched = True
+                break
+            if len(kw) >= 4 and any(
+                len(word) >= 3 and SequenceMatcher(None, kw, word).ratio() >= 0.82 for word in query_words
+            ):
+                matched = True
+                break
+        if matched:
+            return f"--- Projeto: {nome} ---\n{info['path'].read_text(encoding='utf-8')}"
+    return None
+
+
+def _percentis(amostras: list[float]) -> str:
+    amostras = sorted(amostras)
+    p50 = amostras[len(amostras) // 2]
+    p99 = amostras[min(len(amostras) - 1, int(len(amostras) * 0.99))]
+    return f"p50={p50:8.3f}ms p99={p99:8.3f}ms"
+
+
+def _medir(fn, queries: list[str]) -> tuple[list[float], list]:
+    tempos, resultados = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        resultados.append(fn(q))
+        tempos.append((time.perf_counter() - t0) * 1000)
+    return tempos, resultados
+
+
+def _projeto(resultado) -> str | None:
+    return resultado.split("\n", 1)[0] if resultado else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do ProjectDetector")
+    parser.add_argument("--sizes", default="50,500,5000", help="Tamanhos de catálogo (padrão: 50,500,5000)")
+    parser.add_argument("--queries", type=int, default=150, help="Queries por tamanho (padrão: 150)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for size in [int(s) for s in args.sizes.split(",")]:
+        rng = random.Random(args.seed)
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = Path(tmp)
+            nomes = _gerar_catalogo(directory, size, rng)
+            queries = _gerar_queries(nomes, args.queries, rng)
+
+            detector = ProjectDetector(directory)
+            t0 = time.perf_counter()
+            detector.load()
+            load_ms = (time.perf_counter() - t0) * 1000
+
+            legacy_t, legacy_r = _medir(lambda q: _legacy_detect(detector, q), queries)
+            novo_t, novo_r = _medir(detector.detect, queries)
+
+            iguais = sum(_projeto(a) == _projeto(b) for a, b in zip(legacy_r, novo_r))
+            perdas = 0
+            for q, esperado in zip(queries, legacy_r):
+                if esperado is None:
+                    continue
+                q_lower = q.lower()
+                candidatos = detector._exact_matches(q_lower) + detector._fuzzy_matches(q_lower.split())
+                perdas += _projeto(esperado).removeprefix("--- Projeto: ").removesuffix(" ---") not in candidatos
+            detectados = sum(r is not None for r in novo_r)
+            print(
+                f"{size:>5} projetos | load {load_ms:7.1f}ms | legado {_percentis(legacy_t)} | "
+                f"trigramas {_percentis(novo_t)} | speedup p50 "
+                f"{sorted(legacy_t)[len(legacy_t) // 2] / max(sorted(novo_t)[len(novo_t) // 2], 1e-6):6.1f}x | "
+                f"concordância {iguais}/{len(queries)} | perdas da poda {perdas} | detectados {detectados}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark do pipeline de embeddings do build do RAG: sequencial vs lotes concorrentes.
+
+Por padrão usa um cliente Gemini simulado (latência fixa por requisição + custo por
+item), para medir o ganho do batching sem gastar cota da API. Com --gemini, usa a
+API real (requer GEMINI_API_KEY).
+
+Uso:
+    python scripts/bench_rag_embeddings.py
+    python scripts/bench_rag_embeddings.py --chunks 300 --batch-size 50 --concurrency 8
+    python scripts/bench_rag_embeddings.py --gemini --chunks 60
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+from types import SimpleNamespace
+
+# Garante que o pacote 'app' está no PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app.domain.services.rag_chunker import chunk_text
+from app.domain.services.rag_embedder import GeminiEmbedder, HashingEmbedder
+from app.domain.services.rag_service import PortfolioRAG
+
+
+class _SimulatedGeminiClient:
+    """Imita `client.models.embed_content` com latência de rede configurável."""
+
+    def __init__(self, rtt: float, per_item: float):
+        self._local = HashingEmbedder(dimension=768)
+        self.models = SimpleNamespace(embed_content=self._embed_content)
+        self.rtt = rtt
+        self.per_item = per_item
+
+    def _embed_content(self, model, contents, config=None):
+        items = contents if isinstance(contents, list) else [contents]
+        time.sleep(self.rtt + self.per_item * len(items))
+        matrix = self._local.embed_documents(items)
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=row.tolist()) for row in matrix])
+
+
+def _carregar_chunks(limite: int) -> list[str]:
+    """Usa o chunking real do PortfolioRAG sobre os markdowns do portfólio."""
+    rag = PortfolioRAG(embedder=HashingEmbedder())
+    chunks: list[str] = []
+    for md_file in sorted(rag.data_dir.glob("**/*.md")):
+        texto = rag._sanitize_markdown(md_file.read_text(encoding="utf-8"))
+        chunks.extend(chunk_text(texto, max_tokens=800, overlap_tokens=80))
+    if not chunks:
+        chunks = [f"chunk sintético {i} sobre Java, Spring Boot, Python e FAISS" for i in range(limite)]
+    while len(chunks) < limite:
+        chunks.extend(chunks)
+    return chunks[:limite]
+
+
+def _medir(nome: str, embedder: GeminiEmbedder, chunks: list[str]) -> float:
+    t0 = time.perf_counter()
+    matrix = embedder.embed_documents(chunks)
+    elapsed = time.perf_counter() - t0
+    rate = len(chunks) / elapsed
+    print(
+        f"{nome:<12} batch={embedder.batch_size:<4} concorrência={embedder.concurrency:<3} "
+        f"{len(chunks)} chunks em {elapsed:6.2f}s → {rate:8.1f} chunks/s (dim={matrix.shape[1]})"
+    )
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de embeddings do build do RAG")
+    parser.add_argument("--chunks", type=int, default=120, help="Quantidade de chunks (padrão: 120)")
+    parser.add_argument("--batch-size", type=int, default=32, help="Tamanho do lote no modo batched")
+    parser.add_argument("--concurrency", type=int, default=4, help="Lotes simultâneos no modo batched")
+    parser.add_argument("--rtt", type=float, default=0.15, help="Latência simulada por requisição (s)")
+    parser.add_argument("--per-item", type=float, default=0.002, help="Custo simulado por item (s)")
+    parser.add_argument("--gemini", action="store_true", help="Usa a API Gemini real em vez do simulador")
+    args = parser.parse_args()
+
+    chunks = _carregar_chunks(args.chunks)
+    client = None if args.gemini else _SimulatedGeminiClient(args.rtt, args.per_item)
+
+    sequencial = GeminiEmbedder(client=client, batch_size=1, concurrency=1)
+    batched = GeminiEmbedder(client=client, batch_size=args.batch_size, concurrency=args.concurrency)
+
+    print(f"Fonte: {'Gemini API' if args.gemini else f'simulador (rtt={args.rtt}s, item={args.per_item}s)'}")
+    rate_seq = _medir("sequencial", sequencial, chunks)
+    rate_batch = _medir("batched", batched, chunks)
+    print(f"Speedup: {rate_batch / rate_seq:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark do retrieval hierárquico (documentos → chunks) contra a busca flat em todos os chunks.
+
+Para cada escala do corpus (1×, 10×, 100×) e cada `top_docs` reporta:
+  - recall@k em relação à busca flat exata (o que o retrieval hierárquico deixa de achar)
+  - latência p50/p99 por query: flat (FAISS IndexFlatL2) × 2 estágios
+    (cosseno contra os centroides de documento + L2 exata nos chunks dos documentos escolhidos)
+  - chunks reranqueados por query no 2º estágio
+
+O corpus base imita o portfólio: ~95 documentos, ~8 chunks por documento, documentos
+agrupados em temas (a versão PT e EN de um projeto ficam no mesmo tema). Com `--store`,
+o corpus base são os vetores reais do índice e as escalas maiores são cópias dos
+documentos com ruído (mesma distribuição de tamanho de documento).
+
+Uso:
+    python scripts/bench_rag_hierarchical.py                         # sintético, 1×/10×/100×
+    python scripts/bench_rag_hierarchical.py --scales 1,10 --top-docs 4,8,16 --dim 3072
+    python scripts/bench_rag_hierarchical.py --store rag_index/v1/chunks
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+# Garante que o pacote 'app' está no PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app.domain.services.rag_chunk_store import ChunkStore
+from app.domain.services.rag_document_index import DocumentIndex, exact_rerank
+from app.domain.services.rag_index_engine import IndexEngineConfig, build_index
+
+
+def _normalizar(m: np.ndarray) -> np.ndarray:
+    return (m / np.linalg.norm(m, axis=-1, keepdims=True)).astype("float32")
+
+
+def _corpus_sintetico(n_docs: int, dim: int, rng: np.random.Generator) -> List[np.ndarray]:
+    """Lista de matrizes (chunks × dim), uma por documento: tema → documento → chunk."""
+    n_temas = max(4, n_docs // 4)
+    temas = _normalizar(rng.standard_normal((n_temas, dim)))
+    escala = 1 / np.sqrt(dim)
+    docs = []
+    for _ in range(n_docs):
+        centro = _normalizar(temas[rng.integers(n_temas)] + rng.standard_normal(dim) * 0.7 * escala)
+        n_chunks = 1 + rng.poisson(7)
+        docs.append(_normalizar(centro + rng.standard_normal((n_chunks, dim)) * 0.8 * escala))
+    return docs
+
+
+def _corpus_store(path: str) -> List[np.ndarray]:
+    store = ChunkStore.open(path)
+    vetores = _normalizar(np.array(store.vectors, dtype="float32"))
+    fontes = np.asarray(store.source_idx)
+    docs = [vetores[fontes == pos] for pos in range(len(store.sources)) if (fontes == pos).any()]
+    store.close()
+    return docs
+
+
+def _escalar(base: List[np.ndarray], fator: int, rng: np.random.Generator) -> List[np.ndarray]:
+    """Cópias com ruído dos documentos base até `fator` × o tamanho original."""
+    if fator <= 1:
+        return list(base)
+    escala = 0.5 / np.sqrt(base[0].shape[1])
+    docs = list(base)
+    for _ in range(fator - 1):
+        for doc in base:
+            deslocamento = rng.standard_normal(doc.shape[1]) * escala
+            docs.append(_normalizar(doc + deslocamento + rng.standard_normal(doc.shape) * escala * 0.5))
+    return docs
+
+
+def _queries(corpus: np.ndarray, n_queries: int, rng: np.random.Generator) -> np.ndarray:
+    """Queries = chunks do corpus com ruído (perguntas "sobre" algum trecho)."""
+    base = corpus[rng.integers(0, len(corpus), n_queries)]
+    return _normalizar(base + rng.standard_normal(base.shape) * (0.6 / np.sqrt(corpus.shape[1])))
+
+
+def _pct(latencias: List[float]):
+    return np.percentile(latencias, 50), np.percentile(latencias, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do retrieval hierárquico (documentos → chunks)")
+    parser.add_argument("--docs", type=int, default=95, help="Documentos do corpus sintético base (padrão: 95)")
+    parser.add_argument("--dim", type=int, default=768, help="Dimensão do corpus sintético (padrão: 768)")
+    parser.add_argument("--store", help="Diretório de um ChunkStore (corpus base com os vetores reais)")
+    parser.add_argument("--scales", default="1,10,100", help="Fatores de escala do corpus (padrão: 1,10,100)")
+    parser.add_argument("--top-docs", default="4,8,16", help="Documentos do 1º estágio a comparar")
+    parser.add_argument("--queries", type=int, default=200, help="Quantidade de queries (padrão: 200)")
+    parser.add_argument("--k", type=int, default=5, help="k do recall@k (padrão: 5)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.store:
+        base = _corpus_store(args.store)
+        origem = f"store {args.store}"
+    else:
+        base = _corpus_sintetico(args.docs, args.dim, rng)
+        origem = "sintético"
+    print(f"Corpus base {origem}: {len(base)} documentos, {sum(len(d) for d in base)} chunks × {base[0].shape[1]}d")
+
+    top_docs_list = [int(x) for x in args.top_docs.split(",")]
+    k_busca = args.k * 3  # mesmo over-fetch do retrieve()
+    for fator in (int(x) for x in args.scales.split(",")):
+        docs = _escalar(base, fator, rng)
+        corpus = np.concatenate(docs)
+        ids = np.arange(len(corpus), dtype="int64")
+        chunks, vetores, inicio = {}, {}, 0
+        for pos, doc in enumerate(docs):
+            for row in range(len(doc)):
+                chunks[inicio + row] = {"source": f"doc-{pos}.md"}
+                vetores[inicio + row] = corpus[inicio + row]
+            inicio += len(doc)
+
+        flat = build_index(IndexEngineConfig(engine="flat"), corpus, ids)
+        t0 = time.perf_counter()
+        documentos = DocumentIndex.build(chunks, vetores)
+        build_ms = (time.perf_counter() - t0) * 1000
+        del chunks, vetores
+        queries = _queries(corpus, args.queries, rng)
+
+        lat_flat, referencia = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            _, i = flat.search(q.reshape(1, -1), k_busca)
+            lat_flat.append((time.perf_counter() - t0) * 1000)
+            referencia.append(set(i[0][:args.k].tolist()))
+
+        p50, p99 = _pct(lat_flat)
+        print(
+            f"\n{fator:>4}× {len(docs):>6} docs {len(corpus):>7} chunks  (centroides em {build_ms:.0f}ms)\n"
+            f"      flat         recall@{args.k}= 1.000  p50={p50:7.3f}ms  p99={p99:7.3f}ms  chunks/query={len(corpus)}"
+        )
+        for top_docs in top_docs_list:
+            latencias, recalls, candidatos = [], [], []
+            for q, ref in zip(queries, referencia):
+                t0 = time.perf_counter()
+                cand = documentos.candidate_ids(documentos.search(q, top_docs))
+                _, achados = exact_rerank(corpus[cand], cand, q, k_busca)
+                latencias.append((time.perf_counter() - t0) * 1000)
+                recalls.append(len(ref & set(achados[:args.k].tolist())) / args.k)
+                candidatos.append(len(cand))
+            p50, p99 = _pct(latencias)
+            print(
+                f"      top_docs={top_docs:<3} recall@{args.k}={np.mean(recalls):6.3f}  "
+                f"p50={p50:7.3f}ms  p99={p99:7.3f}ms  chunks/query={np.mean(candidatos):.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark das engines de índice FAISS do RAG: recall@k vs Flat, latência e memória.
+
+Para cada engine (flat, hnsw, ivf_sq8, ivf_pq) reporta:
+  - recall@k em relação à busca exata (Flat)
+  - latência p50/p99 de busca de uma query (como no retrieve())
+  - bytes por vetor (índice serializado / n)
+  - threshold L2 calibrado: menor distância que ainda aceita 99% dos chunks que
+    o Flat aceitaria com o threshold do embedder (`--max-l2`) — a diferença para ele é a
+    folga da engine em ENGINE_L2_SLACK.
+
+Uso:
+    python scripts/bench_rag_index_engines.py                       # corpus sintético
+    python scripts/bench_rag_index_engines.py --n 20000 --dim 768
+    python scripts/bench_rag_index_engines.py --store rag_index/v1/chunks  # vetores reais de uma versão do índice
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Garante que o pacote 'app' está no PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app.domain.services.rag_chunk_store import ChunkStore
+from app.domain.services.rag_index_engine import ENGINES, IndexEngineConfig, build_index, index_nbytes
+from app.domain.services.rag_embedder import GeminiEmbedder
+
+
+def _normalizar(m: np.ndarray) -> np.ndarray:
+    return (m / np.linalg.norm(m, axis=1, keepdims=True)).astype("float32")
+
+
+def _corpus_sintetico(n: int, dim: int, seed: int) -> np.ndarray:
+    """Vetores normalizados agrupados em tópicos (como chunks de poucos documentos)."""
+    rng = np.random.default_rng(seed)
+    n_topicos = max(8, n // 50)
+    centros = _normalizar(rng.standard_normal((n_topicos, dim)))
+    topico = rng.integers(0, n_topicos, n)
+    ruido = rng.standard_normal((n, dim)) * (0.9 / np.sqrt(dim))
+    return _normalizar(centros[topico] + ruido)
+
+
+def _queries(corpus: np.ndarray, n_queries: int, seed: int) -> np.ndarray:
+    """Queries = chunks do corpus com ruído (perguntas "sobre" algum trecho)."""
+    rng = np.random.default_rng(seed + 1)
+    base = corpus[rng.integers(0, len(corpus), n_queries)]
+    ruido = rng.standard_normal(base.shape) * (0.6 / np.sqrt(corpus.shape[1]))
+    return _normalizar(base + ruido)
+
+
+def _bench_engine(engine: str, corpus: np.ndarray, queries: np.ndarray, k: int, args, flat_ref):
+    config = IndexEngineConfig(
+        engine=engine,
+        hnsw_m=args.hnsw_m,
+        hnsw_ef_search=args.ef_search,
+        ivf_nlist=args.nlist,
+        ivf_nprobe=args.nprobe,
+        pq_m=args.pq_m,
+    )
+    ids = np.arange(len(corpus), dtype="int64")
+    t0 = time.perf_counter()
+    index = build_index(config, corpus, ids)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    k_busca = k * 3  # mesmo over-fetch do retrieve()
+    latencias = []
+    distancias, indices = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        d, i = index.search(q.reshape(1, -1), k_busca)
+        latencias.append((time.perf_counter() - t0) * 1000)
+        distancias.append(d[0])
+        indices.append(i[0])
+    distancias = np.array(distancias)
+    indices = np.array(indices)
+
+    if flat_ref is None:
+        flat_ref = (distancias, indices)
+    flat_d, flat_i = flat_ref
+
+    recall = np.mean([len(set(indices[q, :k]) & set(flat_i[q, :k])) / k for q in range(len(queries))])
+
+    # Distâncias reportadas pela engine para os chunks que o Flat aceitaria pelo threshold
+    aceitas = []
+    for q in range(len(queries)):
+        aceitos_flat = {int(i) for i, d in zip(flat_i[q], flat_d[q]) if d <= args.max_l2}
+        aceitas.extend(float(d) for i, d in zip(indices[q], distancias[q]) if int(i) in aceitos_flat)
+    threshold = float(np.percentile(aceitas, 99)) if aceitas else float("nan")
+
+    print(
+        f"{engine:<8} recall@{k}={recall:6.3f}  p50={np.percentile(latencias, 50):7.3f}ms  "
+        f"p99={np.percentile(latencias, 99):7.3f}ms  bytes/vetor={index_nbytes(index) / len(corpus):8.1f}  "
+        f"build={build_ms:8.0f}ms  threshold_calibrado={threshold:.3f}"
+    )
+    return flat_ref
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das engines FAISS do RAG")
+    parser.add_argument("--n", type=int, default=5000, help="Vetores no corpus sintético (padrão: 5000)")
+    parser.add_argument("--dim", type=int, default=256, help="Dimensão do corpus sintético (padrão: 256)")
+    parser.add_argument("--queries", type=int, default=200, help="Quantidade de queries (padrão: 200)")
+    parser.add_argument("--k", type=int, default=5, help="k do recall@k (padrão: 5)")
+    parser.add_argument("--store", help="Diretório de um ChunkStore (usa os vetores reais do índice)")
+    parser.add_argument("--engines", default=",".join(ENGINES), help="Engines separadas por vírgula")
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--nlist", type=int, default=64)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--pq-m", type=int, default=32)
+    parser.add_argument(
+        "--max-l2",
+        type=float,
+        default=GeminiEmbedder.DEFAULT_MAX_L2_DISTANCE,
+        help=f"Threshold L2 do embedder no Flat (padrão: {GeminiEmbedder.DEFAULT_MAX_L2_DISTANCE})",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.store:
+        store = ChunkStore.open(args.store)
+        corpus = np.array(store.vectors, dtype="float32")
+        store.close()
+        origem = f"store {args.store}"
+    else:
+        corpus = _corpus_sintetico(args.n, args.dim, args.seed)
+        origem = "sintético"
+    queries = _queries(corpus, args.queries, args.seed)
+    print(f"Corpus {origem}: {corpus.shape[0]} vetores × {corpus.shape[1]}d, {len(queries)} queries")
+
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    # Flat sempre primeiro: é a referência de recall e de threshold
+    flat_ref = _bench_engine("flat", corpus, queries, args.k, args, None)
+    for engine in engines:
+        if engine != "flat":
+            _bench_engine(engine, corpus, queries, args.k, args, flat_ref)
+
+
+if __name__ == "__main__":
+    main()
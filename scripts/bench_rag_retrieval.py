@@ -0,0 +1,282 @@
+"""
+Benchmark de retrieval do PortfolioRAG contra o golden set (scripts/rag_golden_queries.json).
+
+Roda o pipeline real — roteamento de intenção, BM25, FAISS, RRF, threshold L2, fallback —
+sobre o portfólio e, para cada pergunta do golden set, compara as fontes do contexto
+com as fontes esperadas. Reporta:
+  - latência p50/p95 do retrieve_smart() (cache de query limpo a cada rodada)
+  - recall@k: fração dos documentos esperados entre as k primeiras fontes do contexto
+    (X.md e X-english.md contam como o mesmo documento)
+  - taxa de fallback e distribuição dos caminhos (lexical | hybrid | vector | fallback)
+  - tokens de contexto por query
+
+Embedders:
+  - hashing (padrão): HashingEmbedder local e determinístico; o índice é construído num
+    diretório temporário a cada execução. Compara mudanças de pipeline, não de modelo.
+  - gemini: usa o índice já publicado (--index-dir, padrão settings.rag_index_dir; só os
+    chunks novos vão à API) e grava os vetores das perguntas em --query-vectors, para as
+    rodadas seguintes não chamarem a API.
+
+As settings de RAG valem normalmente (RAG_INDEX_ENGINE, RAG_CHUNK_MAX_TOKENS, RAG_HYBRID_ENABLED...),
+então comparar duas configurações é rodar o script duas vezes com --output e diferenciar os JSONs.
+
+Uso:
+    python scripts/bench_rag_retrieval.py
+    python scripts/bench_rag_retrieval.py --k 3 --repeat 5 --output bench-flat.json
+    RAG_INDEX_ENGINE=hnsw python scripts/bench_rag_retrieval.py --output bench-hnsw.json
+    python scripts/bench_rag_retrieval.py --max-l2 1.0 --max-tokens 1500
+    python scripts/bench_rag_retrieval.py --embedder gemini --query-vectors rag_bench_query_vectors.npz
+"""
+import sys
+import json
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Garante que o pacote 'app' está no PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app.domain.services.rag_embedder import Embedder, HashingEmbedder, build_default_embedder
+from app.domain.services.rag_service import PortfolioRAG
+from app.infrastructure.config.settings import settings
+
+RAIZ = Path(__file__).resolve().parents[1]
+GOLDEN_PADRAO = RAIZ / "scripts" / "rag_golden_queries.json"
+DATA_DIR_PADRAO = RAIZ / "certificados-wesley" / "portfolio-content"
+
+
+class _QueryVectorsEmArquivo:
+    """
+    Embedder que serve os vetores de query de um .npz e só chama o embedder real para as
+    perguntas que faltam (gravadas em `salvar()`). Documentos vão direto ao embedder real.
+    """
+
+    def __init__(self, embedder: Embedder, path: Path):
+        self.embedder = embedder
+        self.model_name = embedder.model_name
+        self.max_l2_distance = embedder.max_l2_distance
+        self.path = path
+        self.chamadas_api = 0
+        self._vetores: Dict[str, np.ndarray] = {}
+        self._alterado = False
+        if path.exists():
+            with np.load(path, allow_pickle=False) as data:
+                if str(data["model"]) == self.model_name:
+                    self._vetores = dict(zip(data["queries"].tolist(), data["vectors"]))
+
+    def embed_documents(self, texts: Sequence[str]) -> np.ndarray:
+        return self.embedder.embed_documents(texts)
+
+    def embed_queries_sync(self, texts: Sequence[str]) -> np.ndarray:
+        return self.embedder.embed_queries_sync(texts)
+
+    async def embed_query(self, text: str) -> np.ndarray:
+        return (await self.embed_queries([text]))[0]
+
+    async def embed_queries(self, texts: Sequence[str]) -> np.ndarray:
+        faltando = [t for t in dict.fromkeys(texts) if t not in self._vetores]
+        if faltando:
+            self.chamadas_api += 1
+            self._vetores.update(zip(faltando, await self.embedder.embed_queries(faltando)))
+            self._alterado = True
+        return np.stack([self._vetores[t] for t in texts]).astype("float32")
+
+    def salvar(self) -> None:
+        if not self._alterado:
+            return
+        queries = list(self._vetores)
+        with open(self.path, "wb") as f:
+            np.savez(
+                f,
+                model=np.array(self.model_name),
+                queries=np.array(queries, dtype=str),
+                vectors=np.stack([self._vetores[q] for q in queries]).astype("float32"),
+            )
+
+
+def _documento(fonte: str) -> str:
+    """Identidade do documento sem o idioma: "projects/x-english.md" → "projects/x"."""
+    raiz = fonte.rsplit(".", 1)[0].lower()
+    return raiz[: -len("-english")] if raiz.endswith("-english") else raiz
+
+
+def _recall(fontes: List[str], esperadas: List[str], k: int) -> float:
+    esperados = {_documento(f) for f in esperadas}
+    achados = {_documento(f) for f in fontes[:k]}
+    return len(esperados & achados) / len(esperados)
+
+
+def _pct(valores: List[float], p: float) -> float:
+    return round(float(np.percentile(valores, p)), 3) if valores else 0.0
+
+
+async def _rodar(
+    rag: PortfolioRAG, golden: List[Dict], k: int, repeat: int, max_tokens: Optional[int]
+) -> Tuple[List[Dict], List[float]]:
+    """Resultado por pergunta e todas as latências (ms) das `repeat` rodadas."""
+    resultados = []
+    latencias: Dict[str, List[float]] = {item["id"]: [] for item in golden}
+    for _ in range(repeat):
+        # Cada rodada paga o embedding da query, como uma mensagem nova
+        rag.query_cache.clear()
+        traces: Dict[str, Dict] = {}
+        for item in golden:
+            trace: Dict = {}
+            t0 = time.perf_counter()
+            await rag.retrieve_smart(item["query"], max_tokens=max_tokens, trace=trace)
+            latencias[item["id"]].append((time.perf_counter() - t0) * 1000)
+            traces[item["id"]] = trace
+
+    # Retrieval é determinístico: fontes/tokens da última rodada valem para todas
+    for item in golden:
+        trace = traces[item["id"]]
+        fontes = trace.get("sources", [])
+        resultados.append({
+            "id": item["id"],
+            "lang": item.get("lang"),
+            "query": item["query"],
+            "intent": trace.get("intent"),
+            "intent_origin": trace.get("intent_origin"),
+            "mode": trace.get("mode"),
+            "recall": round(_recall(fontes, item["expected_sources"], k), 3),
+            "tokens": trace.get("tokens", 0),
+            "latency_ms": _pct(latencias[item["id"]], 50),
+            "sources": fontes,
+            "expected_sources": item["expected_sources"],
+        })
+    return resultados, [lat for valores in latencias.values() for lat in valores]
+
+
+def _resumo(resultados: List[Dict], latencias: List[float], k: int) -> Dict:
+    modos = Counter(r["mode"] for r in resultados)
+    tokens = [r["tokens"] for r in resultados]
+    por_idioma = {}
+    for lang in sorted({r["lang"] for r in resultados if r["lang"]}):
+        recalls = [r["recall"] for r in resultados if r["lang"] == lang]
+        por_idioma[lang] = round(float(np.mean(recalls)), 3)
+    return {
+        "queries": len(resultados),
+        "k": k,
+        "latency_ms": {"p50": _pct(latencias, 50), "p95": _pct(latencias, 95), "max": _pct(latencias, 100)},
+        f"recall@{k}": round(float(np.mean([r["recall"] for r in resultados])), 3),
+        f"recall@{k}_by_lang": por_idioma,
+        "fallback_rate": round(modos.get("fallback", 0) / len(resultados), 3),
+        "modes": dict(modos),
+        "context_tokens": {"mean": round(float(np.mean(tokens)), 1), "p50": _pct(tokens, 50), "p95": _pct(tokens, 95)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de retrieval do RAG contra o golden set")
+    parser.add_argument("--golden", default=str(GOLDEN_PADRAO), help="Arquivo do golden set (JSON)")
+    parser.add_argument("--data-dir", default=str(DATA_DIR_PADRAO), help="Conteúdo do portfólio (padrão: o do repositório)")
+    parser.add_argument("--embedder", choices=("hashing", "gemini"), default="hashing")
+    parser.add_argument("--dim", type=int, default=256, help="Dimensão do HashingEmbedder (padrão: 256)")
+    parser.add_argument("--index-dir", help="Índice a usar/atualizar (padrão: temporário no hashing, settings no gemini)")
+    parser.add_argument("--query-vectors", default="rag_bench_query_vectors.npz", help="Cache dos vetores das perguntas (gemini)")
+    parser.add_argument("--k", type=int, default=5, help="k do recall@k (padrão: 5)")
+    parser.add_argument("--repeat", type=int, default=3, help="Rodadas sobre o golden set (padrão: 3)")
+    parser.add_argument("--max-tokens", type=int, default=None, help="Orçamento de tokens do contexto")
+    parser.add_argument("--max-l2", type=float, default=None, help="Sobrescreve o threshold L2 da engine")
+    parser.add_argument("--output", help="Grava o relatório JSON neste arquivo ('-' para stdout)")
+    parser.add_argument("--verbose", action="store_true", help="Logs do PortfolioRAG em nível INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(levelname)s: %(name)s - %(message)s")
+    golden = json.loads(Path(args.golden).read_text(encoding="utf-8"))["queries"]
+    if not Path(args.data_dir).is_dir():
+        print(f"❌ Diretório do portfólio não encontrado: {args.data_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    temporario = None
+    if args.embedder == "hashing":
+        embedder = HashingEmbedder(dimension=args.dim)
+        index_dir = args.index_dir or (temporario := tempfile.mkdtemp(prefix="rag_bench_"))
+    else:
+        embedder = _QueryVectorsEmArquivo(build_default_embedder(), Path(args.query_vectors))
+        index_dir = args.index_dir or settings.rag_index_dir
+
+    try:
+        rag = PortfolioRAG(args.data_dir, embedder=embedder, index_dir=index_dir)
+        t0 = time.perf_counter()
+        rag.load()
+        rag.reindex()
+        build_s = round(time.perf_counter() - t0, 2)
+        if not rag.is_ready:
+            # Índice vazio: o retrieve() cairia no fallback e o relatório mediria só ele
+            print(f"❌ Índice vazio após o reindex de {args.data_dir}", file=sys.stderr)
+            sys.exit(1)
+        if args.max_l2 is not None:
+            rag.max_l2_distance = args.max_l2
+
+        resultados, latencias = asyncio.run(_rodar(rag, golden, args.k, args.repeat, args.max_tokens))
+        relatorio_indice = rag.index_report()
+    finally:
+        if temporario:
+            shutil.rmtree(temporario, ignore_errors=True)
+    if isinstance(embedder, _QueryVectorsEmArquivo):
+        embedder.salvar()
+
+    relatorio = {
+        "config": {
+            "embedder": embedder.model_name,
+            "engine": rag.engine_config.to_dict(),
+            "max_l2_distance": rag.max_l2_distance,
+            "max_tokens": args.max_tokens,
+            "repeat": args.repeat,
+            "chunk_max_tokens": settings.rag_chunk_max_tokens,
+            "chunk_overlap_tokens": settings.rag_chunk_overlap_tokens,
+            "hybrid": settings.rag_hybrid_enabled,
+            "hierarchical": settings.rag_hierarchical_enabled,
+            "intent_routing": settings.rag_intent_routing_enabled,
+            "dedup": rag.dedup_config.to_dict(),
+        },
+        "index": {
+            "version": relatorio_indice.get("version"),
+            "chunks": relatorio_indice.get("chunks"),
+            "duplicates_collapsed": relatorio_indice.get("duplicates_collapsed"),
+            "build_seconds": build_s,
+        },
+        "summary": _resumo(resultados, latencias, args.k),
+        "queries": resultados,
+    }
+
+    if isinstance(embedder, _QueryVectorsEmArquivo):
+        relatorio["config"]["query_embedding_calls"] = embedder.chamadas_api
+    if args.output == "-":
+        print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+        return
+
+    resumo = relatorio["summary"]
+    print(
+        f"{resumo['queries']} queries × {args.repeat} rodadas  ({embedder.model_name}, engine={rag.engine_config.engine}, "
+        f"max_l2={rag.max_l2_distance})"
+    )
+    print(f"{'id':<22} {'lang':<4} {'intent':<18} {'modo':<9} {'recall':>6} {'tokens':>7} {'p50 ms':>8}")
+    for r in resultados:
+        print(
+            f"{r['id']:<22} {r['lang'] or '-':<4} {r['intent'] or '-':<18} {r['mode'] or '-':<9} "
+            f"{r['recall']:>6.2f} {r['tokens']:>7} {r['latency_ms']:>8.3f}"
+        )
+    print(
+        f"\nrecall@{args.k}={resumo[f'recall@{args.k}']:.3f} {resumo[f'recall@{args.k}_by_lang']}  "
+        f"fallback={resumo['fallback_rate']:.1%}  modos={resumo['modes']}\n"
+        f"latência p50={resumo['latency_ms']['p50']:.3f}ms p95={resumo['latency_ms']['p95']:.3f}ms  "
+        f"tokens/query média={resumo['context_tokens']['mean']:.0f} p95={resumo['context_tokens']['p95']:.0f}"
+    )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(relatorio, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"Relatório gravado em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark de dimensão de saída × precisão de armazenamento dos embeddings do RAG.
+
+Para cada dimensão (RAG_EMBED_DIMENSIONS) e precisão (RAG_VECTOR_STORAGE) reporta:
+  - recall@k em relação à referência: dimensão cheia, float32, busca exata
+  - latência p50/p99 de busca de uma query (como no retrieve())
+  - bytes por chunk: código no índice + vetor persistido no ChunkStore
+
+Dimensões reduzidas são simuladas como a API faz (Matryoshka): os primeiros d
+componentes do vetor, re-normalizados. Com o corpus sintético (ruído isotrópico)
+a perda por dimensão é pessimista — o gemini-embedding-001 concentra a informação
+nas primeiras dimensões. Para decidir, rode com os vetores reais (`--store`).
+
+Uso:
+    python scripts/bench_rag_vector_storage.py                                   # corpus sintético
+    python scripts/bench_rag_vector_storage.py --store rag_index/v1/chunks --dims 3072,1536,768
+    python scripts/bench_rag_vector_storage.py --engine hnsw --storages float32,sq8
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Garante que o pacote 'app' está no PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app.domain.services.rag_chunk_store import ChunkStore
+from app.domain.services.rag_index_engine import STORAGES, IndexEngineConfig, build_index, index_nbytes
+
+
+def _normalizar(m: np.ndarray) -> np.ndarray:
+    return (m / np.linalg.norm(m, axis=1, keepdims=True)).astype("float32")
+
+
+def _corpus_sintetico(n: int, dim: int, seed: int) -> np.ndarray:
+    """Vetores normalizados agrupados em tópicos (como chunks de poucos documentos)."""
+    rng = np.random.default_rng(seed)
+    n_topicos = max(8, n // 50)
+    centros = _normalizar(rng.standard_normal((n_topicos, dim)))
+    topico = rng.integers(0, n_topicos, n)
+    ruido = rng.standard_normal((n, dim)) * (0.9 / np.sqrt(dim))
+    return _normalizar(centros[topico] + ruido)
+
+
+def _queries(corpus: np.ndarray, n_queries: int, seed: int) -> np.ndarray:
+    """Queries = chunks do corpus com ruído (perguntas "sobre" algum trecho)."""
+    rng = np.random.default_rng(seed + 1)
+    base = corpus[rng.integers(0, len(corpus), n_queries)]
+    ruido = rng.standard_normal(base.shape) * (0.6 / np.sqrt(corpus.shape[1]))
+    return _normalizar(base + ruido)
+
+
+def _buscar(index, queries: np.ndarray, k: int):
+    latencias, resultados = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        _, i = index.search(q.reshape(1, -1), k)
+        latencias.append((time.perf_counter() - t0) * 1000)
+        resultados.append(i[0])
+    return np.array(latencias), np.array(resultados)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de dimensão × precisão dos embeddings do RAG")
+    parser.add_argument("--n", type=int, default=5000, help="Vetores no corpus sintético (padrão: 5000)")
+    parser.add_argument("--dim", type=int, default=3072, help="Dimensão do corpus sintético (padrão: 3072)")
+    parser.add_argument("--queries", type=int, default=200, help="Quantidade de queries (padrão: 200)")
+    parser.add_argument("--k", type=int, default=5, help="k do recall@k (padrão: 5)")
+    parser.add_argument("--store", help="Diretório de um ChunkStore (usa os vetores reais do índice)")
+    parser.add_argument("--dims", default="3072,1536,768,256", help="Dimensões de saída a comparar")
+    parser.add_argument("--storages", default=",".join(STORAGES), help="Precisões a comparar")
+    parser.add_argument("--engine", default="flat", choices=("flat", "hnsw"), help="Engine do índice")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.store:
+        store = ChunkStore.open(args.store)
+        corpus = _normalizar(np.array(store.vectors, dtype="float32"))
+        store.close()
+        origem = f"store {args.store}"
+    else:
+        corpus = _corpus_sintetico(args.n, args.dim, args.seed)
+        origem = "sintético"
+    queries = _queries(corpus, args.queries, args.seed)
+    full_dim = corpus.shape[1]
+    print(f"Corpus {origem}: {corpus.shape[0]} vetores × {full_dim}d, {len(queries)} queries, engine={args.engine}")
+
+    ids = np.arange(len(corpus), dtype="int64")
+    # Referência: dimensão cheia, float32, busca exata
+    referencia = build_index(IndexEngineConfig(engine="flat"), corpus, ids)
+    _, ref_i = _buscar(referencia, queries, args.k)
+
+    dims = [d for d in (int(x) for x in args.dims.split(",")) if d <= full_dim]
+    storages = [s.strip() for s in args.storages.split(",") if s.strip()]
+    for dim in dims:
+        corpus_d = _normalizar(corpus[:, :dim])
+        queries_d = _normalizar(queries[:, :dim])
+        for storage in storages:
+            config = IndexEngineConfig(engine=args.engine, storage=storage)
+            index = build_index(config, corpus_d, ids)
+            latencias, resultados = _buscar(index, queries_d, args.k * 3)  # mesmo over-fetch do retrieve()
+            recall = np.mean([
+                len(set(resultados[q, :args.k]) & set(ref_i[q])) / args.k for q in range(len(queries))
+            ])
+            bytes_indice = index_nbytes(index) / len(corpus)
+            bytes_store = dim * np.dtype(config.vector_dtype).itemsize
+            print(
+                f"{dim:>5}d {storage:<8} recall@{args.k}={recall:6.3f}  "
+                f"p50={np.percentile(latencias, 50):7.3f}ms  p99={np.percentile(latencias, 99):7.3f}ms  "
+                f"bytes/chunk={bytes_indice + bytes_store:8.0f} (índice {bytes_indice:6.0f} + store {bytes_store:5d})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Política de acesso por instância (blocklist, allowlist e estado da IA) em memória.
+
+O webhook consultava o banco a cada mensagem — bloqueado? tem allowlist? está na
+allowlist? IA ativa para o chat? — até cinco sessões antes de qualquer trabalho útil.
+Agora cada instância tem um snapshot imutável carregado numa sessão (duas consultas) e
+as checagens viram lookups em set/dict.
+
+Quem grava `bot_allow_block` ou `bot_config` (painel, comandos /ia) chama `invalidate()`
+e o próximo acesso recarrega. Com vários workers do uvicorn (`validar_versao`) a
+invalidação só alcança o processo que fez a escrita; por isso cada `get()` confere a
+versão das duas tabelas da instância (contagem e `max(updated_at)`, numa consulta sobre
+os índices de `instancia`) e recarrega se mudou — um bloqueio ou IA desligada vale na
+próxima mensagem em qualquer worker, não depois do TTL. A contagem pega as remoções
+(reset de override, item tirado da lista), que não mexem no `max(updated_at)`.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, FrozenSet, Mapping, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from app.domain.entities.models import AllowBlockEntry, BotConfig
+from app.infrastructure.database.session import async_session
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AccessPolicy:
+    """Snapshot da política de uma instância. Trocado inteiro na recarga, nunca alterado."""
+
+    blocked: FrozenSet[str]
+    allowed: FrozenSet[str]
+    ia_global: bool
+    ia_por_chat: Mapping[str, bool]
+
+    def is_blocked(self, numero: str) -> bool:
+        return numero in self.blocked
+
+    def is_allowed(self, numero: str) -> bool:
+        """Sem allowlist configurada, todos passam."""
+        return not self.allowed or numero in self.allowed
+
+    def ia_ativa_para(self, chat_jid: Optional[str]) -> bool:
+        """Prioridade: config individual > config global > padrão True."""
+        if chat_jid and chat_jid in self.ia_por_chat:
+            return self.ia_por_chat[chat_jid]
+        return self.ia_global
+
+
+# Versão da política no banco: (linhas, max(updated_at)) de bot_allow_block e de bot_config
+PolicyVersion = Tuple[int, Optional[datetime], int, Optional[datetime]]
+
+
+class AccessPolicyService:
+    """Cache dos snapshots de `AccessPolicy` por instância (com single-flight na recarga)."""
+
+    def __init__(self, ttl: float, validar_versao: bool = False):
+        self.ttl = ttl
+        self.validar_versao = validar_versao
+        self._policies: Dict[str, Tuple[float, AccessPolicy, PolicyVersion]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _fresh(self, instancia: str) -> Optional[AccessPolicy]:
+        entry = self._policies.get(instancia)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    async def get(self, instancia: str) -> AccessPolicy:
+        """Política da instância; recarrega do banco se não houver snapshot válido (ou atual)."""
+        policy = self._fresh(instancia)
+        if policy is not None and self.validar_versao:
+            versao = self._policies[instancia][2]
+            async with async_session() as session:
+                atual = await self._version(session, instancia)
+            if atual != versao:
+                # Outro worker gravou; só descarta se ninguém recarregou durante a consulta
+                entry = self._policies.get(instancia)
+                if entry is not None and entry[2] == versao:
+                    del self._policies[instancia]
+                policy = None
+        if policy is not None:
+            return policy
+        lock = self._locks.setdefault(instancia, asyncio.Lock())
+        async with lock:
+            # Quem esperou o lock aproveita a recarga feita por outra mensagem
+            policy = self._fresh(instancia)
+            if policy is None:
+                policy, versao = await self._load(instancia)
+                self._policies[instancia] = (time.monotonic(), policy, versao)
+            return policy
+
+    def invalidate(self, instancia: Optional[str] = None) -> None:
+        """Descarta o snapshot da instância (ou de todas): o próximo `get()` lê o banco."""
+        if instancia is None:
+            self._policies.clear()
+        else:
+            self._policies.pop(instancia, None)
+
+    @staticmethod
+    async def _version(session, instancia: str) -> PolicyVersion:
+        """Uma consulta: contagem e `max(updated_at)` das entradas e das configs da instância."""
+
+        def _agregado(model, funcao):
+            return select(funcao).select_from(model).where(model.instancia == instancia).scalar_subquery()
+
+        row = (
+            await session.execute(
+                select(
+                    _agregado(AllowBlockEntry, func.count()),
+                    _agregado(AllowBlockEntry, func.max(AllowBlockEntry.updated_at)),
+                    _agregado(BotConfig, func.count()),
+                    _agregado(BotConfig, func.max(BotConfig.updated_at)),
+                )
+            )
+        ).one()
+        return tuple(row)
+
+    @classmethod
+    async def _load(cls, instancia: str) -> Tuple[AccessPolicy, PolicyVersion]:
+        async with async_session() as session:
+            # Versão lida antes das linhas: uma escrita no meio faz a próxima checagem recarregar
+            versao = await cls._version(session, instancia)
+            entries = (
+                await session.execute(
+                    select(AllowBlockEntry.numero, AllowBlockEntry.tipo).where(AllowBlockEntry.instancia == instancia)
+                )
+            ).all()
+            configs = (
+                await session.execute(
+                    select(BotConfig.chat_jid, BotConfig.ia_ativa).where(BotConfig.instancia == instancia)
+                )
+            ).all()
+
+        por_chat = {chat_jid: ativo for chat_jid, ativo in configs if chat_jid is not None}
+        globais = [ativo for chat_jid, ativo in configs if chat_jid is None]
+        policy = AccessPolicy(
+            blocked=frozenset(numero for numero, tipo in entries if tipo == "block"),
+            allowed=frozenset(numero for numero, tipo in entries if tipo == "allow"),
+            ia_global=globais[0] if globais else True,
+            ia_por_chat=por_chat,
+        )
+        logger.info(
+            f"[Política] {instancia}: {len(policy.blocked)} bloqueados, {len(policy.allowed)} na allowlist, "
+            f"IA global {'ativa' if policy.ia_global else 'desativada'}, {len(por_chat)} overrides por chat."
+        )
+        return policy, versao
@@ -3,8 +3,8 @@ import uuid
 import base64
 import io
 import asyncio
+import time
 import re
-import unicodedata
 from typing import Optional
 from datetime import datetime
 from pathlib import Path
@@ -12,15 +12,31 @@ from pathlib import Path
 import openpyxl
 from gtts import gTTS
 from google import genai
-from sqlalchemy import select, or_
+from sqlalchemy import select
 
 from app.domain.schemas.webhook import WebhookBody
 from app.infrastructure.external.evolution_client import EvolutionClient
 from app.domain.services.rag_service import PortfolioRAG
+from app.domain.services.rag_chunker import CHARS_PER_TOKEN, estimate_tokens
+from app.domain.services.rag_intent_router import MessageIntent, classify_message
 from app.domain.services.document_catalog_service import DocumentCatalogService, DocumentEntry
 from app.domain.services.resume_tailor_service import ResumeTailorService
+from app.application.services.access_policy_service import AccessPolicyService
+from app.application.services.conversation_history_cache import ConversationHistoryCache
+from app.application.services.message_unit_of_work import (
+    HISTORICO_MAX,
+    MessageUnitOfWork,
+    buscar_cliente,
+    carregar_historico,
+    formatar_historico,
+    inserir_mensagem,
+    normalizar_contato_id,
+    resolver_cliente,
+    ultima_mensagem_id,
+    unidade_atual,
+)
 from app.infrastructure.database.session import async_session
-from app.domain.entities.models import Cliente, Mensagem, BotConfig, AllowBlockEntry
+from app.domain.entities.models import Cliente, Mensagem, BotConfig
 from app.infrastructure.config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -29,6 +45,11 @@ ASSISTANT_DISPLAY_NAME = "a assistente virtual do Wesley"
 WESLEY_PUBLIC_NAME = "Wesley"
 WESLEY_PUBLIC_FULL_NAME = "Wesley de Carvalho Augusto Correia"
 
+# Orçamento total de tokens (contexto + histórico + mensagem) enviado ao Gemini
+CONTEXT_MAX_TOKENS = 30000
+# Reserva para o prompt fixo (instruções da personalidade)
+PROMPT_RESERVED_TOKENS = 250
+
 
 # ---------------------------------------------------------------------------
 # Prompts por "personalidade" do bot
@@ -140,22 +161,80 @@ class AtendimentoService:
     def __init__(self, evolution_client: EvolutionClient):
         self.evolution_client = evolution_client
         self.rag = PortfolioRAG()
-        self._rag_ready = False
+        self._rag_initialized = False
         self._rag_init_lock = asyncio.Lock()
+        # Build inicial em background (sem versão publicada): até terminar, retrieval = fallback
+        self._rag_build_task: Optional[asyncio.Task] = None
         self.document_catalog = DocumentCatalogService()
         self.resume_tailor = ResumeTailorService()
+        # Blocklist/allowlist/estado da IA por instância, em memória (invalidado a cada escrita)
+        self.access_policy = AccessPolicyService(
+            ttl=settings.access_policy_ttl_seconds, validar_versao=settings.uvicorn_workers > 1
+        )
+        self.historico_cache = ConversationHistoryCache(
+            turnos=HISTORICO_MAX,
+            max_contatos=settings.history_cache_max_contacts,
+            max_chars=settings.history_cache_max_chars,
+            ttl=settings.history_cache_ttl_seconds,
+            validar_versao=settings.uvicorn_workers > 1,
+        )
         self.llm_client = genai.Client(api_key=settings.gemini_api_key)
 
+    @property
+    def rag_ready(self) -> bool:
+        """True com o retrieval completo ativo; False enquanto o índice não existe ou está no build inicial."""
+        return self.rag.is_ready
+
     async def ensure_rag_ready(self) -> None:
-        if self._rag_ready:
+        """
+        Inicializa o RAG sem segurar a mensagem pelo build. Versão já publicada em disco (ex.: a
+        que vem na imagem Docker): só load, em milissegundos. Sem versão compatível, o build roda
+        em background e o retrieval responde com o fallback (currículo + stacks) e o
+        ProjectDetector — ambos carregados pelo load() — até o hot-swap.
+        """
+        if self._rag_initialized:
             return
         async with self._rag_init_lock:
-            if self._rag_ready:
+            if self._rag_initialized:
                 return
             logger.info("Inicializando RAG em background/lazy...")
-            await asyncio.to_thread(self.rag.initialize_or_build)
-            self._rag_ready = True
-            logger.info("RAG pronto.")
+            t0 = time.perf_counter()
+            if await asyncio.to_thread(self.rag.load):
+                logger.info(f"RAG pronto em {(time.perf_counter() - t0) * 1000:.0f}ms.")
+            else:
+                logger.warning("Nenhum índice RAG publicado. Construindo em background; respondendo com o fallback.")
+                self._rag_build_task = asyncio.create_task(self._build_rag_inicial())
+            self._rag_initialized = True
+
+    async def _build_rag_inicial(self) -> None:
+        t0 = time.perf_counter()
+        if await self.reindex_rag():
+            logger.info(f"RAG completo ativo: índice construído em {time.perf_counter() - t0:.1f}s.")
+        else:
+            logger.error("Build inicial do RAG falhou. Seguindo com o fallback até o próximo reindex.")
+
+    async def reindex_rag(self, force: bool = False) -> bool:
+        """Reindex numa thread: as requisições seguem na versão atual até o hot-swap."""
+        try:
+            return await asyncio.to_thread(self.rag.reindex, force)
+        except Exception as e:
+            logger.error(f"Erro no reindex do RAG: {e}")
+            return False
+
+    async def run_rag_reindexer(self) -> None:
+        """
+        Warmup do RAG seguido do reindex periódico: arquivos novos/alterados no portfólio
+        entram no índice sem restart, a cada `rag_reindex_interval_seconds`.
+        O startup é só load — o primeiro reindex roda depois do intervalo, fora da janela de boot.
+        """
+        await self.ensure_rag_ready()
+        if settings.rag_reindex_interval_seconds <= 0:
+            return
+        while True:
+            await asyncio.sleep(settings.rag_reindex_interval_seconds)
+            if self._rag_build_task is not None and not self._rag_build_task.done():
+                continue  # build inicial ainda em andamento
+            await self.reindex_rag()
 
     # -----------------------------------------------------------------------
     # Ponto de entrada do Webhook
@@ -209,14 +288,13 @@ class AtendimentoService:
 
         logger.info(f"[{instancia}][{telefone} / {contato_memoria_id} / {nome_cliente}]: {texto_recebido}")
 
-        # --- Verifica blocklist/allowlist persistidos em banco, por instância ---
-        if await self._is_blocked(instancia, telefone_numero):
+        # --- Verifica blocklist/allowlist da instância (snapshot em memória, sem I/O) ---
+        politica = await self.access_policy.get(instancia)
+        if politica.is_blocked(telefone_numero):
             logger.info(f"Número %s está na blocklist da instância %s — ignorando.", telefone_numero, instancia)
             return
 
-        if await self._has_allowlist_entries(instancia) and not await self._is_allowed(
-            instancia, telefone_numero
-        ):
+        if not politica.is_allowed(telefone_numero):
             logger.info(
                 "Número %s não está na allowlist da instância %s — ignorando.",
                 telefone_numero,
@@ -224,25 +302,28 @@ class AtendimentoService:
             )
             return
 
-        # --- Verifica estado da IA no banco (prioridade: por chat > global) ---
-        ia_ativa = await self._ia_ativa_para(instancia, telefone_numero)
+        # --- Verifica estado da IA (prioridade: por chat > global) ---
+        ia_ativa = politica.ia_ativa_para(telefone_numero)
         if not ia_ativa:
             logger.info(f"IA desativada para [{instancia}][{telefone_numero}] — ignorando.")
             return
 
-        # --- Salva mensagem recebida ---
-        mensagem_nova = await self._salvar_mensagem(
-            contato_memoria_id, nome_cliente, texto_recebido, "RECEBIDA", id_mensagem
-        )
-        if not mensagem_nova:
-            logger.info(f"Mensagem duplicada ignorada: {id_mensagem}")
-            return
+        # --- Unidade de trabalho: contato, dedupe, mensagem recebida e histórico numa transação;
+        # as respostas são gravadas juntas ao sair do bloco ---
+        async with MessageUnitOfWork(contato_memoria_id, self.historico_cache) as uow:
+            if not await uow.iniciar(nome_cliente, texto_recebido, id_mensagem):
+                logger.info(f"Mensagem duplicada ignorada: {id_mensagem}")
+                return
 
-        # --- Roteamento por instância: pessoal vs portfólio ---
-        if instancia == settings.evolution_instance_two_name:
-            await self._responder_instancia_pessoal(ev_client, telefone, contato_memoria_id, nome_cliente, texto_recebido)
-        else:
-            await self._responder_instancia_portfolio(ev_client, telefone, contato_memoria_id, nome_cliente, texto_recebido)
+            # --- Roteamento por instância: pessoal vs portfólio ---
+            if instancia == settings.evolution_instance_two_name:
+                await self._responder_instancia_pessoal(
+                    ev_client, telefone, contato_memoria_id, nome_cliente, texto_recebido
+                )
+            else:
+                await self._responder_instancia_portfolio(
+                    ev_client, telefone, contato_memoria_id, nome_cliente, texto_recebido
+                )
 
     # -----------------------------------------------------------------------
     # Fluxo da instância PORTFÓLIO (instância 1 — comportamento original)
@@ -253,15 +334,19 @@ class AtendimentoService:
     ):
         telefone_numero = telefone.split("@")[0] if "@" in telefone else telefone
         texto_lower = texto.lower()
+        # Uma classificação por mensagem: decide o fluxo e a intenção do retrieve_smart()
+        intencao = classify_message(texto)
         handled_tailored_resume = await self._try_handle_tailored_resume_request(
-            ev_client, telefone, contato_memoria_id, nome, texto
+            ev_client, telefone, contato_memoria_id, nome, texto, intencao
         )
         if handled_tailored_resume:
             return
-        handled_document = await self._try_handle_document_request(ev_client, telefone, contato_memoria_id, nome, texto)
+        handled_document = await self._try_handle_document_request(
+            ev_client, telefone, contato_memoria_id, nome, texto, intencao
+        )
         if handled_document:
             return
-        resposta_identidade = self._resposta_identidade_deterministica(texto)
+        resposta_identidade = self._resposta_identidade_deterministica(intencao)
         if resposta_identidade:
             try:
                 await ev_client.send_text_message(telefone, resposta_identidade)
@@ -270,20 +355,11 @@ class AtendimentoService:
                 logger.error(f"Erro ao enviar resposta determinística para {telefone}: {e}")
             return
 
-        _FORMATO_AUDIO = {"áudio", "audio", "voz", "voice"}
-        _FORMATO_PLANILHA = {"planilha", "excel", "spreadsheet", "xlsx", "xls"}
-        _VERBOS_ACAO = {
-            "manda", "mandar", "envia", "enviar", "me manda", "me envia",
-            "gera", "gerar", "cria", "criar", "faz", "fazer", "quero",
-            "preciso", "pode", "consegue", "testa", "teste",
-        }
-
-        _quer_audio = any(k in texto_lower for k in _FORMATO_AUDIO)
-        _quer_planilha = any(k in texto_lower for k in _FORMATO_PLANILHA) or (
-            "tabela" in texto_lower and any(v in texto_lower for v in _VERBOS_ACAO)
-        )
+        _quer_audio = intencao.wants_audio
+        _quer_planilha = intencao.wants_spreadsheet
 
-        _REMOVER_DA_QUERY = _FORMATO_AUDIO | _FORMATO_PLANILHA | {
+        _REMOVER_DA_QUERY = {
+            "áudio", "audio", "voz", "voice", "planilha", "excel", "spreadsheet", "xlsx", "xls",
             "me envia", "me manda", "me envie", "me mande",
             "manda", "envia", "gera", "cria", "faz",
             "em formato de", "em formato", "como", "no formato",
@@ -297,15 +373,18 @@ class AtendimentoService:
         logger.info(f"RAG query topic: '{topico_query}' (audio={_quer_audio}, planilha={_quer_planilha})")
         await self.ensure_rag_ready()
 
-        contexto_rag = await self.rag.retrieve_smart(topico_query)
+        historico_str = await self._obter_historico(contato_memoria_id, limite=8)
         projeto_md = self.rag.load_project_if_mentioned(topico_query)
+        contexto_rag = await self.rag.retrieve_smart(
+            topico_query,
+            max_tokens=self._orcamento_rag(historico_str, texto, self.rag.get_minimum_context(), projeto_md),
+            intencao=intencao.intent,
+        )
         contexto = self._combinar_contextos(
             self.rag.get_minimum_context(),
             projeto_md,
             contexto_rag,
         )
-
-        historico_str = await self._obter_historico(contato_memoria_id, limite=8)
         contexto = self._aplicar_token_budget(contexto, historico_str, texto)
 
         if _quer_planilha:
@@ -332,15 +411,18 @@ class AtendimentoService:
     ):
         """Responde como o assistente pessoal do Wesley, usando o histórico da conversa."""
         texto_lower = texto.lower()
+        intencao = classify_message(texto)
         handled_tailored_resume = await self._try_handle_tailored_resume_request(
-            ev_client, telefone, contato_memoria_id, nome, texto
+            ev_client, telefone, contato_memoria_id, nome, texto, intencao
         )
         if handled_tailored_resume:
             return
-        handled_document = await self._try_handle_document_request(ev_client, telefone, contato_memoria_id, nome, texto)
+        handled_document = await self._try_handle_document_request(
+            ev_client, telefone, contato_memoria_id, nome, texto, intencao
+        )
         if handled_document:
             return
-        resposta_identidade = self._resposta_identidade_deterministica(texto)
+        resposta_identidade = self._resposta_identidade_deterministica(intencao)
         if resposta_identidade:
             try:
                 await ev_client.send_text_message(telefone, resposta_identidade)
@@ -349,16 +431,19 @@ class AtendimentoService:
                 logger.error(f"Erro ao enviar resposta determinística pessoal para {telefone}: {e}")
             return
 
-        _FORMATO_AUDIO = {"áudio", "audio", "voz", "voice"}
-        _quer_audio = any(k in texto_lower for k in _FORMATO_AUDIO)
+        _quer_audio = intencao.wants_audio
 
         historico_str = await self._obter_historico(contato_memoria_id, limite=12)  # mais histórico para pegar o estilo
         
         # Recupera o contexto do portfólio para a instância pessoal também
         topico_query = " ".join(texto_lower.split()).strip() or texto
         await self.ensure_rag_ready()
-        contexto_rag = await self.rag.retrieve_smart(topico_query)
         projeto_md = self.rag.load_project_if_mentioned(topico_query)
+        contexto_rag = await self.rag.retrieve_smart(
+            topico_query,
+            max_tokens=self._orcamento_rag(historico_str, texto, self.rag.get_minimum_context(), projeto_md),
+            intencao=intencao.intent,
+        )
         contexto = self._combinar_contextos(
             self.rag.get_minimum_context(),
             projeto_md,
@@ -505,26 +590,13 @@ class AtendimentoService:
             if not vistos:
                 return "📭 Nenhuma conversa registrada ainda."
 
-            # Busca os configs de IA para esses JIDs
-            jids = list(vistos.keys())
-            stmt_cfg = select(BotConfig).where(
-                BotConfig.instancia == instancia,
-                or_(BotConfig.chat_jid.in_(jids), BotConfig.chat_jid.is_(None)),
-            )
-            result_cfg = await session.execute(stmt_cfg)
-            configs = result_cfg.scalars().all()
-
-            cfg_por_chat: dict[str | None, bool] = {}
-            for c in configs:
-                cfg_por_chat[c.chat_jid] = c.ia_ativa
-
-            global_ativo = cfg_por_chat.get(None, True)  # padrão: ativo
+            politica = await self.access_policy.get(instancia)
 
             linhas = [f"📋 *Últimas conversas em {instancia}:*\n"]
             for jid, (cliente, mensagem) in vistos.items():
                 # Prioridade: config individual > global
                 telefone_numero = jid.split("@")[0] if "@" in jid else jid
-                ativo = cfg_por_chat.get(telefone_numero, global_ativo)
+                ativo = politica.ia_ativa_para(telefone_numero)
                 emoji = "✅" if ativo else "🔴"
                 nome = cliente.nome or "Desconhecido"
                 ultima = mensagem.data_hora.strftime("%d/%m %H:%M") if mensagem.data_hora else "—"
@@ -560,6 +632,7 @@ class AtendimentoService:
                 session.add(config)
 
             await session.commit()
+        self.access_policy.invalidate(instancia)
 
     async def _remover_config_chat(self, instancia: str, chat_jid: str) -> None:
         """Remove o override individual de um chat específico."""
@@ -573,71 +646,11 @@ class AtendimentoService:
             if config:
                 await session.delete(config)
                 await session.commit()
+        self.access_policy.invalidate(instancia)
 
     async def _ia_ativa_para(self, instancia: str, chat_jid: Optional[str]) -> bool:
-        """Consulta o BD para saber se a IA está ativa para este chat.
-        
-        Prioridade: config individual > config global > padrão True.
-        """
-        async with async_session() as session:
-            # Busca config individual do chat (se chat_jid fornecido)
-            if chat_jid:
-                stmt_chat = select(BotConfig).where(
-                    BotConfig.instancia == instancia,
-                    BotConfig.chat_jid == chat_jid,
-                )
-                result = await session.execute(stmt_chat)
-                cfg_chat = result.scalar_one_or_none()
-                if cfg_chat is not None:
-                    return cfg_chat.ia_ativa
-
-            # Fallback: config global da instância
-            stmt_global = select(BotConfig).where(
-                BotConfig.instancia == instancia,
-                BotConfig.chat_jid.is_(None),
-            )
-            result = await session.execute(stmt_global)
-            cfg_global = result.scalar_one_or_none()
-            if cfg_global is not None:
-                return cfg_global.ia_ativa
-
-            return True  # padrão: IA ativa
-
-    # -----------------------------------------------------------------------
-    # Allowlist / Blocklist persistidos em banco (AllowBlockEntry)
-    # -----------------------------------------------------------------------
-
-    async def _is_blocked(self, instancia: str, numero: str) -> bool:
-        """Retorna True se o número estiver na blocklist dessa instância."""
-        async with async_session() as session:
-            stmt = select(AllowBlockEntry).where(
-                AllowBlockEntry.tipo == "block",
-                AllowBlockEntry.numero == numero,
-                AllowBlockEntry.instancia == instancia,
-            )
-            result = await session.execute(stmt)
-            return result.scalar_one_or_none() is not None
-
-    async def _has_allowlist_entries(self, instancia: str) -> bool:
-        """Retorna True se existir qualquer allowlist configurada para a instância."""
-        async with async_session() as session:
-            stmt = select(AllowBlockEntry).where(
-                AllowBlockEntry.tipo == "allow",
-                AllowBlockEntry.instancia == instancia,
-            )
-            result = await session.execute(stmt)
-            return result.first() is not None
-
-    async def _is_allowed(self, instancia: str, numero: str) -> bool:
-        """Retorna True se o número estiver na allowlist dessa instância."""
-        async with async_session() as session:
-            stmt = select(AllowBlockEntry).where(
-                AllowBlockEntry.tipo == "allow",
-                AllowBlockEntry.numero == numero,
-                AllowBlockEntry.instancia == instancia,
-            )
-            result = await session.execute(stmt)
-            return result.scalar_one_or_none() is not None
+        """IA ativa para este chat? Prioridade: config individual > config global > padrão True."""
+        return (await self.access_policy.get(instancia)).ia_ativa_para(chat_jid)
 
     # -----------------------------------------------------------------------
     # Geração de respostas — Portfólio
@@ -802,39 +815,36 @@ Python | Avançado | Backend
             return msg_obj.extendedTextMessage["text"]
         return None
 
+    def _orcamento_rag(
+        self, historico: str, texto: str, *contextos_fixos: Optional[str], max_tokens: int = CONTEXT_MAX_TOKENS
+    ) -> int:
+        """Tokens que sobram para os chunks do RAG depois de histórico, mensagem e contextos fixos."""
+        usados = estimate_tokens(historico) + estimate_tokens(texto) + PROMPT_RESERVED_TOKENS
+        usados += sum(estimate_tokens(c) for c in contextos_fixos if c)
+        return max(0, max_tokens - usados)
+
     def _aplicar_token_budget(
-        self, contexto: str, historico: str, texto: str, max_tokens: int = 30000
+        self, contexto: str, historico: str, texto: str, max_tokens: int = CONTEXT_MAX_TOKENS
     ) -> str:
-        max_chars = max_tokens * 4
-        base_chars = len(historico) + len(texto) + 1000
+        """
+        Rede de segurança do orçamento: o RAG já vem empacotado por chunks inteiros; se
+        ainda estourar, corta na última fronteira de chunk/contexto que cabe.
+        """
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        base_chars = len(historico) + len(texto) + PROMPT_RESERVED_TOKENS * CHARS_PER_TOKEN
         if base_chars + len(contexto) <= max_chars:
             return contexto
         chars_disponiveis = max_chars - base_chars
         if chars_disponiveis <= 0:
             return ""
-        logger.warning(f"Token Budget: cortando RAG de {len(contexto)} para {chars_disponiveis} chars.")
-        return contexto[:chars_disponiveis]
+        corte = max(contexto.rfind("\n...\n", 0, chars_disponiveis), contexto.rfind("\n---\n", 0, chars_disponiveis))
+        if corte <= 0:
+            corte = chars_disponiveis
+        logger.warning(f"Token Budget: cortando RAG de {len(contexto)} para {corte} chars.")
+        return contexto[:corte]
 
     def _normalizar_contato_id(self, whatsapp_id: Optional[str]) -> str:
-        if not whatsapp_id:
-            return ""
-        base = whatsapp_id.split("@")[0].strip()
-        digits = "".join(ch for ch in base if ch.isdigit())
-        return digits or base
-
-    def _variantes_contato_id(self, whatsapp_id: Optional[str]) -> list[str]:
-        variantes: list[str] = []
-        bruto = (whatsapp_id or "").strip()
-        normalizado = self._normalizar_contato_id(bruto)
-        for valor in (bruto, normalizado):
-            if valor and valor not in variantes:
-                variantes.append(valor)
-        if normalizado:
-            for sufixo in ("@s.whatsapp.net", "@lid"):
-                variante = f"{normalizado}{sufixo}"
-                if variante not in variantes:
-                    variantes.append(variante)
-        return variantes
+        return normalizar_contato_id(whatsapp_id)
 
     def _normalizar_nome_exibicao(self, nome: Optional[str]) -> str:
         clean = " ".join((nome or "").split()).strip()
@@ -843,53 +853,6 @@ Python | Avançado | Backend
         primeiro_nome = clean.split()[0]
         return primeiro_nome[:40]
 
-    def _normalizar_texto_intencao(self, texto: str) -> str:
-        texto = unicodedata.normalize("NFKD", texto.lower())
-        texto = "".join(ch for ch in texto if not unicodedata.combining(ch))
-        return " ".join(texto.split())
-
-    def _detectar_idioma_documento(self, texto: str) -> str:
-        texto_norm = self._normalizar_texto_intencao(texto)
-        if any(k in texto_norm for k in ("english", "in english", "ingles", "em ingles", "resume")):
-            return "en"
-        return "pt"
-
-    def _is_certificate_listing_request(self, texto: str) -> bool:
-        texto_norm = self._normalizar_texto_intencao(texto)
-        return (
-            any(term in texto_norm for term in ("certificado", "certificados", "certificate", "certificates"))
-            and any(
-                termo in texto_norm
-                for termo in ("quais", "listar", "lista", "tenho", "possuo", "mostrar", "mostra", "tem", "has")
-            )
-        )
-
-    def _is_send_request(self, texto: str) -> bool:
-        texto_norm = self._normalizar_texto_intencao(texto)
-        return any(
-            termo in texto_norm
-            for termo in (
-                "manda", "manda ai", "mandar", "envia", "enviar", "me manda",
-                "me envia", "pode mandar", "pode enviar", "send", "attach", "anexa",
-            )
-        )
-
-    def _looks_like_job_posting(self, texto: str) -> bool:
-        texto_norm = self._normalizar_texto_intencao(texto)
-        keywords = (
-            "vaga", "job description", "descricao da vaga", "oportunidade", "responsabilidades",
-            "requisitos", "qualificacoes", "qualifications", "requirements", "about the role",
-        )
-        return len(texto) >= 400 and any(k in texto_norm for k in keywords)
-
-    def _is_tailored_resume_request(self, texto: str) -> bool:
-        texto_norm = self._normalizar_texto_intencao(texto)
-        explicit_request = (
-            any(term in texto_norm for term in ("curriculo", "curriculum", "resume", "cv"))
-            and any(term in texto_norm for term in ("vaga", "job", "adapt", "adapte", "personal", "personaliz"))
-        )
-        return explicit_request or self._looks_like_job_posting(texto)
-
     def _build_document_caption(self, entry: DocumentEntry, language: str) -> str:
         if entry.category == "resume_en":
             return "Segue o resume em inglês do Wesley."
@@ -908,16 +871,17 @@ Python | Avançado | Backend
         contato_memoria_id: str,
         nome: str,
         texto: str,
+        intencao: MessageIntent,
     ) -> bool:
-        language = self._detectar_idioma_documento(texto)
+        language = intencao.document_lang
 
-        if self._is_certificate_listing_request(texto):
+        if intencao.certificate_listing:
             resposta = self.document_catalog.build_certificate_list_message(language)
             await ev_client.send_text_message(telefone, resposta)
             await self._salvar_mensagem(contato_memoria_id, nome, resposta, "ENVIADA")
             return True
 
-        if not self._is_send_request(texto):
+        if not intencao.send_request:
             return False
 
         entry = self.document_catalog.find_best_document(texto, language)
@@ -938,15 +902,16 @@ Python | Avançado | Backend
         contato_memoria_id: str,
         nome: str,
         texto: str,
+        intencao: MessageIntent,
     ) -> bool:
-        if not self._is_tailored_resume_request(texto):
+        if not intencao.tailored_resume:
             return False
 
-        language = self._detectar_idioma_documento(texto)
+        language = intencao.document_lang
         await self.ensure_rag_ready()
         contexto = self._combinar_contextos(
             self.rag.get_minimum_context(),
-            await self.rag.retrieve_smart(texto),
+            await self.rag.retrieve_smart(texto, intencao="resume_tailoring"),
         )
         markdown_resume = await self._gerar_curriculo_personalizado_markdown(texto, contexto, language)
 
@@ -1083,37 +1048,13 @@ CONTEXTO FONTE:
                 return "# Wesley de Carvalho Augusto Correia\n\n## Professional Summary\nUnable to generate the tailored resume right now."
             return "# Wesley de Carvalho Augusto Correia\n\n## Resumo Profissional\nNão foi possível gerar o currículo personalizado agora."
 
-    def _resposta_identidade_deterministica(self, texto: str) -> Optional[str]:
-        texto_norm = self._normalizar_texto_intencao(texto)
-
-        pergunta_nome_assistente = (
-            ("qual seu nome" in texto_norm or "seu nome" in texto_norm or "quem e voce" in texto_norm)
-            and "wesley" not in texto_norm
-        )
-        if pergunta_nome_assistente:
+    def _resposta_identidade_deterministica(self, intencao: MessageIntent) -> Optional[str]:
+        if intencao.identity == "assistant_name":
             return f"Eu sou {ASSISTANT_DISPLAY_NAME} aqui no WhatsApp."
-
-        pergunta_nome_completo = (
-            "nome completo" in texto_norm
-            or "nome inteiro" in texto_norm
-            or "sobrenome" in texto_norm
-            or "nome de verdade" in texto_norm
-            or "nome completo de verdade" in texto_norm
-        )
-        if pergunta_nome_completo:
+        if intencao.identity == "full_name":
             return f"O nome completo dele é {WESLEY_PUBLIC_FULL_NAME}."
-
-        pergunta_nome_wesley = (
-            "nome do wesley" in texto_norm
-            or "quem e o wesley" in texto_norm
-            or "qual nome dele" in texto_norm
-            or texto_norm == "nome dele"
-            or texto_norm.endswith("nome dele?")
-            or "nome dele" in texto_norm
-        )
-        if pergunta_nome_wesley:
+        if intencao.identity == "wesley_name":
             return f"O nome dele é {WESLEY_PUBLIC_NAME}."
-
         return None
 
     def _combinar_contextos(self, *partes: Optional[str]) -> str:
@@ -1162,60 +1103,51 @@ CONTEXTO FONTE:
     ) -> bool:
         if not texto:
             return False
+        contato_id = self._normalizar_contato_id(whatsapp_id)
+        uow = self._unidade_do_contato(contato_id)
+        if uow is not None and direcao == "ENVIADA":
+            # Dentro do webhook: transação curta na sessão da unidade, sem novo lookup do contato
+            return await uow.gravar_enviada(texto)
         async with async_session() as session:
-            contato_id = self._normalizar_contato_id(whatsapp_id)
-            variantes = self._variantes_contato_id(whatsapp_id)
-            stmt = select(Cliente).where(Cliente.whatsapp_id.in_(variantes))
-            result = await session.execute(stmt)
-            cliente = result.scalar_one_or_none()
-
-            if not cliente:
-                cliente = Cliente(id=str(uuid.uuid4()), whatsapp_id=contato_id or whatsapp_id, nome=nome)
-                session.add(cliente)
-                await session.flush()
-            elif not cliente.nome and nome:
-                cliente.nome = nome
-
-            if msg_id:
-                stmt_msg = select(Mensagem).where(Mensagem.mensagem_id_whatsapp == msg_id)
-                result_msg = await session.execute(stmt_msg)
-                if result_msg.scalar_one_or_none():
-                    return False
-
-            nova_msg = Mensagem(
-                id=str(uuid.uuid4()),
-                id_cliente=cliente.id,
-                texto=texto,
-                mensagem_id_whatsapp=msg_id or str(uuid.uuid4()),
-                direcao=direcao,
-                data_hora=datetime.utcnow(),
-            )
-            session.add(nova_msg)
+            cliente_id = await resolver_cliente(session, contato_id or whatsapp_id, nome)
+            mensagem_id = await inserir_mensagem(session, cliente_id, texto, direcao, msg_id)
+            if mensagem_id is None:
+                return False
             await session.commit()
-            return True
+        self.historico_cache.append(contato_id or whatsapp_id, direcao, texto, mensagem_id)
+        return True
 
     async def _obter_historico(self, whatsapp_id: str, limite: int = 5) -> str:
+        contato_id = self._normalizar_contato_id(whatsapp_id)
+        if limite <= HISTORICO_MAX:
+            uow = self._unidade_do_contato(contato_id)
+            if uow is not None:
+                return uow.historico(limite)
+            if not self.historico_cache.validar_versao:
+                # Um worker só: o cache vê todas as gravações, o hit não vai ao banco
+                turnos = self.historico_cache.get(contato_id)
+                if turnos is not None:
+                    return formatar_historico(turnos[-limite:])
+        marcador = self.historico_cache.marcador()
         async with async_session() as session:
-            stmt = select(Cliente).where(Cliente.whatsapp_id.in_(self._variantes_contato_id(whatsapp_id)))
-            result = await session.execute(stmt)
-            cliente = result.scalar_one_or_none()
+            if limite <= HISTORICO_MAX and self.historico_cache.validar_versao:
+                ultima_id = None
+                if self.historico_cache.contem(contato_id):
+                    ultima_id = await ultima_mensagem_id(session, contato_id)
+                turnos = self.historico_cache.get(contato_id, ultima_id)
+                if turnos is not None:
+                    return formatar_historico(turnos[-limite:])
+            cliente = await buscar_cliente(session, contato_id)
             if not cliente:
                 return ""
-
-            stmt_msg = (
-                select(Mensagem)
-                .where(Mensagem.id_cliente == cliente.id)
-                .order_by(Mensagem.data_hora.desc())
-                .limit(limite)
-            )
-            result_msg = await session.execute(stmt_msg)
-            mensagens = result_msg.scalars().all()
-
-            if not mensagens:
-                return ""
-
-            historico = []
-            for m in reversed(mensagens):
-                remetente = "Usuário" if m.direcao == "RECEBIDA" else "Assistente"
-                historico.append(f"{remetente}: {m.texto}")
-            return "\n".join(historico)
+            mensagens = await carregar_historico(session, cliente.id, max(limite, HISTORICO_MAX))
+        self.historico_cache.put(contato_id, mensagens, marcador)
+        return formatar_historico(mensagens[-limite:])
+
+    @staticmethod
+    def _unidade_do_contato(contato_id: str) -> Optional[MessageUnitOfWork]:
+        """Unidade de trabalho ativa nesta task, se for do mesmo contato e já tiver resolvido o cliente."""
+        uow = unidade_atual()
+        if uow is None or uow.cliente_id is None or uow.contato_id != contato_id:
+            return None
+        return uow
@@ -0,0 +1,168 @@
+"""
+Histórico recente das conversas em memória (ring buffer por contato).
+
+O prompt de cada resposta leva as últimas 8–12 mensagens do contato, e elas eram lidas do
+banco a cada mensagem — logo depois de o próprio bot gravar a recebida. Agora cada contato
+tem um `deque` com as últimas `turnos` mensagens:
+
+- write-through: quem grava no banco (`MessageUnitOfWork`, `_salvar_mensagem`) faz
+  `append()` depois do commit; contato fora do cache é ignorado.
+- miss: o histórico é lido do banco e entra com `put()`; a entrada guarda o ID da
+  mensagem mais recente como versão.
+- frescor: com vários workers do uvicorn (`validar_versao`), mensagens do mesmo contato
+  podem ser gravadas por outro processo. Antes de servir um hit, quem chama lê o ID da
+  última mensagem do contato (`ultima_mensagem_id()`: um passo no índice
+  `(id_cliente, data_hora)`, O(1) no tamanho da conversa) e passa para `get()`: diferente
+  do da entrada → outro processo gravou ou apagou, a entrada é descartada e o histórico
+  relido. Com um worker só, o hit não vai ao banco.
+- LRU entre contatos, limitado por `max_contatos` e por `max_chars` (soma dos textos), e
+  TTL por contato (`history_cache_ttl_seconds`) para liberar contatos parados.
+
+Corrida: se uma mensagem do contato é gravada enquanto outra task lê o histórico do banco,
+o `put()` daquela leitura é descartado (`marcador()` antes da leitura) — senão o cache
+ficaria sem a mensagem gravada no meio. Como no cache de embeddings, nada aqui tem `await`
+entre leitura e escrita do estado: seguro no event loop sem locks.
+"""
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence
+
+
+class Turno(NamedTuple):
+    """Mensagem do histórico; mesmos atributos de `Mensagem` usados por `formatar_historico()`."""
+
+    direcao: str
+    texto: str
+
+
+class _Entrada:
+    __slots__ = ("expira_em", "turnos", "ultima_id", "chars")
+
+    def __init__(self, expira_em: float, turnos: Deque[Turno], ultima_id: Optional[str]):
+        self.expira_em = expira_em
+        self.turnos = turnos
+        self.ultima_id = ultima_id  # ID no banco da mensagem mais recente deste histórico
+        self.chars = sum(len(t.texto) for t in turnos)
+
+
+class ConversationHistoryCache:
+    """Últimas `turnos` mensagens por contato, com LRU, teto de memória e TTL."""
+
+    def __init__(
+        self,
+        turnos: int,
+        max_contatos: int = 1000,
+        max_chars: int = 2_000_000,
+        ttl: float = 600.0,
+        validar_versao: bool = True,
+    ):
+        self.turnos = turnos
+        self.validar_versao = validar_versao
+        self.max_contatos = max_contatos
+        self.max_chars = max_chars
+        self.ttl = ttl
+        self._entradas: "OrderedDict[str, _Entrada]" = OrderedDict()
+        self._chars = 0
+        # Sequência global de escritas e a última de cada contato (LRU, mesmo limite de contatos)
+        self._seq = 0
+        self._ultima_escrita: "OrderedDict[str, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def contem(self, contato_id: str) -> bool:
+        """Há entrada para o contato (sem contar hit/miss): só então vale ler a versão no banco."""
+        return contato_id in self._entradas
+
+    def get(self, contato_id: str, ultima_id: Optional[str] = None) -> Optional[List[Turno]]:
+        """
+        Histórico do contato (mais antiga → mais recente) ou None se não está no cache.
+        Com `validar_versao`, `ultima_id` é o ID da última mensagem do contato no banco agora:
+        se não bate com o da entrada, outro processo gravou (ou apagou) e a entrada é descartada.
+        """
+        entrada = self._entradas.get(contato_id)
+        if entrada is not None and self.validar_versao and entrada.ultima_id != ultima_id:
+            self._remover(contato_id)
+            self.stale += 1
+            entrada = None
+        elif entrada is not None and entrada.expira_em < time.monotonic():
+            self._remover(contato_id)
+            entrada = None
+        if entrada is None:
+            self.misses += 1
+            return None
+        self._entradas.move_to_end(contato_id)
+        self.hits += 1
+        return list(entrada.turnos)
+
+    def marcador(self) -> int:
+        """Posição atual das escritas; passe para `put()` o valor obtido antes de ler o banco."""
+        return self._seq
+
+    def put(self, contato_id: str, mensagens: Sequence, marcador: int) -> None:
+        """
+        Guarda o histórico lido do banco (`Mensagem`: `id`, `direcao` e `texto`); a versão é o
+        `id` da última. Ignorado se o contato teve escrita depois de `marcador` — a leitura
+        pode não ter visto essa mensagem.
+        """
+        if self._ultima_escrita.get(contato_id, 0) > marcador:
+            return
+        turnos = deque((Turno(m.direcao, m.texto or "") for m in mensagens), maxlen=self.turnos)
+        self._remover(contato_id)
+        entrada = _Entrada(time.monotonic() + self.ttl, turnos, mensagens[-1].id if mensagens else None)
+        self._entradas[contato_id] = entrada
+        self._chars += entrada.chars
+        self._aplicar_limites()
+
+    def append(self, contato_id: str, direcao: str, texto: str, mensagem_id: str) -> None:
+        """Write-through de uma mensagem já gravada no banco (`mensagem_id`: `Mensagem.id`)."""
+        self._seq += 1
+        self._ultima_escrita[contato_id] = self._seq
+        self._ultima_escrita.move_to_end(contato_id)
+        while len(self._ultima_escrita) > self.max_contatos:
+            self._ultima_escrita.popitem(last=False)
+
+        entrada = self._entradas.get(contato_id)
+        if entrada is None:
+            return
+        texto = texto or ""
+        if len(entrada.turnos) == entrada.turnos.maxlen:
+            entrada.chars -= len(entrada.turnos[0].texto)
+            self._chars -= len(entrada.turnos[0].texto)
+        entrada.turnos.append(Turno(direcao, texto))
+        entrada.ultima_id = mensagem_id
+        entrada.chars += len(texto)
+        self._chars += len(texto)
+        self._entradas.move_to_end(contato_id)
+        self._aplicar_limites()
+
+    def invalidate(self, contato_id: Optional[str] = None) -> None:
+        """Descarta o histórico do contato (ou de todos): a próxima leitura vai ao banco."""
+        if contato_id is None:
+            self._entradas.clear()
+            self._chars = 0
+        else:
+            self._remover(contato_id)
+
+    def stats(self) -> Dict:
+        return {
+            "contatos": len(self._entradas),
+            "chars": self._chars,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+        }
+
+    def _remover(self, contato_id: str) -> None:
+        entrada = self._entradas.pop(contato_id, None)
+        if entrada is not None:
+            self._chars -= entrada.chars
+
+    def _aplicar_limites(self) -> None:
+        # O contato recém-usado é o último: só sai se sozinho estourar o teto de memória
+        while self._entradas and (len(self._entradas) > self.max_contatos or self._chars > self.max_chars):
+            _, entrada = self._entradas.popitem(last=False)
+            self._chars -= entrada.chars
+            self.evictions += 1
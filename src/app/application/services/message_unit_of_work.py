@@ -0,0 +1,218 @@
+"""
+Unidade de trabalho de banco por mensagem recebida.
+
+Antes, uma mensagem abria uma sessão para cada passo: gravar a recebida (lookup do
+contato + dedupe + insert), ler o histórico (outro lookup do contato) e gravar cada
+resposta (mais um lookup). Cada abertura é um checkout do pool e uma transação própria.
+
+`MessageUnitOfWork` carrega uma `AsyncSession` e o `Cliente` resolvido uma única vez por
+todo o `processar_webhook`:
+
+1. `iniciar()` — numa transação: contato, dedupe e insert da mensagem recebida e o
+   histórico recente (leitura antecipada, só se o contato não está no
+   `ConversationHistoryCache` ou se a entrada dele ficou velha: `ultima_mensagem_id()`).
+   Commit e a conexão volta ao pool.
+2. Geração da resposta (LLM, TTS, envio) sem conexão presa — segundos que esgotariam o pool.
+3. Cada resposta é gravada logo depois de enviada (`gravar_enviada()`), numa transação
+   curta na mesma sessão e sem novo lookup do contato — antes da próxima chamada de rede.
+   Resposta que já chegou ao WhatsApp não se perde se o worker cair ou a task for
+   cancelada no meio do fluxo.
+
+`_salvar_mensagem()`/`_obter_historico()` do AtendimentoService usam a unidade ativa no
+contexto (`unidade_atual()`) quando é do mesmo contato, então os fluxos de resposta não
+precisam receber a sessão por parâmetro.
+
+Gravações são `INSERT ... ON CONFLICT` (PostgreSQL): o dedupe de `mensagem_id_whatsapp` e a
+criação do contato são atômicos — dois webhooks simultâneos da mesma mensagem não passam
+os dois por um SELECT de checagem antes do INSERT.
+
+O contato é identificado por `Cliente.contato_id` (`normalizar_contato_id()`): número,
+`@s.whatsapp.net` e `@lid` do mesmo contato caem na mesma linha e no mesmo histórico.
+"""
+import contextvars
+import uuid
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.application.services.conversation_history_cache import ConversationHistoryCache, Turno
+from app.domain.entities.models import Cliente, Mensagem
+from app.infrastructure.database.session import async_session
+
+# Histórico pré-carregado: o maior limite usado pelos fluxos (instância pessoal)
+HISTORICO_MAX = 12
+
+_unidade_atual: contextvars.ContextVar[Optional["MessageUnitOfWork"]] = contextvars.ContextVar(
+    "message_unit_of_work", default=None
+)
+
+
+def unidade_atual() -> Optional["MessageUnitOfWork"]:
+    """Unidade de trabalho da mensagem em processamento nesta task (None fora do webhook)."""
+    return _unidade_atual.get()
+
+
+def normalizar_contato_id(whatsapp_id: Optional[str]) -> str:
+    """
+    Chave canônica do contato: os dígitos antes do '@' (ou a parte antes do '@', sem dígitos).
+    Mesma regra do backfill da migration c4e6a8b0d2f1 — mudou aqui, muda lá.
+    """
+    if not whatsapp_id:
+        return ""
+    base = whatsapp_id.split("@")[0].strip()
+    digits = "".join(ch for ch in base if ch.isdigit())
+    return digits or base
+
+
+async def buscar_cliente(session: AsyncSession, contato_id: str) -> Optional[Cliente]:
+    result = await session.execute(select(Cliente).where(Cliente.contato_id == contato_id))
+    return result.scalar_one_or_none()
+
+
+async def resolver_cliente(session: AsyncSession, contato_id: str, nome: str) -> str:
+    """
+    ID do contato pela chave canônica. Contato novo é criado com upsert em `contato_id`:
+    numa corrida, os dois webhooks recebem o mesmo ID.
+    """
+    result = await session.execute(select(Cliente.id, Cliente.nome).where(Cliente.contato_id == contato_id))
+    row = result.first()
+    if row is not None:
+        if not row.nome and nome:
+            await session.execute(update(Cliente).where(Cliente.id == row.id).values(nome=nome))
+        return row.id
+
+    stmt = pg_insert(Cliente).values(id=str(uuid.uuid4()), whatsapp_id=contato_id, contato_id=contato_id, nome=nome)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Cliente.contato_id],
+        # Nome vazio conta como ausente, como no caminho do SELECT acima
+        set_={"nome": func.coalesce(func.nullif(Cliente.nome, ""), stmt.excluded.nome)},
+    ).returning(Cliente.id)
+    return (await session.execute(stmt)).scalar_one()
+
+
+async def inserir_mensagem(
+    session: AsyncSession, cliente_id: str, texto: str, direcao: str, msg_id: Optional[str] = None
+) -> Optional[str]:
+    """
+    Grava a mensagem num único statement e retorna o `Mensagem.id` dela. None se `msg_id`
+    já existia (webhook repetido): o dedupe é o índice único de `mensagem_id_whatsapp`,
+    não um SELECT prévio.
+    """
+    stmt = (
+        pg_insert(Mensagem)
+        .values(
+            id=str(uuid.uuid4()),
+            id_cliente=cliente_id,
+            texto=texto,
+            mensagem_id_whatsapp=msg_id or str(uuid.uuid4()),
+            direcao=direcao,
+            data_hora=datetime.utcnow(),
+        )
+        .on_conflict_do_nothing(index_elements=[Mensagem.mensagem_id_whatsapp])
+        .returning(Mensagem.id)
+    )
+    return (await session.execute(stmt)).scalar_one_or_none()
+
+
+async def carregar_historico(session: AsyncSession, cliente_id: str, limite: int) -> List[Mensagem]:
+    """Últimas `limite` mensagens do contato, da mais antiga para a mais recente."""
+    result = await session.execute(
+        select(Mensagem).where(Mensagem.id_cliente == cliente_id).order_by(Mensagem.data_hora.desc()).limit(limite)
+    )
+    return list(reversed(result.scalars().all()))
+
+
+async def ultima_mensagem_id(session: AsyncSession, contato_id: str) -> Optional[str]:
+    """
+    ID da mensagem mais recente do contato (None se não há nenhuma): um passo no índice
+    `(id_cliente, data_hora)`, qualquer que seja o tamanho da conversa. É a versão do
+    histórico no `ConversationHistoryCache`: mudou → outro worker gravou ou apagou mensagens.
+    """
+    result = await session.execute(
+        select(Mensagem.id)
+        .join(Cliente, Cliente.id == Mensagem.id_cliente)
+        .where(Cliente.contato_id == contato_id)
+        .order_by(Mensagem.data_hora.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+def formatar_historico(mensagens: Sequence[Mensagem]) -> str:
+    linhas = []
+    for m in mensagens:
+        remetente = "Usuário" if m.direcao == "RECEBIDA" else "Assistente"
+        linhas.append(f"{remetente}: {m.texto}")
+    return "\n".join(linhas)
+
+
+class MessageUnitOfWork:
+    """Uma sessão e um lookup de contato para todo o processamento de uma mensagem recebida."""
+
+    def __init__(self, contato_id: str, cache: Optional[ConversationHistoryCache] = None):
+        self.contato_id = contato_id
+        self.cache = cache
+        self.session: AsyncSession = async_session()
+        self.cliente_id: Optional[str] = None
+        self._historico: List = []  # Mensagem ou Turno: ambos têm `direcao` e `texto`
+        self._token: Optional[contextvars.Token] = None
+
+    async def __aenter__(self) -> "MessageUnitOfWork":
+        self._token = _unidade_atual.set(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        _unidade_atual.reset(self._token)
+        await self.session.close()
+
+    async def iniciar(self, nome: str, texto: str, msg_id: Optional[str], limite_historico: int = HISTORICO_MAX) -> bool:
+        """
+        Resolve o contato, grava a mensagem recebida e pré-carrega o histórico (já com ela),
+        numa transação. Retorna False se a mensagem é duplicada — nada é gravado.
+        """
+        marcador = self.cache.marcador() if self.cache is not None else 0
+        self.cliente_id = await resolver_cliente(self.session, self.contato_id, nome)
+        # Versão lida antes do insert: depois dele a última mensagem é a recebida
+        ultima_id = None
+        if self.cache is not None and self.cache.validar_versao and self.cache.contem(self.contato_id):
+            ultima_id = await ultima_mensagem_id(self.session, self.contato_id)
+        mensagem_id = await inserir_mensagem(self.session, self.cliente_id, texto, "RECEBIDA", msg_id)
+        if mensagem_id is None:
+            await self.session.rollback()
+            return False
+        em_cache = self.cache.get(self.contato_id, ultima_id) if self.cache is not None else None
+        if em_cache is not None:
+            self._historico = em_cache + [Turno("RECEBIDA", texto)]
+            await self.session.commit()
+            self.cache.append(self.contato_id, "RECEBIDA", texto, mensagem_id)
+            return True
+        self._historico = await carregar_historico(self.session, self.cliente_id, limite_historico)
+        await self.session.commit()
+        if self.cache is not None:
+            self.cache.put(self.contato_id, self._historico, marcador)
+        return True
+
+    def historico(self, limite: int) -> str:
+        """Histórico pré-carregado + respostas já gravadas por esta unidade, sem ir ao banco."""
+        return formatar_historico(self._historico[-limite:])
+
+    async def gravar_enviada(self, texto: str) -> bool:
+        """
+        Grava a resposta que acabou de ser enviada, numa transação curta. Retorna se a linha
+        foi gravada; erro de banco desfaz a transação e é propagado para o fluxo.
+        """
+        try:
+            mensagem_id = await inserir_mensagem(self.session, self.cliente_id, texto, "ENVIADA")
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        if mensagem_id is None:
+            return False
+        if self.cache is not None:
+            self.cache.append(self.contato_id, "ENVIADA", texto, mensagem_id)
+        self._historico.append(Turno("ENVIADA", texto))
+        return True
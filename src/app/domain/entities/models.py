@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Boolean, UniqueConstraint
+from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Boolean, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.infrastructure.database.base import Base
@@ -8,6 +8,7 @@ class Cliente(Base):
 
     id = Column(String(36), primary_key=True)
     whatsapp_id = Column(String(50), unique=True, nullable=False, index=True) # Ex: 5511999999999@s.whatsapp.net
+    contato_id = Column(String(50), unique=True, nullable=False, index=True) # Chave canônica: só dígitos (5511999999999)
     nome = Column(String(100), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     oculta = Column(Boolean, default=False, nullable=False, server_default="false")
@@ -17,6 +18,8 @@ class Cliente(Base):
 
 class Mensagem(Base):
     __tablename__ = "bot_mensagens"
+    # Histórico do contato em ordem (LIMIT N) e a última mensagem dele sem varrer a conversa
+    __table_args__ = (Index("ix_bot_mensagens_id_cliente_data_hora", "id_cliente", "data_hora"),)
     
     id = Column(String(36), primary_key=True)
     id_cliente = Column(String(36), ForeignKey("bot_clientes.id"), index=True)
@@ -0,0 +1,219 @@
+"""
+Store colunar e memory-mapped da metadata dos chunks do RAG.
+
+Substitui o `vector_metadata.pkl` (lista/dict de dicts carregada inteira na RAM).
+Layout no diretório do store:
+
+    texts.bin      textos de todos os chunks concatenados em UTF-8
+    offsets.npy    int64 (n+1,) — texto da linha i = texts.bin[offsets[i]:offsets[i+1]]
+    ids.npy        int64 (n,)   — IDs FAISS, ordenados (lookup por busca binária)
+    source.npy     int32 (n,)   — índice na tabela de fontes (sources.json)
+    flags.npy      uint8 (n,)   — bitmask: FLAG_PROJECT | FLAG_FALLBACK
+    hashes.npy     S64  (n,)    — sha256 hex do texto (reuso de vetores no rebuild incremental)
+    tokens.npy     int32 (n,)   — tokens estimados do chunk (orçamento de contexto sem re-tokenizar)
+    duplicate_of.npy int64 (n,) — ID do chunk canônico, ou -1 (quase duplicatas: rag_dedup)
+    vectors.npy    float32|float16 (n, d) — embeddings, fonte para (re)construir qualquer engine
+    sources.json   tabela de fontes internadas (cada `source` aparece uma única vez)
+
+Abertura é O(1): os `.npy` são abertos com mmap_mode="r" e o blob de textos via
+mmap — só as páginas dos chunks efetivamente recuperados são lidas do disco.
+"""
+import json
+import mmap
+import os
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+FLAG_PROJECT = 1 << 0
+FLAG_FALLBACK = 1 << 1
+
+
+def _write_npy(path: Path, array: np.ndarray) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+def _write_bytes(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ChunkStore(Mapping):
+    """
+    Mapping somente-leitura {id FAISS: metadata do chunk} sobre arquivos memory-mapped.
+
+    `store[id]` monta o dict do chunk sob demanda (text, source, is_project,
+    is_fallback, chunk_hash, token_count, duplicate_of, id) — o mesmo formato usado no build.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.ids: np.ndarray = np.load(self.directory / "ids.npy", mmap_mode="r")
+        self.offsets: np.ndarray = np.load(self.directory / "offsets.npy", mmap_mode="r")
+        self.source_idx: np.ndarray = np.load(self.directory / "source.npy", mmap_mode="r")
+        self.flags: np.ndarray = np.load(self.directory / "flags.npy", mmap_mode="r")
+        self.hashes: np.ndarray = np.load(self.directory / "hashes.npy", mmap_mode="r")
+        self.tokens: np.ndarray = np.load(self.directory / "tokens.npy", mmap_mode="r")
+        dup_path = self.directory / "duplicate_of.npy"
+        # Stores anteriores ao colapso de duplicatas: todos os chunks são canônicos
+        self.duplicate_of: np.ndarray = (
+            np.load(dup_path, mmap_mode="r") if dup_path.exists() else np.full(len(self.ids), -1, dtype="int64")
+        )
+        self._alternates: Optional[Dict[int, List[int]]] = None
+        # Só é lido no build/troca de engine; em runtime as páginas nem são carregadas
+        self.vectors: np.ndarray = np.load(self.directory / "vectors.npy", mmap_mode="r")
+        with open(self.directory / "sources.json", "r", encoding="utf-8") as f:
+            self.sources: List[str] = json.load(f)
+
+        self._texts_file = open(self.directory / "texts.bin", "rb")
+        size = os.fstat(self._texts_file.fileno()).st_size
+        # mmap não aceita arquivo vazio (store sem chunks)
+        self._texts = mmap.mmap(self._texts_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    @classmethod
+    def open(cls, directory) -> "ChunkStore":
+        return cls(Path(directory))
+
+    @staticmethod
+    def exists(directory) -> bool:
+        return (Path(directory) / "ids.npy").exists()
+
+    @staticmethod
+    def write(directory, chunks: Mapping, vectors: Mapping, vector_dtype: str = "float32") -> None:
+        """
+        Serializa {id: meta} e {id: vetor} no layout colunar.
+        Cada arquivo é gravado via tmp + rename. `vector_dtype="float16"` corta pela metade
+        o espaço dos vetores (usados só em rebuilds, que os convertem de volta para float32).
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        ids = sorted(int(i) for i in chunks)
+        n = len(ids)
+        offsets = np.zeros(n + 1, dtype="int64")
+        source_idx = np.zeros(n, dtype="int32")
+        flags = np.zeros(n, dtype="uint8")
+        hashes = np.zeros(n, dtype="S64")
+        tokens = np.zeros(n, dtype="int32")
+        duplicate_of = np.full(n, -1, dtype="int64")
+        sources: List[str] = []
+        source_pos: Dict[str, int] = {}
+        blob = bytearray()
+
+        for row, chunk_id in enumerate(ids):
+            meta = chunks[chunk_id]
+            blob += meta["text"].encode("utf-8")
+            offsets[row + 1] = len(blob)
+            source = meta.get("source", "")
+            if source not in source_pos:
+                source_pos[source] = len(sources)
+                sources.append(source)
+            source_idx[row] = source_pos[source]
+            flags[row] = (FLAG_PROJECT if meta.get("is_project") else 0) | (
+                FLAG_FALLBACK if meta.get("is_fallback") else 0
+            )
+            hashes[row] = (meta.get("chunk_hash") or "").encode("ascii")
+            tokens[row] = meta.get("token_count", 0)
+            if meta.get("duplicate_of") is not None:
+                duplicate_of[row] = meta["duplicate_of"]
+
+        _write_bytes(directory / "texts.bin", bytes(blob))
+        _write_npy(directory / "offsets.npy", offsets)
+        _write_npy(directory / "source.npy", source_idx)
+        _write_npy(directory / "flags.npy", flags)
+        _write_npy(directory / "hashes.npy", hashes)
+        _write_npy(directory / "tokens.npy", tokens)
+        _write_npy(directory / "duplicate_of.npy", duplicate_of)
+        if ids:
+            matrix = np.stack([np.asarray(vectors[i], dtype=vector_dtype) for i in ids])
+        else:
+            matrix = np.zeros((0, 0), dtype=vector_dtype)
+        _write_npy(directory / "vectors.npy", matrix)
+        _write_bytes(directory / "sources.json", json.dumps(sources, ensure_ascii=False).encode("utf-8"))
+        # ids por último: é o arquivo usado por `exists()`
+        _write_npy(directory / "ids.npy", np.array(ids, dtype="int64"))
+
+    def close(self) -> None:
+        if isinstance(self._texts, mmap.mmap):
+            self._texts.close()
+        self._texts_file.close()
+
+    # -----------------------------------------------------------------------
+    # Acesso por linha / id
+    # -----------------------------------------------------------------------
+
+    def _row(self, chunk_id: int) -> Optional[int]:
+        row = int(np.searchsorted(self.ids, chunk_id))
+        if row < len(self.ids) and int(self.ids[row]) == chunk_id:
+            return row
+        return None
+
+    def vector_map(self) -> Dict[int, np.ndarray]:
+        """Cópia em memória de {id: vetor} — usada só no build."""
+        vectors = np.array(self.vectors, dtype="float32")
+        return {chunk_id: vectors[row] for row, chunk_id in enumerate(self.ids.tolist())}
+
+    def text_at(self, row: int) -> str:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return bytes(self._texts[start:end]).decode("utf-8")
+
+    def source_at(self, row: int) -> str:
+        return self.sources[int(self.source_idx[row])]
+
+    def canonical_ids(self) -> np.ndarray:
+        """IDs dos chunks canônicos — exatamente os que estão no FAISS e no BM25."""
+        return np.asarray(self.ids)[np.asarray(self.duplicate_of) < 0]
+
+    def alternates_of(self, chunk_id: int) -> List[int]:
+        """IDs das duplicatas colapsadas no chunk canônico (ex.: a versão em inglês)."""
+        if self._alternates is None:
+            alternates: Dict[int, List[int]] = {}
+            dup = np.asarray(self.duplicate_of)
+            for row in np.flatnonzero(dup >= 0).tolist():
+                alternates.setdefault(int(dup[row]), []).append(int(self.ids[row]))
+            self._alternates = alternates
+        return self._alternates.get(int(chunk_id), [])
+
+    def meta_at(self, row: int) -> Dict:
+        flags = int(self.flags[row])
+        duplicate_of = int(self.duplicate_of[row])
+        return {
+            "id": int(self.ids[row]),
+            "text": self.text_at(row),
+            "source": self.source_at(row),
+            "is_project": bool(flags & FLAG_PROJECT),
+            "is_fallback": bool(flags & FLAG_FALLBACK),
+            "chunk_hash": self.hashes[row].decode("ascii"),
+            "token_count": int(self.tokens[row]),
+            "duplicate_of": duplicate_of if duplicate_of >= 0 else None,
+        }
+
+    # -----------------------------------------------------------------------
+    # Interface Mapping
+    # -----------------------------------------------------------------------
+
+    def __getitem__(self, chunk_id: int) -> Dict:
+        row = self._row(int(chunk_id))
+        if row is None:
+            raise KeyError(chunk_id)
+        return self.meta_at(row)
+
+    def __contains__(self, chunk_id) -> bool:
+        return self._row(int(chunk_id)) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def nbytes(self) -> int:
+        """Tamanho total dos arquivos do store em disco."""
+        return sum(p.stat().st_size for p in self.directory.iterdir() if p.is_file())
@@ -0,0 +1,167 @@
+"""
+Chunker estrutural (streaming) do RAG, com orçamento em tokens.
+
+Em vez de janelas fixas de N palavras, os chunks respeitam a estrutura do texto:
+
+1. Headings markdown (`#`…`######`) abrem uma nova seção → fecham o chunk corrente
+   (seções curtas consecutivas são agrupadas até 1/4 do orçamento). Dentro de blocos de
+   código (``` / ~~~) `#` é comentário, não heading, e o bloco fica num parágrafo só.
+2. Parágrafos (linhas em branco) são acumulados até o orçamento de tokens.
+3. Parágrafo maior que o orçamento é quebrado em frases; frase gigante, em palavras.
+
+Chunks que continuam uma seção recebem o heading dela no topo e as últimas frases
+do chunk anterior (overlap), para não perder o contexto do corte.
+
+Tudo é gerador: o texto é percorrido linha a linha sem materializar a lista de palavras.
+"""
+import math
+import re
+from typing import Iterator, List, Optional
+
+# Heurística de ~4 caracteres por token (mesma usada no token budget do AtendimentoService)
+CHARS_PER_TOKEN = 4
+
+_HEADING_RE = re.compile(r"^#{1,6}\s+\S")
+_FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_LINE_RE = re.compile(r"[^\n]*\n|[^\n]+$")
+_SENTENCE_RE = re.compile(r"[^.!?\n]+(?:[.!?]+|$)\s*")
+# Limite de frases candidatas a overlap guardadas por seção
+_MAX_OVERLAP_SENTENCES = 16
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa de tokens do texto (sem chamar o tokenizer da API)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _closes_fence(line: str, fence: str) -> bool:
+    """Fecha a cerca: só o mesmo caractere, com tamanho >= ao da abertura (sem info string)."""
+    stripped = line.strip()
+    return len(stripped) >= len(fence) and set(stripped) == {fence[0]}
+
+
+def iter_blocks(text: str) -> Iterator[tuple[str, str]]:
+    """
+    Percorre o texto linha a linha e gera blocos ("heading" | "paragraph", texto).
+    Linhas em branco separam parágrafos; headings são sempre um bloco próprio.
+    Um bloco de código cercado é mantido inteiro (com linhas em branco e `#`) no parágrafo.
+    """
+    paragraph: List[str] = []
+    fence: Optional[str] = None  # cerca aberta, ex.: "```" ou "~~~~"
+    for match in _LINE_RE.finditer(text):
+        line = match.group(0).rstrip()
+        fence_match = _FENCE_RE.match(line)
+        if fence is not None:
+            paragraph.append(line)
+            if _closes_fence(line, fence):
+                fence = None
+        elif fence_match:
+            fence = fence_match.group(1)
+            paragraph.append(line)
+        elif _HEADING_RE.match(line):
+            if paragraph:
+                yield "paragraph", "\n".join(paragraph)
+                paragraph = []
+            yield "heading", line
+        elif line.strip():
+            paragraph.append(line)
+        elif paragraph:
+            yield "paragraph", "\n".join(paragraph)
+            paragraph = []
+    if paragraph:
+        yield "paragraph", "\n".join(paragraph)
+
+
+def _split_oversized(text: str, max_tokens: int) -> Iterator[str]:
+    """Quebra um parágrafo grande em frases; frases maiores que o orçamento, em janelas de palavras."""
+    for match in _SENTENCE_RE.finditer(text):
+        sentence = match.group(0).strip()
+        if not sentence:
+            continue
+        if estimate_tokens(sentence) <= max_tokens:
+            yield sentence
+            continue
+        window: List[str] = []
+        size = 0
+        for word in sentence.split():
+            cost = estimate_tokens(word + " ")
+            if window and size + cost > max_tokens:
+                yield " ".join(window)
+                window, size = [], 0
+            window.append(word)
+            size += cost
+        if window:
+            yield " ".join(window)
+
+
+def chunk_text(text: str, max_tokens: int, overlap_tokens: int = 0, header: str = "") -> Iterator[str]:
+    """
+    Gera chunks de até ~`max_tokens` tokens respeitando headings, parágrafos e frases.
+
+    `header` (ex.: "--- Documento: X ---") é prefixado a todos os chunks e conta no orçamento.
+    `overlap_tokens` define quantas frases finais de um chunk são repetidas no próximo
+    quando o corte acontece no meio de uma seção.
+    """
+    header = header.rstrip("\n")
+    budget = max(1, max_tokens - (estimate_tokens(header) + 1 if header else 0))
+    # Abaixo disto um heading novo não fecha o chunk: evita chunks de uma linha só
+    min_tokens = budget // 4
+
+    parts: List[str] = []
+    size = 0
+    heading: Optional[str] = None
+    # Frases que podem ser repetidas como overlap (só texto corrido, nunca headings)
+    tail: List[str] = []
+
+    def render() -> str:
+        body = "\n\n".join(parts)
+        return f"{header}\n{body}" if header else body
+
+    def start_continuation() -> None:
+        nonlocal parts, size, tail
+        carry: List[str] = []
+        carry_size = 0
+        for sentence in reversed(tail):
+            cost = estimate_tokens(sentence) + 1
+            if carry_size + cost > overlap_tokens:
+                break
+            carry.insert(0, sentence)
+            carry_size += cost
+        parts = [heading] if heading else []
+        size = estimate_tokens(heading) + 1 if heading else 0
+        if carry:
+            parts.append(" ".join(carry))
+            size += carry_size
+        tail = []
+
+    for kind, block in iter_blocks(text):
+        if kind == "heading":
+            # Nova seção: fecha o chunk corrente se ele já tiver tamanho mínimo
+            if parts and size >= min_tokens:
+                yield render()
+                parts, size, tail = [], 0, []
+            heading = block
+            parts.append(block)
+            size += estimate_tokens(block) + 1
+            continue
+
+        pieces = (block,) if estimate_tokens(block) <= budget else _split_oversized(block, budget)
+        continues_block = False
+        for piece in pieces:
+            cost = estimate_tokens(piece) + 1
+            if parts and size + cost > budget:
+                yield render()
+                start_continuation()
+                continues_block = False
+            if continues_block:
+                # Frases do mesmo parágrafo continuam na mesma linha
+                parts[-1] = f"{parts[-1]} {piece}"
+            else:
+                parts.append(piece)
+            continues_block = True
+            size += cost
+            tail.extend(m.group(0).strip() for m in _SENTENCE_RE.finditer(piece) if m.group(0).strip())
+            del tail[:-_MAX_OVERLAP_SENTENCES]
+
+    if parts:
+        yield render()
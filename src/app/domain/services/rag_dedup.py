@@ -0,0 +1,138 @@
+"""
+Colapso de chunks quase duplicados no build do índice.
+
+O portfólio tem o mesmo conteúdo em mais de uma fonte: `X.md` e `X-english.md`, o
+currículo em markdown e em PDF, trechos de boilerplate repetidos entre projetos. Sem
+colapso, essas cópias disputam o top-k e gastam tokens do prompt com o mesmo fato.
+
+Pares candidatos saem de uma busca por raio (cosseno) sobre os embeddings já calculados.
+Um par é duplicata quando:
+
+- é texto quase igual — SimHash de 64 bits dos 3-shingles de palavras a no máximo
+  `max_hamming` bits — e o cosseno confirma (`min_cosine`); ou
+- as fontes são variantes de idioma do mesmo documento (`X.md` ↔ `X-english.md`) e o
+  cosseno passa de `translation_cosine` (tradução: o texto não casa, o embedding sim).
+
+Cada grupo tem um chunk canônico (PT antes de EN, markdown antes de PDF, menor ID), e só
+entra nele quem é duplicata direta do canônico: sem fecho transitivo. As duplicatas ficam
+no ChunkStore com `duplicate_of` apontando para ele — fora do FAISS e do BM25, mas
+disponíveis para servir o texto no idioma da pergunta.
+"""
+import hashlib
+import re
+from dataclasses import asdict, dataclass
+from typing import Dict, Mapping, Set
+
+import faiss
+import numpy as np
+
+from app.domain.services.rag_embedder import normalize_query
+from app.domain.services.rag_filters import source_lang
+
+_WORD_RE = re.compile(r"\w+")
+_SHINGLE = 3
+
+
+@dataclass(frozen=True)
+class DedupConfig:
+    """Limiares do colapso (gravados no manifest: mudou → o próximo reindex recalcula os grupos)."""
+
+    enabled: bool = True
+    max_hamming: int = 6
+    min_cosine: float = 0.95
+    translation_cosine: float = 0.88
+
+    @classmethod
+    def from_settings(cls) -> "DedupConfig":
+        from app.infrastructure.config.settings import settings
+
+        return cls(
+            enabled=settings.rag_dedup_enabled,
+            max_hamming=settings.rag_dedup_max_hamming,
+            min_cosine=settings.rag_dedup_min_cosine,
+            translation_cosine=settings.rag_dedup_translation_cosine,
+        )
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def simhash(text: str) -> int:
+    """SimHash de 64 bits dos 3-shingles de palavras do texto normalizado."""
+    words = _WORD_RE.findall(normalize_query(text))
+    if len(words) < _SHINGLE:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i: i + _SHINGLE]) for i in range(len(words) - _SHINGLE + 1)]
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles)
+    # Bit i do hash de cada shingle vota +1/-1; o bit i do SimHash é o sinal da soma
+    bits = np.unpackbits(np.frombuffer(digests, dtype="uint8").reshape(-1, 8), axis=1, bitorder="little")
+    majority = bits.sum(axis=0, dtype="int64") * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority, bitorder="little").tobytes(), "little")
+
+
+def _document_key(source: str) -> str:
+    """Identidade do documento independente do idioma: "projects/x-english.md" → "projects/x"."""
+    stem = source.rsplit(".", 1)[0].lower()
+    return stem[: -len("-english")] if stem.endswith("-english") else stem
+
+
+def _canonical_rank(chunk_id: int, meta: Mapping) -> tuple:
+    source = meta.get("source", "")
+    return (source_lang(source) != "pt", source.lower().endswith(".pdf"), chunk_id)
+
+
+def find_duplicates(
+    chunks: Mapping[int, Dict], vectors: Mapping[int, np.ndarray], config: DedupConfig
+) -> Dict[int, int]:
+    """
+    {id duplicado: id canônico} para todos os chunks que colapsam em outro. Cada duplicado
+    passa no teste diretamente contra o seu canônico; chunks da mesma fonte nunca colapsam
+    entre si.
+    """
+    ids = sorted(i for i in chunks if i in vectors)
+    if not config.enabled or len(ids) < 2:
+        return {}
+
+    matrix = np.stack([np.asarray(vectors[i], dtype="float32") for i in ids])
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    index = faiss.IndexFlatIP(matrix.shape[1])
+    index.add(matrix)
+    radius = min(config.min_cosine, config.translation_cosine)
+    lims, sims, neighbors = index.range_search(matrix, radius)
+
+    sources = [chunks[i].get("source", "") for i in ids]
+    doc_keys = [_document_key(s) for s in sources]
+    hashes: Dict[int, int] = {}
+
+    def _hash(row: int) -> int:
+        if row not in hashes:
+            hashes[row] = simhash(chunks[ids[row]]["text"])
+        return hashes[row]
+
+    # Grupos formados contra o canônico: as linhas são visitadas da melhor para a pior
+    # (_canonical_rank); a primeira livre vira canônico e absorve os vizinhos livres que
+    # passam no teste *com ela*. Sem fecho transitivo: A≈B e B≈C não colapsam A com C.
+    order = sorted(range(len(ids)), key=lambda r: _canonical_rank(ids[r], chunks[ids[r]]))
+    assigned = [False] * len(ids)
+    duplicates: Dict[int, int] = {}
+    for row in order:
+        if assigned[row]:
+            continue
+        assigned[row] = True
+        for pos in range(lims[row], lims[row + 1]):
+            other = int(neighbors[pos])
+            if assigned[other] or sources[other] == sources[row]:
+                continue
+            sim = float(sims[pos])
+            translation = doc_keys[other] == doc_keys[row] and sim >= config.translation_cosine
+            near_text = sim >= config.min_cosine and bin(_hash(row) ^ _hash(other)).count("1") <= config.max_hamming
+            if translation or near_text:
+                assigned[other] = True
+                duplicates[ids[other]] = ids[row]
+    return duplicates
+
+
+def canonical_ids(chunks: Mapping[int, Dict]) -> Set[int]:
+    """IDs que vão para o FAISS e o BM25 (chunks sem `duplicate_of`)."""
+    return {i for i, meta in chunks.items() if meta.get("duplicate_of") is None}
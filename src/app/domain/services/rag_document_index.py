@@ -0,0 +1,151 @@
+"""
+Índice de documentos do RAG: 1º estágio do retrieval hierárquico.
+
+Um vetor por arquivo-fonte (markdown ou PDF) — a média normalizada dos embeddings dos
+seus chunks, que já existem no build: nenhum texto extra vai para a API. O retrieval
+hierárquico escolhe primeiro os `top_docs` documentos mais próximos da query (cosseno
+contra uma matriz de N documentos, N ≪ chunks) e depois ranqueia por distância L2 exata
+só os chunks desses documentos, lendo os vetores do ChunkStore (mmap).
+
+Layout persistido (`documents.npz`):
+
+    sources       str     (D,)    fonte de cada documento (mesma string da metadata dos chunks)
+    kinds, langs  str     (D,)    partição do documento (rag_filters)
+    vectors       float32 (D, d)  centroide normalizado dos chunks
+    chunk_offsets int64   (D+1,)  chunks do documento j = chunk_ids[chunk_offsets[j]:chunk_offsets[j+1]]
+    chunk_ids     int64   (C,)    IDs FAISS (canônicos), ordenados dentro de cada documento
+"""
+import os
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from app.domain.services.rag_filters import RetrievalFilter, source_kind, source_lang
+
+
+class DocumentIndex:
+    """Centroides por documento e o mapa documento → chunks de uma versão do índice."""
+
+    def __init__(
+        self,
+        sources: List[str],
+        kinds: List[str],
+        langs: List[str],
+        vectors: np.ndarray,
+        chunk_offsets: np.ndarray,
+        chunk_ids: np.ndarray,
+    ):
+        self.sources = list(sources)
+        self.kinds = np.asarray(kinds, dtype=str)
+        self.langs = np.asarray(langs, dtype=str)
+        self.vectors = np.ascontiguousarray(vectors, dtype="float32")
+        self.chunk_offsets = np.asarray(chunk_offsets, dtype="int64")
+        self.chunk_ids = np.asarray(chunk_ids, dtype="int64")
+        self._masks: Dict[RetrievalFilter, np.ndarray] = {}
+
+    @classmethod
+    def build(cls, chunks: Mapping[int, Dict], vectors: Mapping[int, np.ndarray]) -> "DocumentIndex":
+        """Agrupa os chunks por `source` e calcula o centroide de cada documento."""
+        groups: Dict[str, List[int]] = {}
+        for chunk_id in sorted(chunks):
+            groups.setdefault(chunks[chunk_id].get("source", ""), []).append(chunk_id)
+
+        sources, kinds, langs, rows, offsets, ids = [], [], [], [], [0], []
+        for source, members in groups.items():
+            meta = chunks[members[0]]
+            matrix = np.stack([np.asarray(vectors[i], dtype="float32") for i in members])
+            sources.append(source)
+            kinds.append(source_kind(source, meta.get("is_project", False), meta.get("is_fallback", False)))
+            langs.append(source_lang(source))
+            rows.append(_normalize(matrix).mean(axis=0))
+            # Duplicatas colapsadas (rag_dedup) são servidas pelo chunk canônico
+            canonical = {i if chunks[i].get("duplicate_of") is None else chunks[i]["duplicate_of"] for i in members}
+            ids.extend(sorted(canonical))
+            offsets.append(len(ids))
+
+        dim = rows[0].shape[0] if rows else 0
+        centroids = _normalize(np.stack(rows)) if rows else np.zeros((0, dim), dtype="float32")
+        return cls(sources, kinds, langs, centroids, np.array(offsets), np.array(ids, dtype="int64"))
+
+    @classmethod
+    def load(cls, path) -> "DocumentIndex":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["sources"].tolist(),
+                data["kinds"],
+                data["langs"],
+                data["vectors"],
+                data["chunk_offsets"],
+                data["chunk_ids"],
+            )
+
+    def save(self, path) -> None:
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                sources=np.array(self.sources, dtype=str),
+                kinds=self.kinds,
+                langs=self.langs,
+                vectors=self.vectors,
+                chunk_offsets=self.chunk_offsets,
+                chunk_ids=self.chunk_ids,
+            )
+        os.replace(tmp, path)
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    @property
+    def dimension(self) -> int:
+        return self.vectors.shape[1]
+
+    def _mask(self, filters: RetrievalFilter) -> np.ndarray:
+        mask = self._masks.get(filters)
+        if mask is None:
+            mask = np.array([filters.matches(k, l) for k, l in zip(self.kinds, self.langs)], dtype=bool)
+            self._masks[filters] = mask
+        return mask
+
+    def search(self, query_vec: np.ndarray, top_docs: int, filters: Optional[RetrievalFilter] = None) -> np.ndarray:
+        """Posições dos `top_docs` documentos mais próximos da query (cosseno), do melhor ao pior."""
+        if not len(self):
+            return np.zeros(0, dtype="int64")
+        sims = self.vectors @ np.asarray(query_vec, dtype="float32").reshape(-1)
+        if filters is not None:
+            sims = np.where(self._mask(filters), sims, -np.inf)
+        top_docs = min(top_docs, len(self))
+        top = np.argpartition(-sims, top_docs - 1)[:top_docs]
+        top = top[np.isfinite(sims[top])]
+        return top[np.argsort(-sims[top])]
+
+    def candidate_ids(self, docs: np.ndarray) -> np.ndarray:
+        """IDs dos chunks dos documentos escolhidos (ordenados, para lookup no ChunkStore)."""
+        if not len(docs):
+            return np.zeros(0, dtype="int64")
+        parts = [self.chunk_ids[self.chunk_offsets[d]: self.chunk_offsets[d + 1]] for d in docs]
+        return np.unique(np.concatenate(parts))
+
+
+def exact_rerank(
+    candidate_vectors: np.ndarray, candidate_ids: np.ndarray, query_vec: np.ndarray, k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    2º estágio: distância L2² exata (a mesma métrica do FAISS) entre a query e os candidatos.
+    Retorna (distâncias, ids) dos k mais próximos, do mais próximo ao mais distante.
+    """
+    if not len(candidate_ids):
+        return np.zeros(0, dtype="float32"), np.zeros(0, dtype="int64")
+    diff = np.asarray(candidate_vectors, dtype="float32") - np.asarray(query_vec, dtype="float32").reshape(1, -1)
+    distances = np.einsum("ij,ij->i", diff, diff)
+    k = min(k, len(distances))
+    top = np.argpartition(distances, k - 1)[:k]
+    top = top[np.argsort(distances[top])]
+    return distances[top], candidate_ids[top]
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return (matrix / np.maximum(norms, 1e-12)).astype("float32")
@@ -0,0 +1,493 @@
+"""
+Embedders plugáveis do PortfolioRAG.
+
+`PortfolioRAG` não fala mais direto com `client.models.embed_content`: recebe um
+objeto que implementa o protocolo `Embedder`. Em produção é o `GeminiEmbedder`
+(lotes + concorrência limitada + retry com backoff em rate limit); em testes e
+benchmarks, o `HashingEmbedder` gera vetores locais determinísticos, sem rede.
+O `QueryEmbeddingCache` evita re-embedar queries repetidas no caminho de retrieval.
+"""
+import asyncio
+import hashlib
+import logging
+import random
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Protocol, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Limite de itens por chamada batchEmbedContents na API Gemini.
+GEMINI_MAX_BATCH_SIZE = 100
+
+# Códigos HTTP que valem retry: rate limit (429) e falhas transitórias do servidor.
+_RETRYABLE_CODES = {429, 500, 502, 503, 504}
+_RETRYABLE_STATUS = {"RESOURCE_EXHAUSTED", "UNAVAILABLE", "INTERNAL", "DEADLINE_EXCEEDED"}
+
+
+class Embedder(Protocol):
+    """Contrato mínimo usado pelo PortfolioRAG para gerar embeddings."""
+
+    model_name: str
+    # Distância L2 (ao quadrado) máxima de um chunk relevante na busca exata (índice Flat).
+    # Depende do modelo: com vetores normalizados, L2² = 2 - 2·cos, então a dimensão pouco muda.
+    max_l2_distance: float
+
+    def embed_documents(self, texts: Sequence[str]) -> np.ndarray:
+        """Retorna matriz float32 (len(texts), dim), na mesma ordem de `texts`."""
+        ...
+
+    async def embed_query(self, text: str) -> np.ndarray:
+        """Retorna vetor float32 (dim,) para a query."""
+        ...
+
+    async def embed_queries(self, texts: Sequence[str]) -> np.ndarray:
+        """Retorna matriz float32 (len(texts), dim) de queries, numa ida à API sempre que possível."""
+        ...
+
+    def embed_queries_sync(self, texts: Sequence[str]) -> np.ndarray:
+        """Como `embed_queries` (mesmo espaço de query), síncrono: para o build, fora do event loop."""
+        ...
+
+
+def _is_retryable(exc: Exception) -> bool:
+    """Identifica rate limit / indisponibilidade transitória da API de embeddings."""
+    code = getattr(exc, "code", None)
+    status = str(getattr(exc, "status", "") or "").upper()
+    if code in _RETRYABLE_CODES or status in _RETRYABLE_STATUS:
+        return True
+    msg = str(exc).upper()
+    return "RESOURCE_EXHAUSTED" in msg or "429" in msg or "RATE LIMIT" in msg
+
+
+def _backoff_delay(attempt: int, base: float, cap: float = 30.0) -> float:
+    """Backoff exponencial com jitter: base, 2*base, 4*base... (limitado por `cap`)."""
+    delay = min(cap, base * (2 ** attempt))
+    return delay * (0.5 + random.random() / 2)
+
+
+class GeminiEmbedder:
+    """
+    Embeddings via Gemini com envio em lotes e concorrência limitada.
+
+    - `embed_documents`: divide os textos em lotes de `batch_size`, envia até
+      `concurrency` lotes em paralelo (ThreadPoolExecutor — o SDK síncrono é I/O bound)
+      e re-tenta cada lote com backoff exponencial em 429/5xx.
+    - `embed_query`: chamada assíncrona única (client.aio), com o mesmo retry.
+    - `embed_queries`: várias queries por chamada (até 100), lotes em sequência.
+    - `embed_queries_sync`: task RETRIEVAL_QUERY pelo caminho síncrono em lotes (centroides
+      de intenção, comparados com vetores de query).
+    - `output_dimensionality`: dimensão reduzida (Matryoshka) pedida à API. Só a saída
+      nativa vem normalizada, então os vetores truncados são re-normalizados aqui.
+      A dimensão entra no `model_name` (ex.: "gemini-embedding-001-768d"), que identifica
+      o espaço vetorial no manifest do índice.
+    - `max_l2_distance`: threshold do retrieval no índice exato. O padrão foi calibrado no
+      gemini-embedding-001 (768d); com outra dimensão, recalibre com
+      `scripts/bench_rag_retrieval.py --max-l2` e ajuste `RAG_EMBED_MAX_L2_DISTANCE`.
+    """
+
+    DEFAULT_MAX_L2_DISTANCE = 1.2
+
+    def __init__(
+        self,
+        client=None,
+        model_name: str = "gemini-embedding-001",
+        batch_size: int = 32,
+        concurrency: int = 4,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        output_dimensionality: Optional[int] = None,
+        max_l2_distance: Optional[float] = None,
+    ):
+        if client is None:
+            from google import genai
+            from app.infrastructure.config.settings import settings
+
+            client = genai.Client(api_key=settings.gemini_api_key)
+        self.client = client
+        self.model = model_name
+        self.output_dimensionality = output_dimensionality
+        self.model_name = f"{model_name}-{output_dimensionality}d" if output_dimensionality else model_name
+        self.max_l2_distance = max_l2_distance or self.DEFAULT_MAX_L2_DISTANCE
+        self.batch_size = max(1, min(batch_size, GEMINI_MAX_BATCH_SIZE))
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+
+    def _config(self, task_type: str):
+        from google.genai import types
+
+        return types.EmbedContentConfig(task_type=task_type, output_dimensionality=self.output_dimensionality)
+
+    def _normalize(self, matrix: np.ndarray) -> np.ndarray:
+        if not self.output_dimensionality or not matrix.size:
+            return matrix
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return (matrix / np.maximum(norms, 1e-12)).astype("float32")
+
+    def _with_retry(self, fn: Callable[[], T], descricao: str) -> T:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                delay = _backoff_delay(attempt, self.backoff_base)
+                logger.warning(
+                    f"Embeddings: {descricao} falhou ({e}). "
+                    f"Tentativa {attempt + 1}/{self.max_retries}, aguardando {delay:.1f}s..."
+                )
+                time.sleep(delay)
+        raise RuntimeError("unreachable")
+
+    def _embed_batch(self, batch: Sequence[str], task_type: str) -> List[List[float]]:
+        response = self.client.models.embed_content(
+            model=self.model,
+            contents=list(batch),
+            config=self._config(task_type),
+        )
+        vectors = [e.values for e in response.embeddings]
+        if len(vectors) != len(batch):
+            raise ValueError(f"API retornou {len(vectors)} embeddings para lote de {len(batch)} textos")
+        return vectors
+
+    def embed_documents(self, texts: Sequence[str]) -> np.ndarray:
+        return self._embed_sync(texts, "RETRIEVAL_DOCUMENT")
+
+    def embed_queries_sync(self, texts: Sequence[str]) -> np.ndarray:
+        return self._embed_sync(texts, "RETRIEVAL_QUERY")
+
+    def _embed_sync(self, texts: Sequence[str], task_type: str) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        batches = [texts[i: i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+        def _run(idx_batch):
+            idx, batch = idx_batch
+            vectors = self._with_retry(lambda: self._embed_batch(batch, task_type), f"lote {idx + 1}/{len(batches)}")
+            logger.info(f"Embeddings: lote {idx + 1}/{len(batches)} ({len(batch)} chunks) ok")
+            return vectors
+
+        if self.concurrency == 1 or len(batches) == 1:
+            results = [_run(item) for item in enumerate(batches)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+                # map() preserva a ordem dos lotes, mesmo com conclusão fora de ordem
+                results = list(pool.map(_run, enumerate(batches)))
+
+        return self._normalize(np.array([v for batch in results for v in batch], dtype="float32"))
+
+    async def embed_query(self, text: str) -> np.ndarray:
+        return (await self._embed_query_batch(text))[0]
+
+    async def embed_queries(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        batches = [
+            await self._embed_query_batch(list(texts[i: i + GEMINI_MAX_BATCH_SIZE]))
+            for i in range(0, len(texts), GEMINI_MAX_BATCH_SIZE)
+        ]
+        return np.concatenate(batches)
+
+    async def _embed_query_batch(self, contents) -> np.ndarray:
+        """Uma chamada embed_content com task RETRIEVAL_QUERY (texto único ou lista), com retry."""
+        expected = 1 if isinstance(contents, str) else len(contents)
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.aio.models.embed_content(
+                    model=self.model,
+                    contents=contents,
+                    config=self._config("RETRIEVAL_QUERY"),
+                )
+                if len(response.embeddings) != expected:
+                    raise ValueError(f"API retornou {len(response.embeddings)} embeddings para {expected} queries")
+                return self._normalize(np.array([e.values for e in response.embeddings], dtype="float32"))
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                delay = _backoff_delay(attempt, self.backoff_base)
+                logger.warning(f"Embeddings: query falhou ({e}), nova tentativa em {delay:.1f}s...")
+                await asyncio.sleep(delay)
+        raise RuntimeError("unreachable")
+
+
+class HashingEmbedder:
+    """
+    Embedder local e determinístico (feature hashing de palavras + trigramas).
+
+    Não tem qualidade semântica de um modelo real, mas textos com vocabulário
+    parecido ficam próximos — suficiente para testes, benchmarks e rodar o RAG
+    sem chave da API. Vetores saem normalizados (norma L2 = 1).
+    `max_l2_distance` padrão: o do golden set em `scripts/bench_rag_retrieval.py` (256d).
+    """
+
+    DEFAULT_MAX_L2_DISTANCE = 1.2
+
+    def __init__(
+        self,
+        dimension: int = 256,
+        model_name: str = "local-hashing",
+        latency: float = 0.0,
+        max_l2_distance: Optional[float] = None,
+    ):
+        self.dimension = dimension
+        self.model_name = f"{model_name}-{dimension}d"
+        self.max_l2_distance = max_l2_distance or self.DEFAULT_MAX_L2_DISTANCE
+        # Latência artificial por chamada (simula round-trip de rede em benchmarks)
+        self.latency = latency
+
+    def _features(self, text: str) -> List[str]:
+        text = unicodedata.normalize("NFKD", text.lower())
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+        words = re.findall(r"\w+", text)
+        feats = list(words)
+        for word in words:
+            padded = f"#{word}#"
+            feats.extend(padded[i: i + 3] for i in range(len(padded) - 2))
+        return feats
+
+    def _vector(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dimension, dtype="float32")
+        for feat in self._features(text):
+            digest = hashlib.blake2b(feat.encode("utf-8"), digest_size=8).digest()
+            h = int.from_bytes(digest, "little")
+            vec[h % self.dimension] += 1.0 if (h >> 63) & 1 else -1.0
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    def embed_documents(self, texts: Sequence[str]) -> np.ndarray:
+        if self.latency:
+            time.sleep(self.latency)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype="float32")
+        return np.stack([self._vector(t) for t in texts]).astype("float32")
+
+    async def embed_query(self, text: str) -> np.ndarray:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._vector(text)
+
+    async def embed_queries(self, texts: Sequence[str]) -> np.ndarray:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype="float32")
+        return np.stack([self._vector(t) for t in texts]).astype("float32")
+
+    def embed_queries_sync(self, texts: Sequence[str]) -> np.ndarray:
+        # Sem task type: query e documento caem no mesmo espaço
+        return self.embed_documents(texts)
+
+
+def build_default_embedder(client=None) -> GeminiEmbedder:
+    """Instancia o GeminiEmbedder com os parâmetros de settings."""
+    from app.infrastructure.config.settings import settings
+
+    return GeminiEmbedder(
+        client=client,
+        batch_size=settings.rag_embed_batch_size,
+        concurrency=settings.rag_embed_concurrency,
+        max_retries=settings.rag_embed_max_retries,
+        output_dimensionality=settings.rag_embed_dimensions,
+        max_l2_distance=settings.rag_embed_max_l2_distance,
+    )
+
+
+def normalize_query(text: str) -> str:
+    """Chave canônica de query: minúsculas, sem acentos e com espaços colapsados."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.split())
+
+
+class QueryEmbeddingCache:
+    """
+    Cache LRU + TTL de vetores de query, com single-flight.
+
+    - Chave: `normalize_query(query)` — "Quais Projetos?" e "quais  projetos?" compartilham o vetor.
+    - LRU limitado a `maxsize` entradas; cada entrada expira após `ttl` segundos.
+    - Single-flight: queries idênticas concorrentes aguardam a mesma task em vez de
+      disparar N chamadas ao embedder. Falhas não são cacheadas (todos recebem o erro);
+      cancelamento de um chamador não atinge os demais.
+
+    Todo o estado é manipulado sem `await` entre leitura e escrita, então é seguro
+    no event loop sem locks.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._inflight: Dict[str, "asyncio.Future[np.ndarray]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _get_fresh(self, key: str) -> Optional[np.ndarray]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, vec = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return vec
+
+    def _store(self, key: str, vec: np.ndarray) -> None:
+        vec.flags.writeable = False  # o mesmo array é compartilhado entre chamadas
+        self._entries[key] = (time.monotonic() + self.ttl, vec)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _track(self, key: str, future: "asyncio.Future[np.ndarray]") -> None:
+        """Registra o cálculo em voo da chave; sai de `_inflight` quando termina."""
+        self._inflight[key] = future
+
+        def _done(f: "asyncio.Future[np.ndarray]") -> None:
+            if self._inflight.get(key) is f:
+                del self._inflight[key]
+            if not f.cancelled():
+                f.exception()  # evita "Future exception was never retrieved" quando ninguém aguardava
+
+        future.add_done_callback(_done)
+
+    def _inflight_for(self, key: str) -> Optional["asyncio.Future[np.ndarray]"]:
+        future = self._inflight.get(key)
+        if future is not None and future.cancelled():
+            self._inflight.pop(key, None)
+            return None
+        return future
+
+    @staticmethod
+    def _shared_was_cancelled(future: "asyncio.Future") -> bool:
+        """CancelledError veio do cálculo compartilhado (retry), não do chamador (propaga)."""
+        task = asyncio.current_task()
+        return future.cancelled() and not (task is not None and task.cancelling())
+
+    async def _compute_and_store(
+        self, key: str, query: str, compute: Callable[[str], Awaitable[np.ndarray]]
+    ) -> np.ndarray:
+        vec = await compute(query)
+        self._store(key, vec)
+        return vec
+
+    async def get_or_compute(
+        self, query: str, compute: Callable[[str], Awaitable[np.ndarray]]
+    ) -> np.ndarray:
+        """
+        Vetor da query. O cálculo roda numa task compartilhada e cada chamador (inclusive
+        quem a criou) aguarda via `asyncio.shield`: cancelar um chamador não cancela o
+        embedding dos demais. Se a própria task for cancelada, quem aguardava tenta de novo.
+        """
+        key = normalize_query(query)
+        while True:
+            vec = self._get_fresh(key)
+            if vec is not None:
+                self.hits += 1
+                return vec
+
+            future = self._inflight_for(key)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                future = asyncio.ensure_future(self._compute_and_store(key, query, compute))
+                self._track(key, future)
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not self._shared_was_cancelled(future):
+                    raise
+
+    async def get_or_compute_many(
+        self, queries: Sequence[str], compute_many: Callable[[List[str]], Awaitable[np.ndarray]]
+    ) -> List[np.ndarray]:
+        """
+        Vetores de várias queries, na ordem recebida. Hits e queries já em voo não são
+        recalculadas; as demais (sem repetição) vão juntas numa única chamada de `compute_many`,
+        com o mesmo isolamento de cancelamento de `get_or_compute`.
+        """
+        keys = [normalize_query(q) for q in queries]
+        query_by_key = dict(zip(keys, queries))
+        vectors: Dict[str, np.ndarray] = {}
+        waiting: Dict[str, "asyncio.Future[np.ndarray]"] = {}
+        missing: Dict[str, str] = {}
+        for key, query in zip(keys, queries):
+            if key in vectors or key in waiting or key in missing:
+                continue
+            vec = self._get_fresh(key)
+            future = self._inflight_for(key) if vec is None else None
+            if vec is not None:
+                self.hits += 1
+                vectors[key] = vec
+            elif future is not None:
+                self.coalesced += 1
+                waiting[key] = future
+            else:
+                self.misses += 1
+                missing[key] = query
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in missing}
+            for key, future in futures.items():
+                self._track(key, future)
+            batch = asyncio.ensure_future(compute_many(list(missing.values())))
+
+            def _distribute(b: "asyncio.Future[np.ndarray]") -> None:
+                try:
+                    if b.cancelled():
+                        for future in futures.values():
+                            future.cancel()
+                        return
+                    matrix = b.result()
+                    for row, key in enumerate(missing):
+                        vec = np.array(matrix[row], dtype="float32")
+                        self._store(key, vec)
+                        futures[key].set_result(vec)
+                except Exception as e:
+                    for future in futures.values():
+                        if not future.done():
+                            future.set_exception(e)
+
+            batch.add_done_callback(_distribute)
+            waiting.update(futures)
+
+        async def _one(query: str) -> np.ndarray:
+            return np.array((await compute_many([query]))[0], dtype="float32")
+
+        for key, future in waiting.items():
+            try:
+                vectors[key] = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not self._shared_was_cancelled(future):
+                    raise
+                vectors[key] = await self.get_or_compute(query_by_key[key], _one)
+        return [vectors[key] for key in keys]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.coalesced) / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,126 @@
+"""
+Filtros de retrieval por tipo de fonte e idioma.
+
+Cada chunk pertence a uma partição (tipo, idioma) derivada da metadata que já existe
+no ChunkStore (`source`, `is_project`, `is_fallback`):
+
+    tipo    project | pdf | core (currículo/stacks) | doc (demais markdowns)
+    idioma  en (arquivo "*-english.md") | pt
+
+As partições são calculadas uma vez por versão do índice. Uma busca filtrada vira um
+`IDSelectorBatch` do FAISS, passado no `search()`, e uma máscara no BM25. Assim o top-k
+já sai só da partição pedida, sem over-fetch seguido de descarte em Python.
+"""
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Mapping, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.domain.services.rag_chunk_store import FLAG_FALLBACK, FLAG_PROJECT, ChunkStore
+
+KINDS = ("project", "pdf", "core", "doc")
+LANGS = ("pt", "en")
+
+# Arquivos-base do currículo (em qualquer idioma): CURRICULO*.md e STACKS*.md
+_CORE_PREFIXES = ("CURRICULO", "STACKS")
+
+
+def source_kind(source: str, is_project: bool, is_fallback: bool) -> str:
+    if is_project:
+        return "project"
+    if source.lower().endswith(".pdf"):
+        return "pdf"
+    name = source.rsplit("/", 1)[-1].upper()
+    if is_fallback or name.startswith(_CORE_PREFIXES):
+        return "core"
+    return "doc"
+
+
+def source_lang(source: str) -> str:
+    stem = source.rsplit("/", 1)[-1].rsplit(".", 1)[0].lower()
+    return "en" if stem.endswith("-english") else "pt"
+
+
+@dataclass(frozen=True)
+class RetrievalFilter:
+    """Restrição do retrieval: tipos de fonte aceitos e/ou idioma (None = sem restrição)."""
+
+    kinds: Optional[FrozenSet[str]] = None
+    lang: Optional[str] = None
+
+    def __post_init__(self):
+        if self.kinds is not None:
+            unknown = set(self.kinds) - set(KINDS)
+            if unknown:
+                raise ValueError(f"Tipo de fonte desconhecido: {sorted(unknown)} (opções: {', '.join(KINDS)})")
+        if self.lang is not None and self.lang not in LANGS:
+            raise ValueError(f"Idioma desconhecido: {self.lang!r} (opções: {', '.join(LANGS)})")
+
+    @classmethod
+    def of(cls, kinds: Optional[Iterable[str]] = None, lang: Optional[str] = None) -> "RetrievalFilter":
+        return cls(kinds=frozenset(kinds) if kinds is not None else None, lang=lang)
+
+    def matches(self, kind: str, lang: str) -> bool:
+        return (self.kinds is None or kind in self.kinds) and (self.lang is None or lang == self.lang)
+
+    def describe(self) -> str:
+        kinds = "+".join(sorted(self.kinds)) if self.kinds else "todos"
+        return f"{kinds}/{self.lang or 'todos'}"
+
+
+class ChunkPartitions:
+    """
+    IDs dos chunks por partição (tipo, idioma) de uma versão do índice, e seletores FAISS cacheados.
+
+    Uma duplicata colapsada (rag_dedup) não está no índice: conta para a partição dela pelo
+    ID do seu chunk canônico — a versão em inglês de um trecho mantém o canônico PT
+    alcançável num filtro `lang="en"`.
+    """
+
+    def __init__(self, chunks: Mapping[int, Dict]):
+        groups: Dict[Tuple[str, str], list] = {}
+        if isinstance(chunks, ChunkStore):
+            # Colunar: classifica cada fonte uma vez e espalha pelas linhas via source_idx
+            flags = np.asarray(chunks.flags)
+            source_idx = np.asarray(chunks.source_idx)
+            duplicate_of = np.asarray(chunks.duplicate_of)
+            ids = np.where(duplicate_of >= 0, duplicate_of, np.asarray(chunks.ids))
+            for pos, source in enumerate(chunks.sources):
+                rows = np.flatnonzero(source_idx == pos)
+                if not len(rows):
+                    continue
+                for flag in np.unique(flags[rows]):
+                    kind = source_kind(source, bool(flag & FLAG_PROJECT), bool(flag & FLAG_FALLBACK))
+                    groups.setdefault((kind, source_lang(source)), []).append(ids[rows[flags[rows] == flag]])
+        else:
+            for chunk_id, meta in chunks.items():
+                source = meta.get("source", "")
+                key = (source_kind(source, meta.get("is_project", False), meta.get("is_fallback", False)), source_lang(source))
+                searchable = meta.get("duplicate_of")
+                groups.setdefault(key, []).append(np.array([chunk_id if searchable is None else searchable], dtype="int64"))
+
+        self._ids: Dict[Tuple[str, str], np.ndarray] = {
+            key: np.unique(np.concatenate(parts)).astype("int64") for key, parts in groups.items()
+        }
+        self._cache: Dict[RetrievalFilter, Tuple[np.ndarray, faiss.IDSelector]] = {}
+
+    def counts(self) -> Dict[str, int]:
+        return {f"{kind}/{lang}": len(ids) for (kind, lang), ids in sorted(self._ids.items())}
+
+    def ids(self, filters: RetrievalFilter) -> np.ndarray:
+        return self._resolve(filters)[0]
+
+    def selector(self, filters: RetrievalFilter) -> faiss.IDSelector:
+        return self._resolve(filters)[1]
+
+    def _resolve(self, filters: RetrievalFilter) -> Tuple[np.ndarray, faiss.IDSelector]:
+        cached = self._cache.get(filters)
+        if cached is None:
+            parts = [ids for (kind, lang), ids in self._ids.items() if filters.matches(kind, lang)]
+            # unique: o canônico de uma duplicata em outro idioma aparece nas duas partições
+            ids = np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype="int64")
+            # O IDSelectorBatch copia os IDs para um hash set próprio
+            cached = (ids, faiss.IDSelectorBatch(ids))
+            self._cache[filters] = cached
+        return cached
@@ -0,0 +1,199 @@
+"""
+Engines de índice FAISS selecionáveis para o PortfolioRAG.
+
+| engine    | estrutura                 | busca               | remove_ids | memória/vetor   |
+|-----------|---------------------------|---------------------|------------|-----------------|
+| flat      | IDMap2 + IndexFlatL2      | exaustiva (exata)   | sim        | 4·d bytes       |
+| hnsw      | IDMap2 + IndexHNSWFlat    | grafo (aprox.)      | não        | 4·d + grafo     |
+| ivf_sq8   | IndexIVFScalarQuantizer   | nprobe listas       | sim        | d bytes         |
+| ivf_pq    | IndexIVFPQ                | nprobe listas       | sim        | m bytes         |
+
+Precisão de armazenamento (`storage`) dos vetores nas engines flat e hnsw:
+
+| storage | código por vetor | busca                                  |
+|---------|------------------|----------------------------------------|
+| float32 | 4·d bytes        | exata                                  |
+| float16 | 2·d bytes        | ~exata (erro de arredondamento ~1e-3)  |
+| sq8     | d bytes          | aprox. (quantização escalar treinada)  |
+
+As engines IVF já têm o próprio código (SQ8 / PQ) e ignoram `storage`.
+
+A escolha fica gravada no manifest junto com o índice; trocar de engine reconstrói
+só o índice a partir dos vetores já persistidos (sem chamar a API de embeddings).
+"""
+import math
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+
+import faiss
+import numpy as np
+
+ENGINES = ("flat", "hnsw", "ivf_sq8", "ivf_pq")
+STORAGES = ("float32", "float16", "sq8")
+
+# Sufixo do index_factory por precisão de armazenamento (flat/hnsw)
+_STORAGE_SPEC = {"float32": "Flat", "float16": "SQfp16", "sq8": "SQ8"}
+
+# Folga somada ao threshold L2 do embedder (calibrado no Flat, distância exata) por engine.
+# flat/hnsw devolvem distâncias exatas; SQ8 e PQ erram pela quantização e precisam de
+# folga maior. Recalibre com scripts/bench_rag_index_engines.py.
+ENGINE_L2_SLACK: Dict[str, float] = {
+    "flat": 0.0,
+    "hnsw": 0.0,
+    "ivf_sq8": 0.02,
+    "ivf_pq": 0.1,
+}
+
+
+@dataclass(frozen=True)
+class IndexEngineConfig:
+    engine: str = "flat"
+    hnsw_m: int = 32
+    hnsw_ef_search: int = 64
+    ivf_nlist: int = 64
+    ivf_nprobe: int = 8
+    pq_m: int = 32  # subquantizadores do PQ (ajustado para dividir a dimensão)
+    storage: str = "float32"  # precisão dos vetores nas engines flat/hnsw
+
+    def __post_init__(self):
+        if self.engine not in ENGINES:
+            raise ValueError(f"Engine de índice desconhecida: {self.engine!r} (opções: {', '.join(ENGINES)})")
+        if self.storage not in STORAGES:
+            raise ValueError(f"Precisão de armazenamento desconhecida: {self.storage!r} (opções: {', '.join(STORAGES)})")
+
+    @classmethod
+    def from_settings(cls) -> "IndexEngineConfig":
+        from app.infrastructure.config.settings import settings
+
+        return cls(
+            engine=settings.rag_index_engine.lower(),
+            hnsw_m=settings.rag_hnsw_m,
+            hnsw_ef_search=settings.rag_hnsw_ef_search,
+            ivf_nlist=settings.rag_ivf_nlist,
+            ivf_nprobe=settings.rag_ivf_nprobe,
+            storage=settings.rag_vector_storage.lower(),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> Optional["IndexEngineConfig"]:
+        if not data:
+            return None
+        try:
+            return cls(**data)
+        except (TypeError, ValueError):
+            return None
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    def structural_key(self) -> tuple:
+        """Parâmetros que mudam a estrutura do índice (efSearch/nprobe são só de busca)."""
+        return (self.engine, self.hnsw_m, self.ivf_nlist, self.pq_m, self.storage)
+
+    @property
+    def supports_remove(self) -> bool:
+        """HNSW não suporta remove_ids: o delta exige reconstruir o grafo."""
+        return self.engine != "hnsw"
+
+    @property
+    def vector_dtype(self) -> str:
+        """Dtype dos vetores persistidos no ChunkStore (fonte de rebuilds): float16 fora do float32."""
+        return "float32" if self.storage == "float32" else "float16"
+
+    def max_l2_distance(self, embedder_max_l2: float) -> float:
+        """Threshold do retrieval nesta engine a partir do threshold exato do embedder."""
+        slack = ENGINE_L2_SLACK[self.engine]
+        if self.storage == "sq8" and self.engine in ("flat", "hnsw"):
+            # Mesma quantização do ivf_sq8: mesma folga no threshold
+            slack = max(slack, ENGINE_L2_SLACK["ivf_sq8"])
+        return embedder_max_l2 + slack
+
+
+def _pq_m(dimension: int, wanted: int) -> int:
+    """Maior divisor de `dimension` que não passa de `wanted` (exigência do PQ)."""
+    for m in range(min(wanted, dimension), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def _pq_nbits(n: int) -> int:
+    """
+    Bits por código PQ: 8 (256 centróides) só com ~39·256 pontos de treino;
+    corpora pequenos usam menos bits para o k-means não ficar subamostrado.
+    """
+    return max(4, min(8, int(math.log2(max(n // 39, 2)))))
+
+
+def build_index(config: IndexEngineConfig, vectors: np.ndarray, ids: np.ndarray) -> faiss.Index:
+    """Cria, treina (se preciso) e popula o índice da engine escolhida."""
+    n, dimension = vectors.shape
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    ids = np.ascontiguousarray(ids, dtype="int64")
+
+    if config.engine == "flat":
+        if config.storage == "float32":
+            index = faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+        else:
+            index = faiss.index_factory(dimension, f"IDMap2,{_STORAGE_SPEC[config.storage]}")
+    elif config.engine == "hnsw":
+        index = faiss.index_factory(dimension, f"IDMap2,HNSW{config.hnsw_m},{_STORAGE_SPEC[config.storage]}")
+    else:
+        # nlist limitado pelo corpus: ~39 pontos de treino por lista é o mínimo do k-means do FAISS
+        nlist = max(1, min(config.ivf_nlist, n // 39))
+        if config.engine == "ivf_sq8":
+            spec = f"IVF{nlist},SQ8"
+        else:
+            spec = f"IVF{nlist},PQ{_pq_m(dimension, config.pq_m)}x{_pq_nbits(n)}"
+        index = faiss.index_factory(dimension, spec)
+
+    # IVF (k-means) e SQ8 (faixa de valores por dimensão) precisam de treino
+    if not index.is_trained and n:
+        index.train(vectors)
+    apply_search_params(index, config)
+    if n:
+        index.add_with_ids(vectors, ids)
+    return index
+
+
+def apply_search_params(index: faiss.Index, config: IndexEngineConfig) -> None:
+    """Aplica os parâmetros de busca (não fazem parte do treino): efSearch / nprobe."""
+    if config.engine == "hnsw":
+        inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+        faiss.downcast_index(inner).hnsw.efSearch = config.hnsw_ef_search
+    elif config.engine in ("ivf_sq8", "ivf_pq"):
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = min(config.ivf_nprobe, ivf.nlist)
+
+
+def filtered_search_params(index: faiss.Index, selector: faiss.IDSelector) -> faiss.SearchParameters:
+    """
+    SearchParameters com um IDSelector (IDs externos), preservando o efSearch/nprobe já
+    aplicados ao índice — os parâmetros passados no search() substituem os do índice.
+    """
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = inner.hnsw.efSearch
+    else:
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            params = faiss.SearchParametersIVF()
+            params.nprobe = ivf.nprobe
+        else:
+            params = faiss.SearchParameters()
+    params.sel = selector
+    return params
+
+
+def writable_copy(index: faiss.Index) -> faiss.Index:
+    """
+    Cópia em heap, independente do original. `faiss.clone_index` de um índice lido via mmap
+    continua apontando para o arquivo somente-leitura (remove_ids/add_with_ids derrubam o processo).
+    """
+    return faiss.deserialize_index(faiss.serialize_index(index))
+
+
+def index_nbytes(index: faiss.Index) -> int:
+    """Tamanho serializado do índice (aprox. da memória ocupada)."""
+    return int(faiss.serialize_index(index).nbytes)
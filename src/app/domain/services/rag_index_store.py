@@ -0,0 +1,183 @@
+"""
+Versões imutáveis do índice RAG em disco e o snapshot em memória que as serve.
+
+Layout:
+
+    rag_index/
+        CURRENT          número da versão ativa (trocado via os.replace — atômico)
+        v7/              versão anterior (mantida para retrievals ainda em andamento)
+        v8/
+            index.faiss  índice FAISS da engine configurada (lido via mmap)
+            chunks/      ChunkStore colunar memory-mapped (textos, metadata, vetores)
+            lexical.npz  índice invertido BM25
+            intents.npz  centroides de intenção do roteamento (rag_intent_router)
+            documents.npz  um vetor por arquivo-fonte (retrieval hierárquico, rag_document_index)
+            manifest.json
+
+Uma versão nova é escrita inteira em `.tmp-v<N>-<pid>/`, renomeada para `v<N>/` e só
+então o CURRENT passa a apontar para ela: quem lê o disco nunca vê uma versão pela metade.
+Builds concorrentes (vários workers do uvicorn) são serializados por um flock em `.lock`.
+"""
+import json
+import logging
+import os
+import shutil
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+from typing import Callable, Dict, List, Mapping, Optional
+
+import faiss
+
+try:
+    import fcntl
+except ImportError:  # Windows (dev local): sem lock entre processos
+    fcntl = None
+
+from app.domain.services.rag_document_index import DocumentIndex
+from app.domain.services.rag_filters import ChunkPartitions
+from app.domain.services.rag_intent_router import IntentCentroids
+from app.domain.services.rag_lexical_index import BM25Index
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.faiss"
+CHUNKS_DIR = "chunks"
+LEXICAL_FILE = "lexical.npz"
+MANIFEST_FILE = "manifest.json"
+INTENTS_FILE = "intents.npz"
+DOCUMENTS_FILE = "documents.npz"
+
+# Leitura zero-copy: os códigos do índice (flat, HNSW, listas IVF) ficam no page cache,
+# compartilhados entre os workers. faiss < 1.11 não tem IO_FLAG_MMAP_IFC; IO_FLAG_MMAP
+# cobre ao menos as listas invertidas das engines IVF.
+INDEX_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+@dataclass(frozen=True)
+class RagIndexSnapshot:
+    """
+    Tudo que o retrieval lê, numa única referência imutável.
+
+    O PortfolioRAG troca o snapshot inteiro numa atribuição; um retrieve() que já pegou
+    a referência antiga termina nela, mesmo que um reindex publique outra versão no meio.
+    """
+
+    version: int
+    index: Optional[faiss.Index]
+    chunks: Mapping[int, Dict]
+    lexical: BM25Index
+    manifest: Dict = field(default_factory=dict)
+    intents: Optional[IntentCentroids] = None
+    documents: Optional[DocumentIndex] = None
+
+    @classmethod
+    def empty(cls) -> "RagIndexSnapshot":
+        return cls(version=0, index=None, chunks={}, lexical=BM25Index.empty())
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal if self.index is not None else 0
+
+    @cached_property
+    def partitions(self) -> ChunkPartitions:
+        """IDs por (tipo de fonte, idioma), calculados no primeiro retrieval filtrado da versão."""
+        return ChunkPartitions(self.chunks)
+
+
+class IndexVersionStore:
+    """Diretórios versionados do índice + ponteiro CURRENT com troca atômica."""
+
+    def __init__(self, root, keep: int = 2):
+        self.root = Path(root)
+        # Versões mantidas em disco (a ativa + anteriores ainda possivelmente mapeadas)
+        self.keep = max(1, keep)
+
+    def version_dir(self, version: int) -> Path:
+        return self.root / f"v{version}"
+
+    def current_version(self) -> Optional[int]:
+        try:
+            version = int((self.root / "CURRENT").read_text(encoding="utf-8").strip())
+        except (FileNotFoundError, ValueError):
+            return None
+        return version if self.version_dir(version).is_dir() else None
+
+    def _versions(self) -> List[int]:
+        if not self.root.exists():
+            return []
+        return sorted(
+            int(p.name[1:]) for p in self.root.iterdir()
+            if p.is_dir() and p.name.startswith("v") and p.name[1:].isdigit()
+        )
+
+    def next_version(self) -> int:
+        versions = self._versions()
+        return (versions[-1] if versions else 0) + 1
+
+    @contextmanager
+    def lock(self):
+        """Lock exclusivo entre processos para build/publicação de versões."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".lock", "a+") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def publish(self, write: Callable[[Path], None]) -> int:
+        """
+        Cria uma versão nova: `write(dir)` grava os artefatos num diretório temporário,
+        que é renomeado para `v<N>` antes de o CURRENT apontar para ele. Retorna N.
+        Deve ser chamado dentro de `lock()`.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Sob o lock, qualquer diretório temporário é resto de um build interrompido
+        for stale in self.root.glob(".tmp-v*"):
+            shutil.rmtree(stale, ignore_errors=True)
+        version = self.next_version()
+        tmp_dir = self.root / f".tmp-v{version}-{os.getpid()}"
+        tmp_dir.mkdir()
+        try:
+            write(tmp_dir)
+            os.rename(tmp_dir, self.version_dir(version))
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        pointer_tmp = self.root / f"CURRENT.tmp-{os.getpid()}"
+        pointer_tmp.write_text(str(version), encoding="utf-8")
+        os.replace(pointer_tmp, self.root / "CURRENT")
+        self._prune(version)
+        return version
+
+    def _prune(self, current: int) -> None:
+        """Apaga versões antigas. Arquivos ainda mapeados seguem válidos até o munmap (POSIX)."""
+        for version in self._versions():
+            if version <= current - self.keep:
+                shutil.rmtree(self.version_dir(version), ignore_errors=True)
+
+    def nbytes(self, version: int) -> int:
+        """Tamanho em disco de uma versão (índice + chunks + BM25 + manifest)."""
+        directory = self.version_dir(version)
+        if not directory.exists():
+            return 0
+        return sum(p.stat().st_size for p in directory.rglob("*") if p.is_file())
+
+    def read_index(self, version: int, mmap: bool = True) -> faiss.Index:
+        """
+        Índice FAISS de uma versão. Com `mmap`, é somente-leitura e as páginas são do
+        arquivo (N workers = 1 cópia física); o build trabalha sempre num clone em heap.
+        """
+        return faiss.read_index(str(self.version_dir(version) / INDEX_FILE), INDEX_MMAP_FLAGS if mmap else 0)
+
+    def read_manifest(self, version: int) -> Optional[Dict]:
+        try:
+            with open(self.version_dir(version) / MANIFEST_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
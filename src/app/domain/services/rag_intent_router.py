@@ -0,0 +1,259 @@
+"""
+Roteamento de intenção da query do RAG.
+
+Duas etapas, da mais barata para a mais cara:
+
+1. Regras de keyword sobre o texto normalizado (minúsculas, sem acentos), numa única
+   passada memoizada por mensagem (`classify_message()`): a mesma classificação escolhe o
+   fluxo do AtendimentoService (currículo para vaga, documentos, identidade, áudio,
+   planilha) e é o pré-filtro do retrieve_smart(). Casou uma intenção, está decidido.
+2. Similaridade de cosseno entre o vetor da query e os centroides de intenção: uma
+   multiplicação (intenções × dim) · (dim,). O vetor é o mesmo que o retrieve() usa
+   (QueryEmbeddingCache), então o roteamento não faz chamada extra à API.
+
+Os centroides são a média normalizada dos embeddings das frases de exemplo de cada
+intenção. São calculados no build do índice, numa única chamada em lote, e gravados
+com a versão (`intents.npz`) — trocar o embedder ou as frases gera uma versão nova.
+"""
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.domain.services.rag_embedder import Embedder, normalize_query
+
+INTENTS = ("project_listing", "career", "stack", "document_request", "resume_tailoring", "identity")
+
+# Frases de exemplo por intenção (PT e EN). Alterar aqui recalcula os centroides no próximo reindex.
+INTENT_EXAMPLES: Dict[str, Tuple[str, ...]] = {
+    "project_listing": (
+        "quais projetos você já fez?",
+        "me mostra os projetos do portfólio",
+        "lista todos os projetos dele",
+        "o que ele já desenvolveu?",
+        "which projects has he built?",
+        "list his portfolio projects",
+    ),
+    "career": (
+        "onde ele trabalha atualmente?",
+        "qual a experiência profissional dele?",
+        "em quais empresas ele já trabalhou?",
+        "há quanto tempo ele trabalha com desenvolvimento?",
+        "where does he work?",
+        "tell me about his work experience",
+    ),
+    "stack": (
+        "quais tecnologias ele domina?",
+        "com quais linguagens de programação ele trabalha?",
+        "ele sabe usar docker e kubernetes?",
+        "qual a stack principal dele?",
+        "what is his tech stack?",
+        "which frameworks does he know?",
+    ),
+    "document_request": (
+        "me manda o currículo dele",
+        "pode enviar o certificado de conclusão?",
+        "quais certificados ele tem?",
+        "tem o diploma da pós-graduação?",
+        "send me his resume",
+        "can you share his certificates?",
+    ),
+    "resume_tailoring": (
+        "adapte o currículo para esta vaga",
+        "gera um currículo personalizado para essa oportunidade",
+        "monta um cv focado nos requisitos da vaga",
+        "tailor his resume to this job description",
+        "customize the cv for this position",
+    ),
+    "identity": (
+        "qual o seu nome?",
+        "quem é você?",
+        "qual o nome completo do Wesley?",
+        "quem é o Wesley?",
+        "what is your name?",
+        "who are you?",
+    ),
+}
+
+# Pré-filtro: primeira regra que casar no texto normalizado decide a intenção (depois de
+# resume_tailoring, document_request e identity, decididas pelas regras de `classify_message`)
+INTENT_KEYWORDS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("project_listing", ("quais projetos", "todos os projetos", "listar projetos", "list projects")),
+    ("career", ("trabalho", "emprego", "experiencia", "carreira", "onde trabalh")),
+    ("stack", ("stack", "tecnolog", "linguagem", "framework", "ferramenta")),
+)
+
+# Regras do AtendimentoService, todas sobre o texto normalizado (sem acentos)
+_CERTIFICATE_TERMS = ("certificado", "certificados", "certificate", "certificates")
+_LISTING_TERMS = ("quais", "listar", "lista", "tenho", "possuo", "mostrar", "mostra", "tem", "has")
+_SEND_TERMS = (
+    "manda", "manda ai", "mandar", "envia", "enviar", "me manda",
+    "me envia", "pode mandar", "pode enviar", "send", "attach", "anexa",
+)
+_DOCUMENT_TERMS = ("curriculo", "resume", "certificad", "certificate", "diploma")
+_RESUME_TERMS = ("curriculo", "curriculum", "resume", "cv")
+_TAILOR_TERMS = ("vaga", "job", "adapt", "adapte", "personal", "personaliz")
+_JOB_POSTING_TERMS = (
+    "vaga", "job description", "descricao da vaga", "oportunidade", "responsabilidades",
+    "requisitos", "qualificacoes", "qualifications", "requirements", "about the role",
+)
+_JOB_POSTING_MIN_CHARS = 400
+_ENGLISH_DOCUMENT_TERMS = ("english", "in english", "ingles", "em ingles", "resume")
+_AUDIO_TERMS = ("audio", "voz", "voice")
+_SPREADSHEET_TERMS = ("planilha", "excel", "spreadsheet", "xlsx", "xls")
+_ACTION_VERBS = (
+    "manda", "mandar", "envia", "enviar", "me manda", "me envia",
+    "gera", "gerar", "cria", "criar", "faz", "fazer", "quero",
+    "preciso", "pode", "consegue", "testa", "teste",
+)
+
+# Palavras funcionais que denunciam uma pergunta em inglês (escolhe a partição EN)
+_EN_MARKERS = frozenset(
+    ("the", "what", "which", "who", "where", "his", "your", "does", "has", "have", "list", "show", "projects")
+)
+_PT_MARKERS = frozenset(
+    ("o", "a", "os", "as", "que", "quais", "qual", "quem", "onde", "dele", "seu", "sua", "tem", "projetos")
+)
+
+
+@lru_cache(maxsize=1024)
+def normalize_intent_text(text: str) -> str:
+    """Texto canônico para as regras de intenção (memoizado: cada mensagem é normalizada uma vez)."""
+    return normalize_query(text)
+
+
+class MessageIntent(NamedTuple):
+    """Classificação por regras de uma mensagem (ver `classify_message`)."""
+
+    intent: Optional[str]        # intenção do RAG por keyword (None = os centroides decidem)
+    identity: Optional[str]      # pergunta de identidade: assistant_name | full_name | wesley_name
+    certificate_listing: bool    # "quais certificados ele tem?"
+    send_request: bool           # pede para enviar/anexar algo
+    tailored_resume: bool        # currículo para uma vaga (pedido explícito ou a própria vaga colada)
+    wants_audio: bool
+    wants_spreadsheet: bool
+    document_lang: str           # idioma do documento pedido: "en" | "pt"
+
+
+def _identity_question(norm: str) -> Optional[str]:
+    if ("qual seu nome" in norm or "seu nome" in norm or "quem e voce" in norm) and "wesley" not in norm:
+        return "assistant_name"
+    if any(k in norm for k in ("nome completo", "nome inteiro", "sobrenome", "nome de verdade")):
+        return "full_name"
+    if any(k in norm for k in ("nome do wesley", "quem e o wesley", "qual nome dele", "nome dele")):
+        return "wesley_name"
+    return None
+
+
+@lru_cache(maxsize=1024)
+def classify_message(text: str) -> MessageIntent:
+    """
+    Todas as regras de keyword sobre uma normalização do texto, memoizado: o fluxo do bot e o
+    retrieve_smart() da mesma mensagem compartilham o resultado em vez de reescanear o texto.
+    """
+    norm = normalize_intent_text(text)
+    identity = _identity_question(norm)
+    certificate_listing = any(t in norm for t in _CERTIFICATE_TERMS) and any(t in norm for t in _LISTING_TERMS)
+    send_request = any(t in norm for t in _SEND_TERMS)
+    tailored_resume = (
+        any(t in norm for t in _RESUME_TERMS) and any(t in norm for t in _TAILOR_TERMS)
+    ) or (len(text) >= _JOB_POSTING_MIN_CHARS and any(t in norm for t in _JOB_POSTING_TERMS))
+
+    if tailored_resume:
+        intent = "resume_tailoring"
+    elif certificate_listing or (send_request and any(t in norm for t in _DOCUMENT_TERMS)):
+        intent = "document_request"
+    elif identity is not None:
+        intent = "identity"
+    else:
+        intent = next((name for name, keywords in INTENT_KEYWORDS if any(k in norm for k in keywords)), None)
+
+    return MessageIntent(
+        intent=intent,
+        identity=identity,
+        certificate_listing=certificate_listing,
+        send_request=send_request,
+        tailored_resume=tailored_resume,
+        wants_audio=any(t in norm for t in _AUDIO_TERMS),
+        wants_spreadsheet=any(t in norm for t in _SPREADSHEET_TERMS)
+        or ("tabela" in norm and any(v in norm for v in _ACTION_VERBS)),
+        document_lang="en" if any(t in norm for t in _ENGLISH_DOCUMENT_TERMS) else "pt",
+    )
+
+
+def keyword_intent(text: str) -> Optional[str]:
+    """Intenção decidida só por keyword, ou None se nenhuma regra casar."""
+    return classify_message(text).intent
+
+
+def query_lang(text: str) -> str:
+    """Idioma provável da query ("en" | "pt") pela contagem de palavras funcionais."""
+    words = normalize_intent_text(text).replace("?", " ").split()
+    en = sum(w in _EN_MARKERS for w in words)
+    pt = sum(w in _PT_MARKERS for w in words)
+    return "en" if en > pt else "pt"
+
+
+def examples_fingerprint() -> str:
+    """Hash das frases de exemplo (e do task type): muda → centroides publicados ficam obsoletos."""
+    payload = json.dumps({"task": "RETRIEVAL_QUERY", "examples": INTENT_EXAMPLES}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class IntentCentroids:
+    """Matriz (intenções × dim) de centroides normalizados e a classificação por cosseno."""
+
+    def __init__(self, names: Tuple[str, ...], matrix: np.ndarray):
+        self.names = tuple(names)
+        self.matrix = np.ascontiguousarray(matrix, dtype="float32")
+
+    @classmethod
+    def build(cls, embedder: Embedder) -> "IntentCentroids":
+        """
+        Embeda todas as frases de exemplo numa chamada e faz a média por intenção. As frases
+        são perguntas e são comparadas com vetores de query: vão pelo caminho de query
+        (RETRIEVAL_QUERY), não pelo de documentos.
+        """
+        names = tuple(INTENT_EXAMPLES)
+        texts = [text for name in names for text in INTENT_EXAMPLES[name]]
+        vectors = _normalize(embedder.embed_queries_sync(texts).astype("float32"))
+        rows, start = [], 0
+        for name in names:
+            end = start + len(INTENT_EXAMPLES[name])
+            rows.append(vectors[start:end].mean(axis=0))
+            start = end
+        return cls(names, _normalize(np.stack(rows)))
+
+    @classmethod
+    def load(cls, path: Path) -> "IntentCentroids":
+        with np.load(path) as data:
+            return cls(tuple(str(n) for n in data["names"]), data["matrix"])
+
+    def save(self, path: Path) -> None:
+        with open(path, "wb") as f:
+            np.savez(f, names=np.array(self.names), matrix=self.matrix)
+
+    @property
+    def dimension(self) -> int:
+        return self.matrix.shape[1]
+
+    def classify(self, query_vec: np.ndarray, min_similarity: float, min_margin: float) -> Tuple[Optional[str], float]:
+        """
+        Intenção mais próxima e sua similaridade. Retorna (None, sim) se o melhor centroide
+        não passar de `min_similarity` ou não se destacar do segundo por `min_margin`.
+        """
+        sims = self.matrix @ _normalize(np.asarray(query_vec, dtype="float32").reshape(-1))
+        order = np.argsort(sims)[::-1]
+        best = float(sims[order[0]])
+        second = float(sims[order[1]]) if len(order) > 1 else -1.0
+        if best < min_similarity or best - second < min_margin:
+            return None, best
+        return self.names[order[0]], best
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return (matrix / np.maximum(norms, 1e-12)).astype("float32")
@@ -0,0 +1,224 @@
+"""
+Índice invertido BM25 dos chunks do RAG (busca léxica).
+
+Complementa a busca densa do FAISS: nomes exatos de tecnologias/projetos ("Spring Boot",
+"FULLCYCLE") casam por termo mesmo quando o embedding da query fica fora do threshold L2.
+Herdeiro do scoring léxico do `ContextSearchService.java`.
+
+Layout persistido (`.npz`, CSR por termo):
+
+    ids           int64   (n,)    IDs FAISS dos chunks, ordenados
+    doc_len       int32   (n,)    quantidade de tokens de cada chunk
+    vocab         str     (V,)    termos, na ordem das listas de postings
+    post_offsets  int64   (V+1,)  postings do termo t = post_rows[post_offsets[t]:post_offsets[t+1]]
+    post_rows     int32   (P,)    linha (posição em `ids`) de cada ocorrência
+    post_tf       float32 (P,)    frequência do termo no chunk
+"""
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from app.domain.services.rag_embedder import normalize_query
+
+# Parâmetros clássicos do Okapi BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Termos preservam tecnologias como "c++", "c#", "node.js" e "asp.net"
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[+#]+|(?:\.[a-z0-9]+)+)?")
+
+# Palavras funcionais PT/EN (já sem acento): não discriminam chunks e inflariam o índice
+STOPWORDS = frozenset(
+    """
+    a o as os um uma uns umas de do da dos das no na nos nas em por para pra com sem sobre
+    e ou mas que se ja nao sim mais menos muito muita muitos muitas como qual quais quem onde
+    quando porque ao aos ate isso isto esse essa este esta seu sua seus suas meu minha voce
+    voces ele ela eles elas eu me te lhe foi ser sao era tem ter tenho pode fala falar sabe
+    the of and or to in on for with is are was be an at by from as it this that what which
+    who how do does you your about
+    """.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokens normalizados: minúsculas, sem acentos, sem stopwords e com plural simples
+    removido ("projetos" → "projeto"). Mesma função no build e na query.
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(normalize_query(text)):
+        if token in STOPWORDS or (len(token) < 2 and token[-1] not in "+#"):
+            continue
+        if len(token) > 4 and token.isalpha() and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def index_terms(text: str) -> List[str]:
+    """
+    Termos indexados de um chunk: os tokens + a junção de pares adjacentes, para que
+    "FULLCYCLE" / "springboot" na query casem com "Full Cycle" / "Spring Boot" no texto.
+    """
+    tokens = tokenize(text)
+    joined = [a + b for a, b in zip(tokens, tokens[1:]) if a.isalpha() and b.isalpha()]
+    return tokens + joined
+
+
+@dataclass(frozen=True)
+class LexicalHit:
+    chunk_id: int
+    score: float
+    # Fração (ponderada por IDF) dos termos da query presentes no chunk: 1.0 = todos
+    coverage: float
+    # Maior IDF entre os termos da query encontrados no chunk (termo raro = match discriminativo)
+    max_idf: float
+
+
+class BM25Index:
+    """Índice BM25 imutável; reconstruído junto com o índice FAISS a cada sync."""
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        doc_len: np.ndarray,
+        vocab: List[str],
+        post_offsets: np.ndarray,
+        post_rows: np.ndarray,
+        post_tf: np.ndarray,
+    ):
+        self.ids = ids
+        self.doc_len = doc_len
+        self.vocab: Dict[str, int] = {term: pos for pos, term in enumerate(vocab)}
+        self.post_offsets = post_offsets
+        self.post_rows = post_rows
+        self.post_tf = post_tf
+        self.avgdl = float(doc_len.mean()) if len(doc_len) else 0.0
+        df = np.diff(post_offsets)
+        n = len(ids)
+        # IDF do BM25 com +1 (sempre positivo, mesmo para termos presentes em mais da metade)
+        self.idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5)).astype("float32")
+
+    @classmethod
+    def build(cls, texts: Mapping[int, str]) -> "BM25Index":
+        """Monta o índice a partir de {id FAISS: texto do chunk}."""
+        ids = np.array(sorted(int(i) for i in texts), dtype="int64")
+        doc_len = np.zeros(len(ids), dtype="int32")
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for row, chunk_id in enumerate(ids.tolist()):
+            counts = Counter(index_terms(texts[chunk_id]))
+            doc_len[row] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((row, tf))
+
+        vocab = sorted(postings)
+        post_offsets = np.zeros(len(vocab) + 1, dtype="int64")
+        for pos, term in enumerate(vocab):
+            post_offsets[pos + 1] = post_offsets[pos] + len(postings[term])
+        post_rows = np.empty(int(post_offsets[-1]), dtype="int32")
+        post_tf = np.empty(int(post_offsets[-1]), dtype="float32")
+        for pos, term in enumerate(vocab):
+            start, end = post_offsets[pos], post_offsets[pos + 1]
+            rows_tfs = postings[term]
+            post_rows[start:end] = [r for r, _ in rows_tfs]
+            post_tf[start:end] = [tf for _, tf in rows_tfs]
+        return cls(ids, doc_len, vocab, post_offsets, post_rows, post_tf)
+
+    @classmethod
+    def empty(cls) -> "BM25Index":
+        return cls.build({})
+
+    # -----------------------------------------------------------------------
+    # Persistência
+    # -----------------------------------------------------------------------
+
+    def save(self, path) -> None:
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        vocab = sorted(self.vocab, key=self.vocab.__getitem__)
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                ids=self.ids,
+                doc_len=self.doc_len,
+                vocab=np.array(vocab, dtype=str),
+                post_offsets=self.post_offsets,
+                post_rows=self.post_rows,
+                post_tf=self.post_tf,
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["ids"],
+                data["doc_len"],
+                data["vocab"].tolist(),
+                data["post_offsets"],
+                data["post_rows"],
+                data["post_tf"],
+            )
+
+    # -----------------------------------------------------------------------
+    # Busca
+    # -----------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: str, k: int, allowed_ids: Optional[np.ndarray] = None) -> List[LexicalHit]:
+        """
+        Top-k chunks por score BM25 (só chunks com ao menos um termo da query).
+        `allowed_ids` (ordenados) restringe o ranking a um subconjunto dos chunks.
+        """
+        # Termos fora do vocabulário não casam nada e não entram na cobertura
+        terms = [self.vocab[t] for t in dict.fromkeys(tokenize(query)) if t in self.vocab]
+        if not terms or not len(self.ids):
+            return []
+
+        scores = np.zeros(len(self.ids), dtype="float32")
+        matched_idf = np.zeros(len(self.ids), dtype="float32")
+        max_idf = np.zeros(len(self.ids), dtype="float32")
+        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_len / max(self.avgdl, 1e-9))
+        for term in terms:
+            start, end = self.post_offsets[term], self.post_offsets[term + 1]
+            rows = self.post_rows[start:end]
+            tf = self.post_tf[start:end]
+            idf = self.idf[term]
+            scores[rows] += idf * tf * (BM25_K1 + 1.0) / (tf + norm[rows])
+            matched_idf[rows] += idf
+            np.maximum.at(max_idf, rows, idf)
+
+        total_idf = float(self.idf[terms].sum())
+
+        if allowed_ids is not None:
+            scores[~np.isin(self.ids, allowed_ids, assume_unique=True)] = 0.0
+        top = np.flatnonzero(scores)
+        top = top[np.argsort(-scores[top], kind="stable")][:k]
+        return [
+            LexicalHit(
+                chunk_id=int(self.ids[row]),
+                score=float(scores[row]),
+                coverage=float(matched_idf[row] / total_idf),
+                max_idf=float(max_idf[row]),
+            )
+            for row in top
+        ]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[int]], k: int = 60) -> List[int]:
+    """
+    Reciprocal Rank Fusion: score(d) = Σ 1 / (k + rank_i(d)), rank começando em 1.
+    Combina listas de scores incomparáveis (distância L2 × BM25) só pela posição.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused, key=lambda chunk_id: -fused[chunk_id])
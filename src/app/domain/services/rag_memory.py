@@ -0,0 +1,93 @@
+"""
+Relatório de memória dos processos que servem o RAG (Linux, via /proc).
+
+Com o índice FAISS e o ChunkStore memory-mapped, as páginas dos arquivos de `rag_index/`
+são page cache compartilhado entre os workers do uvicorn: aparecem no RSS de cada um,
+mas no PSS (Proportional Set Size) são divididas entre os processos que as mapeiam.
+Para dimensionar a VM, some o PSS dos workers — somar RSS conta o índice N vezes.
+"""
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_ROLLUP_FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_clean_mb",
+    "Private_Clean": "private_clean_mb",
+    "Private_Dirty": "private_dirty_mb",
+}
+
+
+def _mb(kb: int) -> float:
+    return round(kb / 1024, 1)
+
+
+def process_memory(pid="self", mapped_under: Optional[str] = None) -> Dict:
+    """
+    RSS/PSS do processo (smaps_rollup) e, com `mapped_under`, quanto dessa memória vem
+    de arquivos mapeados abaixo daquele diretório (o índice RAG). Vazio fora do Linux.
+    """
+    proc = Path("/proc") / str(pid)
+    report: Dict = {"pid": os.getpid() if pid == "self" else int(pid)}
+    try:
+        with open(proc / "smaps_rollup", "r") as f:
+            for line in f:
+                parts = line.split()
+                key = parts[0].rstrip(":")
+                if key in _ROLLUP_FIELDS:
+                    report[_ROLLUP_FIELDS[key]] = _mb(int(parts[1]))
+    except OSError:
+        return report
+
+    if mapped_under is not None:
+        report["rag_mapped"] = _mapped_files_memory(proc, str(Path(mapped_under).resolve()))
+    return report
+
+
+def _mapped_files_memory(proc: Path, prefix: str) -> Dict[str, float]:
+    """Soma Rss/Pss dos mapeamentos de arquivos abaixo de `prefix` (/proc/<pid>/smaps)."""
+    rss = pss = 0
+    files = set()
+    inside = False
+    try:
+        with open(proc / "smaps", "r") as f:
+            for line in f:
+                parts = line.split()
+                if not parts:
+                    continue
+                if not parts[0].endswith(":"):
+                    # Cabeçalho do mapeamento: "início-fim perms offset dev inode [caminho]"
+                    path = parts[5] if len(parts) >= 6 else ""
+                    inside = path.startswith(prefix)
+                    if inside:
+                        files.add(path)
+                elif inside and parts[0] == "Rss:":
+                    rss += int(parts[1])
+                elif inside and parts[0] == "Pss:":
+                    pss += int(parts[1])
+    except OSError:
+        pass
+    return {"files": len(files), "rss_mb": _mb(rss), "pss_mb": _mb(pss)}
+
+
+def workers_memory(index_dir: str) -> List[Dict]:
+    """Relatório de todos os processos que mapeiam arquivos de `index_dir` (os workers do RAG)."""
+    prefix = str(Path(index_dir).resolve())
+    reports: List[Dict] = []
+    for proc in Path("/proc").iterdir():
+        if not proc.name.isdigit():
+            continue
+        try:
+            if prefix not in (proc / "maps").read_text():
+                continue
+            cmdline = (proc / "cmdline").read_bytes().replace(b"\0", b" ").decode(errors="replace").strip()
+        except OSError:
+            continue
+        report = process_memory(proc.name, mapped_under=prefix)
+        report["cmdline"] = cmdline[:120]
+        reports.append(report)
+    return sorted(reports, key=lambda r: r["pid"])
@@ -0,0 +1,124 @@
+"""
+Extração de texto dos PDFs do RAG: paralela (process pool) e com cache em disco.
+
+O pypdf é Python puro e limitado pela CPU — em threads o GIL serializa tudo. A extração
+roda em processos (um por core) e o resultado fica em `<cache_dir>/<versão>-<sha256>.txt`:
+um certificado inalterado nunca é re-parseado, nem em rebuild completo (troca de
+engine, embedder ou schema do manifest).
+
+Módulo propositalmente leve (só pypdf): é o que os workers `spawn` importam.
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from pypdf import PdfReader
+
+logger = logging.getLogger(__name__)
+
+# Incrementar quando a normalização do texto extraído mudar → invalida o cache
+PDF_EXTRACTION_VERSION = 1
+
+
+def extract_pdf_text(pdf_path: str) -> str:
+    """Texto de todas as páginas, com espaços colapsados (uma linha por página)."""
+    reader = PdfReader(str(pdf_path))
+    parts: list[str] = []
+    for page in reader.pages:
+        page_text = page.extract_text() or ""
+        page_text = " ".join(page_text.split())
+        if page_text:
+            parts.append(page_text)
+    return "\n".join(parts).strip()
+
+
+class PdfTextCache:
+    """Cache em disco do texto extraído, endereçado pelo sha256 do PDF."""
+
+    def __init__(self, cache_dir, workers: int = 0):
+        self.cache_dir = Path(cache_dir)
+        self.workers = workers or os.cpu_count() or 1
+
+    def _path(self, sha256: str) -> Path:
+        return self.cache_dir / f"v{PDF_EXTRACTION_VERSION}-{sha256}.txt"
+
+    def get(self, sha256: str) -> Optional[str]:
+        try:
+            return self._path(sha256).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def put(self, sha256: str, text: str) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(sha256)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+
+    def extract(self, pdf_path: Path, sha256: str) -> str:
+        """Texto do PDF pelo cache; extrai (no processo atual) e grava se faltar."""
+        text = self.get(sha256)
+        if text is None:
+            text = extract_pdf_text(str(pdf_path))
+            self.put(sha256, text)
+        return text
+
+    def prefetch(self, pdfs: Iterable[Tuple[Path, str]]) -> Dict[str, int]:
+        """
+        Extrai em paralelo os PDFs (caminho, sha256) que ainda não estão no cache.
+        Falhas só são logadas: o PDF é tentado de novo (e o erro tratado) no chunking.
+        """
+        pdfs = list(pdfs)
+        missing = {sha: path for path, sha in pdfs if not self._path(sha).exists()}
+        stats = {"cached": len(pdfs) - len(missing), "extracted": 0, "failed": 0}
+        if not missing:
+            return stats
+
+        workers = min(self.workers, len(missing))
+        if workers > 1:
+            try:
+                self._extract_parallel(missing, workers, stats)
+                return stats
+            except BrokenProcessPool as e:
+                # Worker morto (OOM, import falho no spawn): o que faltou segue no processo atual
+                logger.warning(f"Process pool de extração de PDFs falhou ({e}). Continuando em série...")
+                missing = {sha: path for sha, path in missing.items() if not self._path(sha).exists()}
+
+        for sha, path in missing.items():
+            try:
+                self.put(sha, extract_pdf_text(str(path)))
+                stats["extracted"] += 1
+            except Exception as e:
+                logger.error(f"Erro extraindo texto de {path}: {e}")
+                stats["failed"] += 1
+        return stats
+
+    def _extract_parallel(self, missing: Dict[str, Path], workers: int, stats: Dict[str, int]) -> None:
+        # spawn: o build roda numa thread do servidor — fork com threads ativas não é seguro
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {sha: pool.submit(extract_pdf_text, str(path)) for sha, path in missing.items()}
+            for sha, future in futures.items():
+                try:
+                    self.put(sha, future.result())
+                    stats["extracted"] += 1
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    logger.error(f"Erro extraindo texto de {missing[sha]}: {e}")
+                    stats["failed"] += 1
+
+    def prune(self, keep: Iterable[str]) -> int:
+        """Remove entradas de PDFs que não existem mais (ou de versões antigas da extração)."""
+        if not self.cache_dir.exists():
+            return 0
+        keep_names = {self._path(sha).name for sha in keep}
+        removed = 0
+        for path in self.cache_dir.glob("*.txt"):
+            if path.name not in keep_names:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
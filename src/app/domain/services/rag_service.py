@@ -1,17 +1,45 @@
 import gc
-import os
 import re
+import copy
+import json
+import hashlib
+import time
+import threading
 import faiss
-import pickle
 import logging
 import numpy as np
+from collections import Counter
 from difflib import SequenceMatcher
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Mapping, Optional, Sequence, Set, Tuple
 from pathlib import Path
-from google import genai
-from google.genai import types
-from pypdf import PdfReader
 
+from app.domain.services.rag_chunk_store import ChunkStore
+from app.domain.services.rag_chunker import chunk_text, estimate_tokens
+from app.domain.services.rag_dedup import DedupConfig, canonical_ids, find_duplicates
+from app.domain.services.rag_document_index import DocumentIndex, exact_rerank
+from app.domain.services.rag_filters import RetrievalFilter, source_lang
+from app.domain.services.rag_index_engine import (
+    IndexEngineConfig,
+    apply_search_params,
+    build_index,
+    filtered_search_params,
+    writable_copy,
+)
+from app.domain.services.rag_index_store import (
+    CHUNKS_DIR,
+    DOCUMENTS_FILE,
+    INDEX_FILE,
+    INTENTS_FILE,
+    LEXICAL_FILE,
+    MANIFEST_FILE,
+    IndexVersionStore,
+    RagIndexSnapshot,
+)
+from app.domain.services.rag_intent_router import IntentCentroids, examples_fingerprint, keyword_intent, query_lang
+from app.domain.services.rag_memory import process_memory, workers_memory
+from app.domain.services.rag_lexical_index import BM25Index, LexicalHit, reciprocal_rank_fusion
+from app.domain.services.rag_pdf_extractor import PdfTextCache
+from app.domain.services.rag_embedder import Embedder, QueryEmbeddingCache, build_default_embedder
 from app.infrastructure.config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -19,15 +47,32 @@ logger = logging.getLogger(__name__)
 # ---------------------------------------------------------------------------
 # Configuração de qualidade de retrieval
 # ---------------------------------------------------------------------------
-# Distância L2 máxima aceita. Chunks acima deste valor são descartados.
-# Valores menores = mais restritivo. Calibrado para gemini-embedding-001 (768d).
-MAX_L2_DISTANCE = 1.2
-
 # Arquivos considerados contexto base — carregados como fallback garantido
 # quando nenhum chunk relevante é encontrado via FAISS.
 FALLBACK_FILES = {"CURRICULO.md", "STACKS.md"}
 MINIMUM_CONTEXT_FILE = "CURRICULO.md"
 
+# Top-k do retrieve_smart() por intenção (keywords ou centroides — ver rag_intent_router.py)
+TOP_K_POR_INTENCAO = {
+    "project_listing": 10,
+    "career": 6,
+    "stack": 5,
+    "document_request": 4,
+    "resume_tailoring": 8,
+    "identity": 3,
+    "default": 3,
+}
+# Partições buscadas por intenção; project_listing também fixa o idioma da pergunta
+FONTES_POR_INTENCAO = {
+    "project_listing": {"project"},
+    "document_request": {"pdf", "core"},
+    "identity": {"core"},
+}
+
+# Versão do formato do manifest de rebuild incremental (<rag_index_dir>/v<N>/manifest.json).
+# Incrementar quando mudar chunking/metadata de forma incompatível → força rebuild completo.
+MANIFEST_SCHEMA_VERSION = 4
+
 
 class ProjectDetector:
     """
@@ -37,28 +82,86 @@ class ProjectDetector:
     Para cada arquivo encontrado em `projects/`, gera automaticamente keywords
     a partir do nome do arquivo (hífens, underscores, partes individuais).
     Permite detectar quando o usuário menciona um projeto pelo nome / apelido.
+
+    As keywords ficam num índice invertido de trigramas de caracteres: a query só é
+    comparada (substring / SequenceMatcher) com as keywords que compartilham trigramas
+    com ela, em vez de varrer projetos × keywords × palavras. O markdown de cada projeto
+    fica em memória e é relido só quando o mtime do arquivo muda.
     """
 
+    # Similaridade mínima do SequenceMatcher: ~2 erros em palavra de 11 chars
+    FUZZY_MIN_RATIO = 0.82
+    # Trigramas (com padding) que uma palavra precisa compartilhar com a keyword para ir ao fuzzy
+    FUZZY_MIN_SHARED_TRIGRAMS = 2
+
     def __init__(self, projects_dir: Path):
         self.projects_dir = projects_dir
-        # {nome_normalizado: {"keywords": [...], "path": Path}}
+        # {nome_normalizado: {"keywords": [...], "path": Path}} — na ordem de carga
         self._cache: Dict[str, Dict] = {}
+        # Tabela de keywords: (keyword, nome do projeto) e quantos trigramas distintos cada uma tem
+        self._keywords: List[Tuple[str, str]] = []
+        self._keyword_trigrams: List[int] = []
+        # Posição de cada projeto no catálogo (desempate entre candidatos)
+        self._order: Dict[str, int] = {}
+        # trigrama → posições em `_keywords` (sem padding: exato; com padding: fuzzy)
+        self._exact_index: Dict[str, List[int]] = {}
+        self._fuzzy_index: Dict[str, List[int]] = {}
+        # Keywords com menos de 3 chars não têm trigrama: checadas direto por substring
+        self._short_keywords: List[int] = []
+        # {caminho: (mtime_ns, conteúdo)} do markdown dos projetos
+        self._content_cache: Dict[Path, Tuple[int, str]] = {}
+        self._dir_mtime_ns: Optional[int] = None
         self._loaded = False
 
     def load(self):
-        """Carrega/atualiza o catálogo de projetos do diretório."""
+        """Carrega/atualiza o catálogo de projetos do diretório e reconstrói o índice de trigramas."""
         if not self.projects_dir.exists():
             return
+        self._dir_mtime_ns = self.projects_dir.stat().st_mtime_ns
         self._cache.clear()
-        for md_file in self.projects_dir.glob("*.md"):
+        self._order.clear()
+        self._keywords.clear()
+        self._keyword_trigrams.clear()
+        self._exact_index.clear()
+        self._fuzzy_index.clear()
+        self._short_keywords.clear()
+        for md_file in sorted(self.projects_dir.glob("*.md")):
             # Ignora variantes em inglês (sufixo -english)
             if md_file.stem.endswith("-english"):
                 continue
             nome = md_file.stem.lower()
             keywords = self._gerar_keywords(nome)
             self._cache[nome] = {"keywords": keywords, "path": md_file}
+            self._order[nome] = len(self._order)
+            for kw in keywords:
+                self._index_keyword(kw, nome)
+        # Remove do cache de conteúdo projetos que não existem mais
+        paths = {info["path"] for info in self._cache.values()}
+        for path in [p for p in self._content_cache if p not in paths]:
+            del self._content_cache[path]
         self._loaded = True
-        logger.info(f"ProjectDetector: {len(self._cache)} projetos indexados")
+        logger.info(
+            f"ProjectDetector: {len(self._cache)} projetos indexados "
+            f"({len(self._keywords)} keywords, {len(self._fuzzy_index)} trigramas)"
+        )
+
+    def _index_keyword(self, kw: str, nome: str):
+        pos = len(self._keywords)
+        self._keywords.append((kw, nome))
+        trigrams = self._trigrams(kw)
+        self._keyword_trigrams.append(len(trigrams))
+        if len(kw) < 3:
+            self._short_keywords.append(pos)
+            return
+        for tri in trigrams:
+            self._exact_index.setdefault(tri, []).append(pos)
+        if len(kw) >= 4:
+            for tri in self._trigrams(f"  {kw} "):
+                self._fuzzy_index.setdefault(tri, []).append(pos)
+
+    @staticmethod
+    def _trigrams(text: str) -> set:
+        return {text[i: i + 3] for i in range(len(text) - 2)}
 
     def _gerar_keywords(self, nome: str) -> List[str]:
         """
@@ -76,53 +179,94 @@ class ProjectDetector:
                 kws.append(parte)
         return kws
 
-    def _fuzzy_match(self, kw: str, query_words: List[str]) -> bool:
+    def _exact_matches(self, query_lower: str) -> List[str]:
+        """Projetos com keyword contida na query: só keywords com todos os trigramas presentes são testadas."""
+        query_trigrams = self._trigrams(query_lower)
+        hits: Dict[int, int] = {}
+        for tri in query_trigrams:
+            for pos in self._exact_index.get(tri, ()):
+                hits[pos] = hits.get(pos, 0) + 1
+        candidates = [pos for pos, count in hits.items() if count == self._keyword_trigrams[pos]]
+        candidates.extend(self._short_keywords)
+        return [self._keywords[pos][1] for pos in candidates if self._keywords[pos][0] in query_lower]
+
+    def _fuzzy_matches(self, query_words: List[str]) -> List[str]:
         """
-        Levenshtein aproximado via SequenceMatcher (stdlib, zero dependências).
-        Portado de ContextSearchService.temSimilaridade() + calcularLevenshtein() (Java).
-        Ratio >= 0.82 equivale a ~2 erros em palavra de 11 chars.
-        Só aplica em keywords com 4+ chars para evitar falsos positivos.
+        Projetos com keyword similar a alguma palavra da query — Levenshtein aproximado via
+        SequenceMatcher, portado de ContextSearchService.temSimilaridade() (Java).
+        Só keywords com 4+ chars, e só as que sobrevivem à poda por trigramas e tamanho.
         """
-        if len(kw) < 4:
-            return False
+        matched: List[str] = []
+        checked = set()
         for word in query_words:
             if len(word) < 3:
                 continue
-            ratio = SequenceMatcher(None, kw, word).ratio()
-            if ratio >= 0.82:
-                return True
-        return False
+            hits: Dict[int, int] = {}
+            for tri in self._trigrams(f"  {word} "):
+                for pos in self._fuzzy_index.get(tri, ()):
+                    hits[pos] = hits.get(pos, 0) + 1
+            for pos, shared in hits.items():
+                kw, nome = self._keywords[pos]
+                if shared < self.FUZZY_MIN_SHARED_TRIGRAMS or (pos, word) in checked:
+                    continue
+                # ratio ≤ 2·min(len)/(soma dos len): tamanhos muito diferentes nunca atingem o mínimo
+                if 2 * min(len(kw), len(word)) < self.FUZZY_MIN_RATIO * (len(kw) + len(word)):
+                    continue
+                checked.add((pos, word))
+                if SequenceMatcher(None, kw, word).ratio() >= self.FUZZY_MIN_RATIO:
+                    matched.append(nome)
+        return matched
+
+    def _refresh_if_changed(self):
+        """Recarrega o catálogo se arquivos foram adicionados/removidos em projects/."""
+        try:
+            mtime_ns = self.projects_dir.stat().st_mtime_ns
+        except OSError:
+            return
+        if mtime_ns != self._dir_mtime_ns:
+            self.load()
+
+    def _read_project(self, path: Path) -> str:
+        """Markdown do projeto a partir do cache em memória; relê só se o mtime mudou."""
+        mtime_ns = path.stat().st_mtime_ns
+        cached = self._content_cache.get(path)
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+        content = path.read_text(encoding="utf-8")
+        self._content_cache[path] = (mtime_ns, content)
+        return content
 
     def detect(self, query: str) -> Optional[str]:
         """
         Retorna o conteúdo do markdown do projeto mencionado na query, ou None.
         1º tenta substring exato; se não achar, tenta fuzzy (SequenceMatcher).
+        Com mais de um candidato, vence o primeiro projeto na ordem do catálogo.
         """
         if not self._loaded:
             self.load()
+        else:
+            self._refresh_if_changed()
+        if not self._cache:
+            return None
         query_lower = query.lower()
-        query_words = query_lower.split()
-        for nome, info in self._cache.items():
-            matched = False
-            match_type = ""
-            for kw in info["keywords"]:
-                if kw in query_lower:
-                    matched = True
-                    match_type = "exato"
-                    break
-                if self._fuzzy_match(kw, query_words):
-                    matched = True
-                    match_type = "fuzzy"
-                    break
-            if matched:
-                try:
-                    content = info["path"].read_text(encoding="utf-8")
-                    logger.info(f"ProjectDetector: projeto '{nome}' detectado ({match_type}) → injetando markdown")
-                    return f"--- Projeto: {nome} ---\n{content}"
-                except Exception as e:
-                    logger.error(f"ProjectDetector: erro lendo {info['path']}: {e}")
-                    return None
-        return None
+
+        match_type = "exato"
+        candidates = self._exact_matches(query_lower)
+        if not candidates:
+            match_type = "fuzzy"
+            candidates = self._fuzzy_matches(query_lower.split())
+        if not candidates:
+            return None
+
+        nome = min(candidates, key=self._order.__getitem__)
+        path = self._cache[nome]["path"]
+        try:
+            content = self._read_project(path)
+        except Exception as e:
+            logger.error(f"ProjectDetector: erro lendo {path}: {e}")
+            return None
+        logger.info(f"ProjectDetector: projeto '{nome}' detectado ({match_type}) → injetando markdown")
+        return f"--- Projeto: {nome} ---\n{content}"
 
 
 class PortfolioRAG:
@@ -137,17 +281,50 @@ class PortfolioRAG:
     - 1.5 On-demand project loading: ProjectDetector detecta projeto → injeta md completo
     """
 
-    def __init__(self, data_dir: str = "certificados-wesley/portfolio-content"):
+    def __init__(
+        self,
+        data_dir: str = "certificados-wesley/portfolio-content",
+        embedder: Optional[Embedder] = None,
+        engine_config: Optional[IndexEngineConfig] = None,
+        index_dir: Optional[str] = None,
+    ):
         self.data_dir = Path(data_dir)
         self.documents_dir = self.data_dir.parent
-        self.index_path = "vector_store.faiss"
-        self.metadata_path = "vector_metadata.pkl"
+        # Versões do índice (FAISS + ChunkStore mmap + BM25 + manifest) com ponteiro CURRENT
+        self.index_store = IndexVersionStore(index_dir or settings.rag_index_dir)
+        # Texto extraído dos PDFs, por sha256 do arquivo (extração em process pool). Fica junto
+        # do índice, não no diretório de trabalho de quem rodou o processo
+        self.pdf_cache = PdfTextCache(
+            settings.rag_pdf_cache_dir or self.index_store.root / "pdf_text_cache",
+            workers=settings.rag_pdf_workers,
+        )
 
-        self.client = genai.Client(api_key=settings.gemini_api_key)
-        self.embedding_model = "gemini-embedding-001"
+        # Embedder plugável: Gemini em produção, HashingEmbedder em testes/benchmarks
+        self.embedder: Embedder = embedder or build_default_embedder()
+        # Cache LRU+TTL de vetores de query (com single-flight para queries concorrentes)
+        self.query_cache = QueryEmbeddingCache(
+            maxsize=settings.rag_query_cache_size,
+            ttl=settings.rag_query_cache_ttl_seconds,
+        )
+
+        # Engine FAISS (flat | hnsw | ivf_sq8 | ivf_pq). Threshold L2: chunks mais distantes são
+        # descartados. Vem do embedder (calibrado por modelo no índice exato) + folga da engine;
+        # RAG_MAX_L2_DISTANCE sobrescreve o valor final.
+        self.engine_config = engine_config or IndexEngineConfig.from_settings()
+        self.max_l2_distance = settings.rag_max_l2_distance or self.engine_config.max_l2_distance(
+            self.embedder.max_l2_distance
+        )
+        # Colapso de quase duplicatas (traduções, currículo md/PDF) no build
+        self.dedup_config = DedupConfig.from_settings()
 
-        self.index = None
-        self.chunks_metadata: List[Dict] = []
+        # Versão servida: índice FAISS, {id FAISS: metadata} (ChunkStore mmap), BM25 e manifest.
+        # Trocada inteira numa atribuição pelo reindex (hot-swap).
+        self._snapshot = RagIndexSnapshot.empty()
+        # Um build por vez neste processo (o flock do IndexVersionStore cobre os demais workers)
+        self._build_lock = threading.Lock()
+        self._build_info: Dict = {"building": False, "last_build_seconds": None, "last_build_at": None, "last_error": None}
+        # Quantas queries foram respondidas por cada caminho do retrieve()
+        self._retrieval_stats: Counter = Counter()
 
         # Contexto de fallback (curriculo + stacks) — carregado na inicialização
         self._fallback_context: str = ""
@@ -156,46 +333,129 @@ class PortfolioRAG:
         # Detector de projetos on-demand
         self.project_detector = ProjectDetector(self.data_dir / "projects")
 
+    # Acesso à versão servida (somente leitura; o build trabalha em cópias)
+    @property
+    def index(self):
+        return self._snapshot.index
+
+    @property
+    def chunks_metadata(self) -> Mapping[int, Dict]:
+        return self._snapshot.chunks
+
+    @property
+    def lexical_index(self) -> BM25Index:
+        return self._snapshot.lexical
+
     # -----------------------------------------------------------------------
     # Inicialização
     # -----------------------------------------------------------------------
 
     def initialize_or_build(self):
         """
-        Carrega RAG do disco ou reconstrói se desatualizado.
+        Carrega a versão publicada do índice e aplica apenas o delta de conteúdo alterado.
+
+        O manifest guarda o sha256 de cada arquivo-fonte e os IDs FAISS dos seus chunks.
+        Arquivos inalterados não são re-embedados; arquivos alterados/removidos têm seus
+        vetores removidos via IndexIDMap e só os chunks novos vão para a API de embeddings.
+        Sem versão compatível → rebuild completo.
         Também carrega: fallback_context e ProjectDetector.
         """
-        index_exists = (
-            os.path.exists(self.index_path) and os.path.exists(self.metadata_path)
-        )
-        needs_rebuild = not index_exists
-
-        if index_exists:
-            index_mtime = os.path.getmtime(self.index_path)
-            md_files = list(self.data_dir.glob("**/*.md"))
-            pdf_files = list(self.documents_dir.glob("*.pdf"))
-            newest_source = max(
-                [f.stat().st_mtime for f in md_files] + [f.stat().st_mtime for f in pdf_files],
-                default=0,
-            )
-            if newest_source > index_mtime:
-                logger.info("Arquivos de conteúdo mais recentes que o índice. Recriando RAG...")
-                needs_rebuild = True
-
-        if needs_rebuild:
-            logger.info("Gerando embeddings de todos os markdowns (incluindo projects/)...")
-            self._build_index()
+        if self.load():
+            logger.info("RAG Index encontrado. Verificando alterações de conteúdo...")
         else:
-            logger.info("RAG Index atualizado encontrado. Carregando...")
-            self.index = faiss.read_index(self.index_path)
-            with open(self.metadata_path, "rb") as f:
-                self.chunks_metadata = pickle.load(f)
-            if not any(str(meta.get("source", "")).lower().endswith(".pdf") for meta in self.chunks_metadata):
-                logger.info("Índice atual não contém PDFs. Recriando RAG...")
-                self._build_index()
+            logger.info("Gerando embeddings de todos os markdowns (incluindo projects/)...")
+        self.reindex()
 
+    def load(self) -> bool:
+        """
+        Carrega a versão CURRENT do disco (sem build), o fallback e o ProjectDetector.
+        Retorna False se não houver versão compatível com o embedder atual.
+        """
+        t0 = time.perf_counter()
+        snapshot = self._load_snapshot(self.index_store.current_version())
+        if snapshot is not None:
+            self._snapshot = snapshot
+            logger.info(
+                f"RAG: versão v{snapshot.version} carregada em {(time.perf_counter() - t0) * 1000:.0f}ms "
+                f"({snapshot.ntotal} chunks)."
+            )
         self._load_fallback_context()
         self.project_detector.load()
+        return snapshot is not None
+
+    def _load_snapshot(self, version: Optional[int]) -> Optional[RagIndexSnapshot]:
+        """
+        Abre uma versão publicada (índice + metadata mmap + BM25 + manifest). Retorna None
+        (forçando rebuild completo) se faltar artefato, for de outro embedder ou estiver inconsistente.
+        """
+        if version is None:
+            return None
+        directory = self.index_store.version_dir(version)
+        manifest = self.index_store.read_manifest(version)
+        if manifest is None:
+            return None
+        if manifest.get("schema") != MANIFEST_SCHEMA_VERSION:
+            logger.info("Manifest do RAG em formato antigo. Recriando índice...")
+            return None
+        if manifest.get("embedding_model") != self.embedder.model_name:
+            logger.info(
+                f"Embedder mudou ({manifest.get('embedding_model')} → {self.embedder.model_name}). "
+                "Recriando índice..."
+            )
+            return None
+        try:
+            index = self.index_store.read_index(version, mmap=settings.rag_index_mmap)
+            chunks = ChunkStore.open(directory / CHUNKS_DIR)
+            lexical = BM25Index.load(directory / LEXICAL_FILE)
+        except Exception as e:
+            logger.error(f"Erro carregando índice persistido v{version}: {e}")
+            return None
+
+        ids_manifest = {i for info in manifest.get("files", {}).values() for i in info["ids"]}
+        n_indexed = len(chunks.canonical_ids())
+        if set(chunks) != ids_manifest or index.ntotal != n_indexed or len(lexical) != n_indexed:
+            logger.warning("Índice, metadata e manifest do RAG inconsistentes. Recriando índice...")
+            chunks.close()
+            return None
+
+        persisted_engine = IndexEngineConfig.from_dict(manifest.get("index_engine"))
+        if persisted_engine is not None and persisted_engine.structural_key() == self.engine_config.structural_key():
+            apply_search_params(index, self.engine_config)
+        # Engine diferente: serve a versão como está; o próximo reindex reconstrói o índice
+        # a partir dos vetores do store, sem re-embedar
+        return RagIndexSnapshot(
+            version=version,
+            index=index,
+            chunks=chunks,
+            lexical=lexical,
+            manifest=manifest,
+            intents=self._load_intents(directory, manifest),
+            documents=self._load_documents(directory),
+        )
+
+    @staticmethod
+    def _load_intents(directory: Path, manifest: Dict) -> Optional[IntentCentroids]:
+        """Centroides de intenção da versão; sem eles (ou obsoletos) o roteamento fica só nas keywords."""
+        path = directory / INTENTS_FILE
+        if manifest.get("intent_examples") != examples_fingerprint() or not path.exists():
+            return None
+        try:
+            return IntentCentroids.load(path)
+        except Exception as e:
+            logger.error(f"Erro carregando centroides de intenção ({path}): {e}")
+            return None
+
+    @staticmethod
+    def _load_documents(directory: Path) -> Optional[DocumentIndex]:
+        """Índice de documentos da versão; ausente (versão antiga) → retrieval em um estágio até o próximo build."""
+        path = directory / DOCUMENTS_FILE
+        if not path.exists():
+            return None
+        try:
+            return DocumentIndex.load(path)
+        except Exception as e:
+            logger.error(f"Erro carregando índice de documentos ({path}): {e}")
+            return None
 
     def _load_fallback_context(self):
         """Carrega curriculo.md e stacks.md como contexto de fallback garantido."""
@@ -232,195 +492,874 @@ class PortfolioRAG:
     # Build
     # -----------------------------------------------------------------------
 
-    def _build_index(self):
+    def reindex(self, force: bool = False) -> bool:
+        """
+        Constrói uma nova versão do índice fora do caminho das requisições e faz o hot-swap.
+
+        1. Sob o lock (thread + flock entre workers), adota a versão CURRENT do disco se outro
+           processo já publicou uma mais nova.
+        2. Calcula o delta contra a versão servida trabalhando em cópias (índice clonado,
+           metadata em dict) — os retrievals em andamento continuam na versão antiga.
+        3. Grava a versão nova em diretório temporário → rename → CURRENT (atômico).
+        4. Troca o snapshot em memória numa única atribuição.
+
+        Retorna True se uma versão nova passou a ser servida.
+        """
+        with self._build_lock, self.index_store.lock():
+            self._build_info["building"] = True
+            t0 = time.perf_counter()
+            try:
+                adopted = False
+                published = self.index_store.current_version()
+                if published is not None and published != self._snapshot.version:
+                    snapshot = self._load_snapshot(published)
+                    if snapshot is not None:
+                        logger.info(f"RAG: adotando versão v{published} publicada por outro processo.")
+                        self._snapshot = snapshot
+                        adopted = True
+
+                base = self._snapshot if self._snapshot.index is not None and not force else RagIndexSnapshot.empty()
+                built = self._build_next(base)
+                if built is None:
+                    return adopted
+                chunks, vectors, index, manifest, intents = built
+
+                manifest["build_seconds"] = round(time.perf_counter() - t0, 3)
+                manifest["built_at"] = time.time()
+                version = self.index_store.publish(
+                    lambda directory: self._write_version(directory, index, chunks, vectors, manifest, intents)
+                )
+                directory = self.index_store.version_dir(version)
+                lexical = BM25Index.load(directory / LEXICAL_FILE)
+                if settings.rag_index_mmap:
+                    # Serve a cópia do disco (mmap), não a do build: a memória do índice
+                    # passa a ser page cache compartilhado com os demais workers
+                    index = self.index_store.read_index(version)
+                    apply_search_params(index, self.engine_config)
+                snapshot = RagIndexSnapshot(
+                    version=version,
+                    index=index,
+                    # Reabre a metadata via mmap: libera os dicts Python da RAM
+                    chunks=ChunkStore.open(directory / CHUNKS_DIR),
+                    lexical=lexical,
+                    manifest=manifest,
+                    intents=intents,
+                    documents=self._load_documents(directory),
+                )
+
+                # Hot-swap: uma atribuição; quem já leu o snapshot antigo termina nele
+                self._snapshot = snapshot
+                self._load_fallback_context()
+                self._build_info.update(
+                    last_build_seconds=manifest["build_seconds"], last_build_at=manifest["built_at"], last_error=None
+                )
+                logger.info(
+                    f"RAG Index v{version} publicado em {manifest['build_seconds']:.1f}s "
+                    f"({snapshot.ntotal} chunks, engine={self.engine_config.engine})."
+                )
+                return True
+            except Exception as e:
+                self._build_info["last_error"] = str(e)
+                raise
+            finally:
+                self._build_info["building"] = False
+
+    @property
+    def is_ready(self) -> bool:
+        """
+        Retrieval completo ativo (há uma versão do índice servida). False = modo degradado:
+        o retrieve() responde com o fallback (currículo + stacks) e o ProjectDetector segue ativo.
+        """
+        return self._snapshot.ntotal > 0
+
+    def index_info(self) -> Dict:
+        """Versão servida, duração do último build e estado do reindexador."""
+        snapshot = self._snapshot
+        return {
+            "ready": self.is_ready,
+            "version": snapshot.version,
+            "chunks": snapshot.ntotal,
+            "engine": self.engine_config.engine,
+            "build_seconds": snapshot.manifest.get("build_seconds"),
+            "built_at": snapshot.manifest.get("built_at"),
+            **self._build_info,
+        }
+
+    def index_report(self) -> Dict:
+        """`index_info()` + tamanho em disco, fontes e distribuição de tokens da versão servida."""
+        snapshot = self._snapshot
+        report = self.index_info()
+        report["sources"] = len(snapshot.manifest.get("files", {}))
+        report["embedding_model"] = snapshot.manifest.get("embedding_model")
+        report["disk_bytes"] = self.index_store.nbytes(snapshot.version) if snapshot.version else 0
+        report["partitions"] = snapshot.partitions.counts()
+        report["intents"] = list(snapshot.intents.names) if snapshot.intents is not None else None
+        report["documents"] = len(snapshot.documents) if snapshot.documents is not None else None
+        if isinstance(snapshot.chunks, ChunkStore):
+            report["duplicates_collapsed"] = len(snapshot.chunks) - len(snapshot.chunks.canonical_ids())
+        if isinstance(snapshot.chunks, ChunkStore) and len(snapshot.chunks):
+            tokens = np.asarray(snapshot.chunks.tokens)
+            report["tokens"] = {
+                "total": int(tokens.sum()),
+                "p50": int(np.median(tokens)),
+                "max": int(tokens.max()),
+            }
+        return report
+
+    def memory_report(self) -> Dict:
+        """
+        Memória deste worker: RSS/PSS do processo, parte mapeada de `rag_index/` (compartilhada
+        entre workers quando em mmap) e o BM25, que fica no heap de cada processo.
+        """
+        lexical = self._snapshot.lexical
+        report = process_memory(mapped_under=str(self.index_store.root))
+        report["index_mmap"] = settings.rag_index_mmap
+        bm25_arrays = (lexical.ids, lexical.doc_len, lexical.post_offsets, lexical.post_rows, lexical.post_tf, lexical.idf)
+        report["bm25_heap_mb"] = round(sum(a.nbytes for a in bm25_arrays) / 2**20, 1)
+        return report
+
+    def verify(self, sample: int = 200, min_self_recall: float = 0.95) -> Dict:
+        """
+        Confere a versão servida contra o disco e contra si mesma:
+
+        - manifest em dia com os arquivos do portfólio (nada novo, alterado ou removido);
+        - BM25 com exatamente os IDs canônicos do store de chunks (os que estão no FAISS);
+        - self-recall: o vetor persistido de uma amostra de chunks, buscado no índice,
+          precisa devolver o próprio chunk — ou o canônico de uma duplicata colapsada, ou um
+          idêntico, à distância ~0 — no top-10.
+        """
+        snapshot = self._snapshot
+        problems: List[str] = []
+        if snapshot.index is None:
+            return {"ok": False, "version": None, "problems": ["nenhuma versão do índice carregada"]}
+
+        manifest_files = snapshot.manifest.get("files", {})
+        current = self._scan_sources(manifest_files)
+        stale = sorted(
+            rel for rel, (_, _, sha, _, _) in current.items()
+            if rel not in manifest_files or manifest_files[rel]["sha256"] != sha
+        )
+        stale += sorted(rel for rel in manifest_files if rel not in current)
+        if stale:
+            problems.append(f"{len(stale)} fonte(s) fora do índice ou desatualizada(s): {stale[:5]}")
+
+        if set(snapshot.lexical.ids.tolist()) != set(self._indexed_ids(snapshot).tolist()):
+            problems.append("IDs do BM25 diferentes dos IDs canônicos do store de chunks")
+
+        self_recall = None
+        if isinstance(snapshot.chunks, ChunkStore) and len(snapshot.chunks):
+            store = snapshot.chunks
+            rows = np.random.default_rng(0).choice(len(store), size=min(sample, len(store)), replace=False)
+            rows = np.sort(rows)
+            queries = np.array(store.vectors[rows], dtype="float32")
+            duplicate_of = np.asarray(store.duplicate_of[rows])
+            expected = np.where(duplicate_of >= 0, duplicate_of, store.ids[rows])
+            distances, indices = snapshot.index.search(queries, min(10, snapshot.ntotal))
+            found = sum(
+                int(chunk_id) in indices[i] or bool(distances[i][0] <= 1e-4)
+                for i, chunk_id in enumerate(expected.tolist())
+            )
+            self_recall = found / len(expected)
+            if self_recall < min_self_recall:
+                problems.append(f"self-recall {self_recall:.3f} abaixo de {min_self_recall}")
+
+        return {
+            "ok": not problems,
+            "version": snapshot.version,
+            "chunks": snapshot.ntotal,
+            "self_recall": self_recall,
+            "problems": problems,
+        }
+
+    def _empty_manifest(self) -> Dict:
+        return {
+            "schema": MANIFEST_SCHEMA_VERSION,
+            "embedding_model": self.embedder.model_name,
+            "index_engine": self.engine_config.to_dict(),
+            "next_id": 0,
+            "files": {},
+            "intent_examples": None,
+            "dedup": None,
+        }
+
+    def _discover_sources(self) -> List[Tuple[str, Path, str]]:
+        """Lista (source, caminho, tipo) de todos os arquivos indexáveis: markdowns e PDFs."""
+        sources: List[Tuple[str, Path, str]] = []
+        for md_file in sorted(self.data_dir.glob("**/*.md")):
+            rel_str = str(md_file.relative_to(self.data_dir)).replace("\\", "/")
+            sources.append((rel_str, md_file, "md"))
+        for pdf_file in sorted(self.documents_dir.glob("*.pdf")):
+            sources.append((pdf_file.name, pdf_file, "pdf"))
+        return sources
+
+    @staticmethod
+    def _file_hash(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 16), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _chunk_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _chunk_source(self, rel_str: str, path: Path, kind: str, sha256: Optional[str] = None) -> List[Dict]:
+        """
+        Gera os chunks (texto + metadata source-aware) de um arquivo-fonte.
+        O header do documento vai em todos os chunks; o token_count já o inclui.
+        """
+        if kind == "pdf":
+            content = self._extract_pdf_text(path, sha256)
+            if not content:
+                logger.warning(f"PDF sem texto extraível: {path}")
+                return []
+            header = f"--- Documento PDF: {rel_str} ---"
+            is_project = False
+            is_fallback = False
+        else:
+            content = self._sanitize_markdown(path.read_text(encoding="utf-8"))
+            is_project = "projects/" in rel_str
+            is_fallback = path.name.upper() in {f.upper() for f in FALLBACK_FILES}
+
+            tags = []
+            frontmatter_match = re.search(r"^---\n(.*?)\n---", content, re.DOTALL)
+            if frontmatter_match:
+                fm_text = frontmatter_match.group(1)
+                tags_match = re.search(r"tags:\s*\[(.*?)\]", fm_text)
+                if tags_match:
+                    tags = [t.strip() for t in tags_match.group(1).split(",")]
+
+            header = f"--- Documento: {rel_str} ---"
+            if tags:
+                header += f"\nTags: {', '.join(tags)}"
+
+        file_chunks = chunk_text(
+            content,
+            max_tokens=settings.rag_chunk_max_tokens,
+            overlap_tokens=settings.rag_chunk_overlap_tokens,
+            header=header,
+        )
+        return [
+            {
+                "text": chunk,
+                "source": rel_str,
+                "is_project": is_project,
+                "is_fallback": is_fallback,
+                "chunk_hash": self._chunk_hash(chunk),
+                "token_count": estimate_tokens(chunk),
+            }
+            for chunk in file_chunks
+        ]
+
+    def _scan_sources(self, manifest_files: Dict[str, Dict]) -> Dict[str, Tuple[Path, str, str, int, int]]:
+        """
+        {source: (caminho, tipo, sha256, mtime_ns, tamanho)} dos arquivos indexáveis.
+        Arquivo com mtime e tamanho iguais aos do manifest reaproveita o sha256 sem reler o
+        conteúdo — o reindex periódico não re-hasheia o corpus inteiro a cada ciclo.
+        """
+        current: Dict[str, Tuple[Path, str, str, int, int]] = {}
+        for rel_str, path, kind in self._discover_sources():
+            try:
+                stat = path.stat()
+                entry = manifest_files.get(rel_str)
+                if entry and entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size:
+                    sha = entry["sha256"]
+                else:
+                    sha = self._file_hash(path)
+                current[rel_str] = (path, kind, sha, stat.st_mtime_ns, stat.st_size)
+            except OSError as e:
+                logger.error(f"Erro lendo {path}: {e}")
+        return current
+
+    def _build_next(self, base: RagIndexSnapshot):
         """
-        Reconstrói o índice FAISS com metadata source-aware por chunk.
+        Calcula a próxima versão como delta da versão `base`, sem tocar nela.
+
+        1. Compara o sha256 de cada arquivo com o manifest → arquivos novos/alterados/removidos.
+        2. Re-chunka só os arquivos novos/alterados. Chunks cujo texto já existia no índice
+           reaproveitam o vetor persistido no store — só o resto vai para o embedder.
+        3. Numa cópia em heap do índice, remove os IDs antigos (remove_ids) e adiciona os novos
+           (add_with_ids). Engines sem remoção (HNSW) ou troca de engine reconstroem o
+           índice a partir dos vetores, sem chamar a API.
 
-        Estratégia de memória: processa em duas passagens para evitar manter
-        all_chunks + embeddings + chunks_metadata simultaneamente na RAM.
-          1ª passagem: monta all_chunks (texto + meta) e libera logo após geração dos embeddings.
-          2ª passagem: cria emb_matrix e libera a lista de embeddings antes de adicionar ao FAISS.
+        4. Recalcula os centroides de intenção se as frases de exemplo mudaram (ou no build completo).
+
+        Retorna (chunks, vetores, índice, manifest, centroides) da nova versão, ou None se nada mudou.
         """
         if not self.data_dir.exists():
             logger.warning(f"Diretório do portfólio não encontrado: {self.data_dir}")
-            return
+            return None
 
-        md_files = sorted(self.data_dir.glob("**/*.md"))
-        pdf_files = sorted(self.documents_dir.glob("*.pdf"))
-        logger.info(f"RAG: indexando {len(md_files)} markdowns e {len(pdf_files)} PDFs...")
+        manifest = copy.deepcopy(base.manifest) if base.index is not None else self._empty_manifest()
+        persisted_engine = IndexEngineConfig.from_dict(manifest.get("index_engine"))
+        engine_changed = persisted_engine is None or persisted_engine.structural_key() != self.engine_config.structural_key()
+        manifest["index_engine"] = self.engine_config.to_dict()
+        manifest_files: Dict[str, Dict] = manifest["files"]
+        current = self._scan_sources(manifest_files)
 
-        # --- 1ª passagem: extração de chunks -----------------------------------
-        all_chunks: List[Tuple[str, Dict]] = []
+        removed = [rel for rel in manifest_files if rel not in current]
+        changed = [
+            rel for rel, (_, _, sha, _, _) in current.items()
+            if rel not in manifest_files or manifest_files[rel]["sha256"] != sha
+        ]
+        intents = base.intents
+        intents_stale = intents is None or manifest.get("intent_examples") != examples_fingerprint()
+        # Versão publicada antes do índice de documentos: regrava a partir dos vetores, sem re-embedar
+        documents_missing = base.index is not None and base.documents is None
+        # Limiares do colapso de duplicatas mudaram (ou versão anterior a ele): recalcula os grupos
+        dedup_stale = manifest.get("dedup") != self.dedup_config.to_dict()
+        derived_stale = intents_stale or documents_missing or dedup_stale
+        if not removed and not changed and not engine_changed and not derived_stale:
+            logger.info(f"RAG Index atualizado ({base.ntotal} chunks). Nada a re-embedar.")
+            return None
+
+        if engine_changed and base.index is not None:
+            # Troca de engine não exige re-embedar: reconstrói o índice a partir dos vetores do store
+            logger.info(
+                f"Engine do índice mudou ({persisted_engine.engine if persisted_engine else '?'} → "
+                f"{self.engine_config.engine}). Reconstruindo índice a partir dos vetores persistidos..."
+            )
+        logger.info(
+            f"RAG: {len(changed)} arquivo(s) novo(s)/alterado(s), {len(removed)} removido(s) "
+            f"de {len(current)} fontes."
+        )
 
-        for md_file in md_files:
+        # A versão servida é somente-leitura: metadata e vetores são copiados para dicts
+        chunks: Dict[int, Dict] = dict(base.chunks.items())
+        vectors: Dict[int, np.ndarray] = base.chunks.vector_map() if isinstance(base.chunks, ChunkStore) else {}
+
+        # Vetores reaproveitáveis: chunks dos arquivos que vão sair do índice, por hash do texto
+        stale_ids: List[int] = []
+        for rel in removed + [r for r in changed if r in manifest_files]:
+            stale_ids.extend(manifest_files[rel]["ids"])
+        reusable: Dict[str, int] = {}
+        for chunk_id in stale_ids:
+            meta = chunks.get(chunk_id)
+            if meta and meta.get("chunk_hash"):
+                reusable.setdefault(meta["chunk_hash"], chunk_id)
+
+        # --- 1ª passagem: extração de chunks dos arquivos alterados -------------
+        pdfs = [(current[rel][0], current[rel][2]) for rel in changed if current[rel][1] == "pdf"]
+        if pdfs:
+            t0 = time.perf_counter()
+            pdf_stats = self.pdf_cache.prefetch(pdfs)
+            logger.info(
+                f"RAG: texto de {len(pdfs)} PDF(s) pronto em {time.perf_counter() - t0:.1f}s "
+                f"({pdf_stats['extracted']} extraídos, {pdf_stats['cached']} do cache, {pdf_stats['failed']} com erro)"
+            )
+
+        new_chunks: List[Tuple[str, Dict]] = []
+        for rel in changed:
+            path, kind, sha, _, _ = current[rel]
             try:
-                content = self._sanitize_markdown(md_file.read_text(encoding="utf-8"))
-                rel = md_file.relative_to(self.data_dir)
-                rel_str = str(rel).replace("\\", "/")
-
-                is_project = "projects/" in rel_str
-                is_fallback = md_file.name.upper() in {f.upper() for f in FALLBACK_FILES}
-
-                tags = []
-                frontmatter_match = re.search(r"^---\n(.*?)\n---", content, re.DOTALL)
-                if frontmatter_match:
-                    fm_text = frontmatter_match.group(1)
-                    tags_match = re.search(r"tags:\s*\[(.*?)\]", fm_text)
-                    if tags_match:
-                        tags = [t.strip() for t in tags_match.group(1).split(",")]
-
-                header = f"--- Documento: {rel_str} ---\n"
-                if tags:
-                    header += f"Tags: {', '.join(tags)}\n"
-
-                texto_com_header = header + content
-                # Libera o conteúdo bruto do arquivo da RAM imediatamente
-                del content
-
-                file_chunks = self._chunk_text(texto_com_header, chunk_size=1000, overlap=100)
-                for chunk in file_chunks:
-                    meta = {
-                        "text": chunk,
-                        "source": rel_str,
-                        "is_project": is_project,
-                        "is_fallback": is_fallback,
-                    }
-                    all_chunks.append((chunk, meta))
+                for meta in self._chunk_source(rel, path, kind, sha):
+                    new_chunks.append((rel, meta))
             except Exception as e:
-                logger.error(f"Erro lendo {md_file}: {e}")
+                logger.error(f"Erro lendo {path}: {e}")
+                # Não registra no manifest: o arquivo será reprocessado no próximo reindex
+                current.pop(rel)
 
-        for pdf_file in pdf_files:
-            try:
-                content = self._extract_pdf_text(pdf_file)
-                if not content:
-                    logger.warning(f"PDF sem texto extraível: {pdf_file}")
-                    continue
+        # --- 2ª passagem: embeddings só do que não pôde ser reaproveitado ----------
+        reused_vectors: Dict[int, np.ndarray] = {}
+        to_embed: List[int] = []
+        for pos, (_, meta) in enumerate(new_chunks):
+            old_id = reusable.get(meta["chunk_hash"])
+            if old_id is not None and old_id in vectors:
+                reused_vectors[pos] = vectors[old_id]
+            else:
+                to_embed.append(pos)
 
-                rel_str = pdf_file.name
-                header = f"--- Documento PDF: {rel_str} ---\n"
-                texto_com_header = header + content
-                file_chunks = self._chunk_text(texto_com_header, chunk_size=900, overlap=120)
-                for chunk in file_chunks:
-                    meta = {
-                        "text": chunk,
-                        "source": rel_str,
-                        "is_project": False,
-                        "is_fallback": False,
-                    }
-                    all_chunks.append((chunk, meta))
-            except Exception as e:
-                logger.error(f"Erro lendo PDF {pdf_file}: {e}")
+        embedded = None
+        if to_embed:
+            t0 = time.perf_counter()
+            embedded = self.embedder.embed_documents([new_chunks[pos][1]["text"] for pos in to_embed])
+            elapsed = time.perf_counter() - t0
+            logger.info(
+                f"RAG: {len(to_embed)} embeddings gerados em {elapsed:.1f}s "
+                f"({len(to_embed) / max(elapsed, 1e-9):.1f} chunks/s); {len(reused_vectors)} reaproveitados"
+            )
 
-        if not all_chunks:
-            logger.warning("Nenhum texto extraído. RAG vazio.")
-            return
+        # --- 3ª passagem: aplica o delta nos dicts, colapsa duplicatas e atualiza uma cópia do índice
+        for chunk_id in stale_ids:
+            chunks.pop(chunk_id, None)
+            vectors.pop(chunk_id, None)
+        for rel in removed + changed:
+            manifest_files.pop(rel, None)
 
-        total_chunks = len(all_chunks)
+        if new_chunks:
+            dimension = embedded.shape[1] if embedded is not None else len(next(iter(reused_vectors.values())))
+            emb_matrix = np.empty((len(new_chunks), dimension), dtype="float32")
+            for row, pos in enumerate(to_embed):
+                emb_matrix[pos] = embedded[row]
+            for pos, vec in reused_vectors.items():
+                emb_matrix[pos] = vec
+            del embedded, reused_vectors
+            gc.collect()
 
-        # --- 2ª passagem: geração de embeddings (streaming, sem duplicar textos) --
-        # Usa array numpy pré-alocado para evitar realocações sucessivas da lista Python
-        embeddings_list: List[List[float]] = []
-        self.chunks_metadata = []
+            next_id = manifest["next_id"]
+            ids = np.arange(next_id, next_id + len(new_chunks), dtype="int64")
+            manifest["next_id"] = next_id + len(new_chunks)
 
-        for i, (chunk_text, meta) in enumerate(all_chunks):
-            response = self.client.models.embed_content(
-                model=self.embedding_model,
-                contents=chunk_text,
-                config=types.EmbedContentConfig(task_type="RETRIEVAL_DOCUMENT"),
-            )
-            embeddings_list.append(response.embeddings[0].values)
-            meta["id"] = i
-            self.chunks_metadata.append(meta)
+            for row, (chunk_id, (rel, meta)) in enumerate(zip(ids.tolist(), new_chunks)):
+                meta["id"] = chunk_id
+                chunks[chunk_id] = meta
+                vectors[chunk_id] = emb_matrix[row]
+                manifest_files.setdefault(rel, {"ids": []})["ids"].append(chunk_id)
+            del emb_matrix
 
-        # Libera all_chunks antes de criar a matriz numpy (pico de memória reduzido)
-        del all_chunks
-        gc.collect()
+        # Só chunks canônicos entram no FAISS/BM25; duplicatas ficam no store apontando para eles
+        indexed = self._collapse_duplicates(chunks, vectors)
+        manifest["dedup"] = self.dedup_config.to_dict()
 
-        emb_matrix = np.array(embeddings_list, dtype="float32")
-        # Libera a lista de embeddings Python agora que temos o array numpy
-        del embeddings_list
-        gc.collect()
+        incremental = base.index is not None and self.engine_config.supports_remove and not engine_changed
+        index = None
+        if incremental:
+            index = writable_copy(base.index)
+            apply_search_params(index, self.engine_config)
+            previously_indexed = set(self._indexed_ids(base).tolist())
+            to_remove = sorted(previously_indexed - indexed)
+            to_add = sorted(indexed - previously_indexed)
+            if to_remove:
+                index.remove_ids(np.array(to_remove, dtype="int64"))
+            if to_add:
+                index.add_with_ids(np.stack([vectors[i] for i in to_add]), np.array(to_add, dtype="int64"))
+        elif vectors:
+            # Build completo, troca de engine ou engine sem remove_ids: (re)cria o índice com todos os vetores
+            index = self._build_engine_index({i: vectors[i] for i in indexed})
 
-        dimension = emb_matrix.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(emb_matrix)
-        del emb_matrix
+        # Arquivos sem chunks (ex.: PDF sem texto) também entram no manifest para não serem re-lidos
+        for rel, (_, _, sha, mtime_ns, size) in current.items():
+            if rel in changed or rel in manifest_files:
+                entry = manifest_files.setdefault(rel, {"ids": []})
+                entry.update(sha256=sha, mtime_ns=mtime_ns, size=size)
+        self.pdf_cache.prune(sha for _, kind, sha, _, _ in current.values() if kind == "pdf")
+        del new_chunks
         gc.collect()
 
-        faiss.write_index(self.index, self.index_path)
-        with open(self.metadata_path, "wb") as f:
-            pickle.dump(self.chunks_metadata, f)
+        if index is None:
+            logger.warning("Nenhum texto extraído. RAG vazio.")
+            return None
+        if index.ntotal == 0:
+            logger.warning("Todos os chunks foram removidos. RAG vazio.")
+
+        if intents_stale:
+            t0 = time.perf_counter()
+            intents = IntentCentroids.build(self.embedder)
+            manifest["intent_examples"] = examples_fingerprint()
+            logger.info(
+                f"RAG: {len(intents.names)} centroides de intenção calculados em "
+                f"{(time.perf_counter() - t0) * 1000:.0f}ms"
+            )
+        return chunks, vectors, index, manifest, intents
 
-        logger.info(f"RAG Index gerado com sucesso! ({total_chunks} chunks).")
+    def _collapse_duplicates(self, chunks: Dict[int, Dict], vectors: Dict[int, np.ndarray]) -> Set[int]:
+        """Marca `duplicate_of` em cada chunk (rag_dedup) e retorna os IDs canônicos."""
+        t0 = time.perf_counter()
+        duplicates = find_duplicates(chunks, vectors, self.dedup_config)
+        for chunk_id, meta in chunks.items():
+            meta["duplicate_of"] = duplicates.get(chunk_id)
+        if duplicates:
+            logger.info(
+                f"RAG: {len(duplicates)} chunk(s) quase duplicado(s) colapsado(s) em "
+                f"{len(set(duplicates.values()))} canônico(s) em {(time.perf_counter() - t0) * 1000:.0f}ms"
+            )
+        return canonical_ids(chunks)
+
+    @staticmethod
+    def _indexed_ids(snapshot: RagIndexSnapshot) -> np.ndarray:
+        """IDs presentes no índice FAISS da versão (os chunks canônicos)."""
+        if isinstance(snapshot.chunks, ChunkStore):
+            return snapshot.chunks.canonical_ids()
+        return np.array(sorted(canonical_ids(snapshot.chunks)), dtype="int64")
+
+    def _build_engine_index(self, vectors: Dict[int, np.ndarray]):
+        """Cria o índice da engine configurada a partir de {id: vetor}."""
+        ids = np.array(sorted(vectors), dtype="int64")
+        matrix = np.stack([vectors[i] for i in ids.tolist()]) if len(ids) else np.zeros((0, 0), dtype="float32")
+        t0 = time.perf_counter()
+        index = build_index(self.engine_config, matrix, ids)
+        logger.info(
+            f"RAG: índice {self.engine_config.engine} com {len(ids)} vetores montado em "
+            f"{(time.perf_counter() - t0) * 1000:.0f}ms"
+        )
+        return index
+
+    def _write_version(
+        self,
+        directory: Path,
+        index,
+        chunks: Dict[int, Dict],
+        vectors: Dict[int, np.ndarray],
+        manifest: Dict,
+        intents: Optional[IntentCentroids] = None,
+    ) -> None:
+        """
+        Grava os artefatos de uma versão (índice, store de chunks, BM25, intenções, documentos
+        e, por último, o manifest).
+        """
+        faiss.write_index(index, str(directory / INDEX_FILE))
+        DocumentIndex.build(chunks, vectors).save(directory / DOCUMENTS_FILE)
+        if intents is not None:
+            intents.save(directory / INTENTS_FILE)
+        ChunkStore.write(directory / CHUNKS_DIR, chunks, vectors, vector_dtype=self.engine_config.vector_dtype)
+        # BM25 montado junto com o FAISS, enquanto os textos ainda estão em memória
+        BM25Index.build(
+            {i: meta["text"] for i, meta in chunks.items() if meta.get("duplicate_of") is None}
+        ).save(directory / LEXICAL_FILE)
+        with open(directory / MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
 
     # -----------------------------------------------------------------------
     # Retrieval
     # -----------------------------------------------------------------------
 
     @staticmethod
-    def _calcular_top_k(query: str) -> int:
+    def _detectar_intencao(query: str) -> str:
         """
-        Top-k dinâmico por intenção.
+        Intenção da query só por keyword (`classify_message`): qualquer uma de INTENTS ou default.
         Portado de PortfolioPromptService.calcularLimiteContextos() (Java).
         """
-        lower = query.lower()
-        if any(k in lower for k in ("quais projetos", "todos os projetos", "listar projetos", "list projects")):
-            return 10
-        if any(k in lower for k in ("trabalho", "emprego", "experiência", "experiencia", "carreira", "onde trabalh")):
-            return 6
-        if any(k in lower for k in ("stack", "tecnolog", "linguagem", "framework", "ferramenta")):
-            return 5
-        return 3  # default
+        return keyword_intent(query) or "default"
 
-    async def retrieve(self, query: str, top_k: int = 3) -> str:
-        """
-        Busca FAISS com threshold de distância L2 e fallback garantido.
-        Prefira `retrieve_smart()` que calcula top_k automaticamente.
+    @classmethod
+    def _calcular_top_k(cls, query: str) -> int:
+        """Top-k dinâmico por intenção."""
+        return TOP_K_POR_INTENCAO[cls._detectar_intencao(query)]
+
+    async def route_intent(self, query: str) -> Tuple[str, str]:
         """
-        if not self.index or self.index.ntotal == 0:
-            logger.warning("RAG vazio, usando fallback.")
-            return self._fallback_context
+        Intenção da query e como foi decidida (keyword | lexical | embedding | default).
 
-        response = await self.client.aio.models.embed_content(
-            model=self.embedding_model,
-            contents=query,
-            config=types.EmbedContentConfig(task_type="RETRIEVAL_QUERY"),
+        As keywords resolvem sem custo. Sem match, o vetor da query (o mesmo que o retrieve()
+        vai usar, via cache) é comparado com os centroides de intenção numa multiplicação —
+        exceto quando o BM25 já tem um hit forte: o retrieve() vai responder só pelo léxico,
+        e embedar a query para rotear seria a única chamada ao embedder.
+        """
+        intencao = keyword_intent(query)
+        if intencao is not None:
+            return intencao, "keyword"
+        snapshot = self._snapshot
+        intents = snapshot.intents
+        if not settings.rag_intent_routing_enabled or intents is None or snapshot.ntotal == 0:
+            return "default", "default"
+        if settings.rag_hybrid_enabled:
+            # Mesma busca que o retrieve() fará com a intenção default (sem filtro de partição)
+            k_busca = min(TOP_K_POR_INTENCAO["default"] * 3, snapshot.ntotal)
+            hits = self._lexical_hits(snapshot, query, k_busca)
+            if hits and self._is_strong_lexical_hit(hits[0]):
+                return "default", "lexical"
+        query_vec = await self._embed_query(query)
+        if query_vec.shape[-1] != intents.dimension:
+            return "default", "default"
+        intencao, similaridade = intents.classify(
+            query_vec, settings.rag_intent_min_similarity, settings.rag_intent_min_margin
         )
-        query_vec = np.array([response.embeddings[0].values]).astype("float32")
+        if intencao is None:
+            return "default", "default"
+        logger.debug(f"RAG intenção por embedding: {intencao} (cos={similaridade:.3f})")
+        return intencao, "embedding"
+
+    @staticmethod
+    def _filtro_por_intencao(intencao: str, query: str) -> Optional[RetrievalFilter]:
+        """
+        Partições buscadas pela intenção. Listagem de projetos fica no idioma da pergunta
+        (cada projeto tem versão PT e EN — sem filtro, as duas disputariam o top-k).
+        """
+        kinds = FONTES_POR_INTENCAO.get(intencao)
+        if kinds is None:
+            return None
+        lang = query_lang(query) if intencao == "project_listing" else None
+        return RetrievalFilter.of(kinds=kinds, lang=lang)
+
+    async def retrieve(
+        self,
+        query: str,
+        top_k: int = 3,
+        max_tokens: Optional[int] = None,
+        filters: Optional[RetrievalFilter] = None,
+        trace: Optional[Dict] = None,
+    ) -> str:
+        """
+        Busca híbrida: BM25 (léxico) + FAISS (denso) fundidos por Reciprocal Rank Fusion,
+        com threshold de distância L2 e fallback garantido.
+
+        Se o melhor hit léxico cobre praticamente todos os termos da query e casa um termo
+        raro (ex.: "FULLCYCLE"), responde só com o BM25 — sem a chamada de embedding.
+        Com `max_tokens`, empacota chunks inteiros (pelo token_count da metadata) até o orçamento.
+        Com `filters` (tipo de fonte / idioma), FAISS e BM25 ranqueiam só a partição pedida.
+        Chunk canônico em outro idioma que a pergunta (`query_lang()`) é servido pela
+        duplicata colapsada no idioma dela, quando existe (ex.: STACKS-english.md).
+        Com `trace`, o dict recebe o caminho usado, as fontes e os tokens do contexto.
+        Prefira `retrieve_smart()` que calcula top_k e filtro automaticamente.
+        """
+        traces = [trace] if trace is not None else None
+        results = await self.retrieve_many([query], top_k=top_k, max_tokens=max_tokens, filters=filters, traces=traces)
+        return results[0]
+
+    async def retrieve_many(
+        self,
+        queries: Sequence[str],
+        top_k: int = 3,
+        max_tokens: Optional[int] = None,
+        filters: Optional[RetrievalFilter] = None,
+        traces: Optional[List[Dict]] = None,
+    ) -> List[str]:
+        """
+        `retrieve()` de várias queries numa rodada (expansão de query, mensagem com várias
+        perguntas): BM25 por query, um único lote de embeddings para as queries que não
+        resolveram pelo léxico nem estão no cache, e um único `index.search` sobre a matriz
+        empilhada. Retorna um contexto por query, na mesma ordem.
+
+        `traces` (um dict por query, mesma ordem) recebe `mode` (lexical | hybrid | vector |
+        fallback), `sources` e `tokens` do contexto montado — usado pelo benchmark de retrieval.
+        """
+        if not queries:
+            return []
+        if traces is None:
+            traces = [{} for _ in queries]
+        # Uma leitura do snapshot: um reindex concorrente não troca o índice no meio da rodada
+        snapshot = self._snapshot
+        if snapshot.ntotal == 0:
+            if self._build_info["building"]:
+                logger.info("RAG: índice em construção, usando fallback (curriculo+stacks).")
+            else:
+                logger.warning("RAG vazio, usando fallback.")
+            self._retrieval_stats["fallback"] += len(queries)
+            for trace in traces:
+                self._trace_fallback(trace)
+            return [self._fallback_context] * len(queries)
+
+        allowed_ids = None
+        search_params = None
+        n_candidatos = snapshot.ntotal
+        if filters is not None:
+            allowed_ids = snapshot.partitions.ids(filters)
+            if len(allowed_ids):
+                search_params = filtered_search_params(snapshot.index, snapshot.partitions.selector(filters))
+                n_candidatos = len(allowed_ids)
+            else:
+                logger.info(f"RAG: filtro {filters.describe()} sem chunks nesta versão. Buscando sem filtro.")
+                allowed_ids = filters = None
 
         # Busca mais candidatos para filtrar por threshold
-        k_busca = min(top_k * 3, self.index.ntotal)
-        distances, indices = self.index.search(query_vec, k_busca)
+        k_busca = min(top_k * 3, n_candidatos)
+        filtro = f" [{filters.describe()}]" if filters is not None else ""
+        # Idioma do texto servido: o do filtro ou o da pergunta (escolhe entre canônico e duplicata)
+        langs = [
+            filters.lang if filters is not None and filters.lang is not None else query_lang(query)
+            for query in queries
+        ]
+
+        results: List[Optional[str]] = [None] * len(queries)
+        lexical_ids: Dict[int, List[int]] = {}
+        for pos, query in enumerate(queries):
+            lexical_ids[pos] = []
+            if settings.rag_hybrid_enabled:
+                hits = self._lexical_hits(snapshot, query, k_busca, allowed_ids)
+                lexical_ids[pos] = [hit.chunk_id for hit in hits]
+                if hits and self._is_strong_lexical_hit(hits[0]):
+                    self._retrieval_stats["lexical"] += 1
+                    traces[pos]["mode"] = "lexical"
+                    results[pos] = self._format_context(
+                        snapshot, lexical_ids[pos], top_k, max_tokens, "bm25" + filtro, langs[pos], traces[pos]
+                    )
+
+        pending = [pos for pos, result in enumerate(results) if result is None]
+        if pending:
+            query_vecs = await self._embed_queries([queries[pos] for pos in pending])
+            if self._usa_hierarquico(snapshot):
+                vector_hits = [self._hierarchical_search(snapshot, vec, k_busca, filters) for vec in query_vecs]
+                filtro = " 2-estágios" + filtro
+            else:
+                vector_hits = self._vector_search(snapshot, query_vecs, k_busca, search_params)
 
+            for pos, vector_ids in zip(pending, vector_hits):
+                if lexical_ids[pos]:
+                    ranked = reciprocal_rank_fusion([vector_ids, lexical_ids[pos]], k=settings.rag_rrf_k)
+                    mode = "híbrido" + filtro
+                else:
+                    ranked = vector_ids
+                    mode = "vetorial" + filtro
+
+                if ranked:
+                    traces[pos]["mode"] = "hybrid" if lexical_ids[pos] else "vector"
+                    self._retrieval_stats[traces[pos]["mode"]] += 1
+                    results[pos] = self._format_context(
+                        snapshot, ranked, top_k, max_tokens, mode, langs[pos], traces[pos]
+                    )
+                else:
+                    # Nenhum chunk passou o threshold nem casou por termo → fallback garantido
+                    self._retrieval_stats["fallback"] += 1
+                    logger.info("RAG: nenhum chunk relevante encontrado. Usando fallback (curriculo+stacks).")
+                    self._trace_fallback(traces[pos])
+                    results[pos] = self._fallback_context
+        return results
+
+    def _trace_fallback(self, trace: Dict) -> None:
+        trace.update(
+            mode="fallback",
+            sources=sorted(FALLBACK_FILES),
+            tokens=estimate_tokens(self._fallback_context) if self._fallback_context else 0,
+        )
+
+    @staticmethod
+    def _lexical_hits(
+        snapshot: RagIndexSnapshot, query: str, k: int, allowed_ids: Optional[np.ndarray] = None
+    ) -> List[LexicalHit]:
+        """Hits BM25 (na ordem do ranking) que cobrem o mínimo da query."""
+        return [
+            hit for hit in snapshot.lexical.search(query, k, allowed_ids=allowed_ids)
+            if hit.coverage >= settings.rag_lexical_min_coverage
+        ]
+
+    @staticmethod
+    def _is_strong_lexical_hit(hit: LexicalHit) -> bool:
+        """Hit léxico suficiente sozinho: cobre (quase) toda a query e inclui um termo raro no corpus."""
+        return (
+            hit.coverage >= settings.rag_lexical_strong_coverage
+            and hit.max_idf >= settings.rag_lexical_strong_min_idf
+        )
+
+    def _vector_search(
+        self,
+        snapshot: RagIndexSnapshot,
+        query_vecs: np.ndarray,
+        k: int,
+        search_params: Optional[faiss.SearchParameters] = None,
+    ) -> List[List[int]]:
+        """
+        Uma chamada `index.search` para todas as queries (matriz n × dim). Para cada uma, os IDs
+        que passam o threshold L2, do mais próximo ao mais distante.
+        """
+        matrix = np.ascontiguousarray(query_vecs, dtype="float32").reshape(len(query_vecs), -1)
+        distances, indices = snapshot.index.search(matrix, k, params=search_params)
+        return [
+            [
+                int(idx) for dist, idx in zip(row_dist, row_idx)
+                if idx != -1 and dist <= self.max_l2_distance  # descarta por threshold
+            ]
+            for row_dist, row_idx in zip(distances, indices)
+        ]
+
+    @staticmethod
+    def _usa_hierarquico(snapshot: RagIndexSnapshot) -> bool:
+        return (
+            settings.rag_hierarchical_enabled
+            and snapshot.documents is not None
+            and isinstance(snapshot.chunks, ChunkStore)
+            and len(snapshot.documents) > settings.rag_hierarchical_top_docs
+        )
+
+    def _hierarchical_search(
+        self, snapshot: RagIndexSnapshot, query_vec: np.ndarray, k: int, filters: Optional[RetrievalFilter] = None
+    ) -> List[int]:
+        """
+        Busca em dois estágios: os `rag_hierarchical_top_docs` documentos mais próximos da query
+        e, entre os chunks deles, os k de menor distância L2 exata (vetores do ChunkStore).
+        Mesmo threshold L2 do `_vector_search()`.
+        """
+        documents = snapshot.documents
+        query_vec = np.asarray(query_vec, dtype="float32")
+        if query_vec.shape[-1] != documents.dimension:
+            return []
+        docs = documents.search(query_vec, settings.rag_hierarchical_top_docs, filters)
+        candidates = documents.candidate_ids(docs)
+        store: ChunkStore = snapshot.chunks
+        # IDs ordenados → linhas ordenadas: o fancy indexing lê só as páginas desses vetores
+        rows = np.searchsorted(store.ids, candidates)
+        distances, ids = exact_rerank(store.vectors[rows], candidates, query_vec, k)
+        return [int(i) for dist, i in zip(distances, ids) if dist <= self.max_l2_distance]
+
+    def _format_context(
+        self,
+        snapshot: RagIndexSnapshot,
+        chunk_ids: List[int],
+        top_k: int,
+        max_tokens: Optional[int],
+        mode: str,
+        lang: Optional[str] = None,
+        trace: Optional[Dict] = None,
+    ) -> str:
+        """
+        Junta até top_k chunks na ordem do ranking; chunk que estoura o orçamento é pulado, nunca cortado.
+        Com `lang` (idioma da pergunta ou do filtro), um chunk canônico em outro idioma é servido
+        pela duplicata colapsada nesse idioma.
+        """
         context_parts = []
         fontes_usadas = []
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx == -1 or idx >= len(self.chunks_metadata):
-                continue
-            if dist > MAX_L2_DISTANCE:
-                continue  # descarta por threshold
+        tokens_usados = 0
+        for chunk_id in chunk_ids:
             if len(context_parts) >= top_k:
                 break
-            meta = self.chunks_metadata[idx]
+            meta = snapshot.chunks.get(chunk_id)
+            if meta is None:
+                continue
+            if lang is not None and source_lang(meta.get("source", "")) != lang:
+                meta = self._alternate_in_lang(snapshot, chunk_id, lang) or meta
+            token_count = meta.get("token_count") or estimate_tokens(meta["text"])
+            if max_tokens is not None and tokens_usados + token_count > max_tokens:
+                continue
             context_parts.append(meta["text"])
             fontes_usadas.append(meta.get("source", "?"))
+            tokens_usados += token_count
+        logger.info(
+            f"RAG retrieval ({mode}): {len(context_parts)} chunks, ~{tokens_usados} tokens (fontes: {fontes_usadas})"
+        )
+        if trace is not None:
+            trace.update(sources=fontes_usadas, tokens=tokens_usados)
+        return "\n...\n".join(context_parts)
 
-        if context_parts:
-            logger.info(f"RAG retrieval: {len(context_parts)} chunks (fontes: {fontes_usadas})")
-            return "\n...\n".join(context_parts)
+    @staticmethod
+    def _alternate_in_lang(snapshot: RagIndexSnapshot, chunk_id: int, lang: str) -> Optional[Dict]:
+        if not isinstance(snapshot.chunks, ChunkStore):
+            return None
+        for alternate_id in snapshot.chunks.alternates_of(chunk_id):
+            meta = snapshot.chunks.get(alternate_id)
+            if meta is not None and source_lang(meta.get("source", "")) == lang:
+                return meta
+        return None
+
+    async def _embed_query(self, query: str) -> np.ndarray:
+        """Vetor da query via cache: repetições e chamadas concorrentes não batem na API."""
+        return await self.query_cache.get_or_compute(query, self.embedder.embed_query)
 
-        # Nenhum chunk passou o threshold → fallback garantido
-        logger.info("RAG: nenhum chunk relevante encontrado. Usando fallback (curriculo+stacks).")
-        return self._fallback_context
+    async def _embed_queries(self, queries: List[str]) -> List[np.ndarray]:
+        """Vetores de várias queries via cache; as que faltam vão num único lote ao embedder."""
+        return await self.query_cache.get_or_compute_many(queries, self.embedder.embed_queries)
 
-    async def retrieve_smart(self, query: str) -> str:
+    def query_cache_stats(self) -> Dict[str, float]:
+        """Contadores de hit/miss do cache de embeddings de query."""
+        return self.query_cache.stats()
+
+    def retrieval_stats(self) -> Dict[str, int]:
+        """Queries atendidas por caminho: lexical (sem embedding), hybrid, vector e fallback."""
+        return {mode: self._retrieval_stats[mode] for mode in ("lexical", "hybrid", "vector", "fallback")}
+
+    async def retrieve_smart(
+        self,
+        query: str,
+        max_tokens: Optional[int] = None,
+        intencao: Optional[str] = None,
+        trace: Optional[Dict] = None,
+    ) -> str:
         """
-        Retrieval com top_k dinâmico baseado na intenção da query.
+        Retrieval com top_k (e filtro de partição) dinâmicos baseados na intenção da query.
         Use este método em vez de retrieve() para respostas mais precisas.
+        `intencao` pula o roteamento quando o chamador já sabe (ex.: pedido de currículo para vaga).
         """
-        top_k = self._calcular_top_k(query)
-        logger.info(f"RAG retrieve_smart: top_k={top_k} para query: '{query[:60]}'")
-        return await self.retrieve(query, top_k=top_k)
+        if intencao is None:
+            intencao, origem = await self.route_intent(query)
+        else:
+            origem = "chamador"
+        if trace is not None:
+            trace.update(intent=intencao, intent_origin=origem)
+        top_k = TOP_K_POR_INTENCAO[intencao]
+        filters = self._filtro_por_intencao(intencao, query)
+        logger.info(
+            f"RAG retrieve_smart: intenção={intencao} ({origem}) top_k={top_k} para query: '{query[:60]}'"
+        )
+        return await self.retrieve(query, top_k=top_k, max_tokens=max_tokens, filters=filters, trace=trace)
 
     def load_project_if_mentioned(self, query: str) -> Optional[str]:
         """
@@ -434,25 +1373,80 @@ class PortfolioRAG:
     # Utilitários
     # -----------------------------------------------------------------------
 
-    def _chunk_text(self, text: str, chunk_size: int, overlap: int) -> List[str]:
-        words = text.split()
-        chunks = []
-        i = 0
-        while i < len(words):
-            chunks.append(" ".join(words[i: i + chunk_size]))
-            i += chunk_size - overlap
-        return chunks
-
     def _sanitize_markdown(self, content: str) -> str:
         """Remove comentários HTML embutidos para não indexar instruções/segredos ocultos."""
         return re.sub(r"<!--.*?-->", "", content, flags=re.DOTALL).strip()
 
-    def _extract_pdf_text(self, pdf_path: Path) -> str:
-        reader = PdfReader(str(pdf_path))
-        parts: list[str] = []
-        for page in reader.pages:
-            page_text = page.extract_text() or ""
-            page_text = " ".join(page_text.split())
-            if page_text:
-                parts.append(page_text)
-        return "\n".join(parts).strip()
+    def _extract_pdf_text(self, pdf_path: Path, sha256: Optional[str] = None) -> str:
+        """Texto do PDF via cache em disco (chave: sha256 do arquivo)."""
+        return self.pdf_cache.extract(pdf_path, sha256 or self._file_hash(pdf_path))
+
+
+# ---------------------------------------------------------------------------
+# CLI: build/verificação do índice fora do processo web
+# ---------------------------------------------------------------------------
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    python -m app.domain.services.rag_service build [--force]   # publica nova versão (delta)
+    python -m app.domain.services.rag_service stats             # versão, chunks, disco, load em ms
+    python -m app.domain.services.rag_service verify            # exit 1 se o índice estiver inválido/desatualizado
+    python -m app.domain.services.rag_service memory            # RSS/PSS de cada worker que mapeia o índice
+
+    Usado no Dockerfile para publicar o índice na imagem: em runtime o servidor só faz load().
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m app.domain.services.rag_service", description="Índice RAG do portfólio")
+    parser.add_argument("--data-dir", default="certificados-wesley/portfolio-content")
+    parser.add_argument("--index-dir", default=None, help="Padrão: settings.rag_index_dir")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Constrói e publica uma nova versão do índice")
+    build.add_argument("--force", action="store_true", help="Rebuild completo (re-embeda tudo)")
+    sub.add_parser("stats", help="Relatório da versão publicada")
+    verify = sub.add_parser("verify", help="Valida a versão publicada")
+    verify.add_argument("--sample", type=int, default=200, help="Chunks na checagem de self-recall")
+    sub.add_parser("memory", help="Memória dos processos (workers) que mapeiam o índice")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(name)s - %(message)s")
+    if args.command == "memory":
+        # Só lê /proc: não carrega o índice neste processo
+        workers = workers_memory(args.index_dir or settings.rag_index_dir)
+        result = {
+            "workers": workers,
+            # PSS soma a memória real (páginas compartilhadas divididas entre os workers)
+            "total_pss_mb": round(sum(w.get("pss_mb", 0) for w in workers), 1),
+            "total_rss_mb": round(sum(w.get("rss_mb", 0) for w in workers), 1),
+        }
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return 0
+
+    rag = PortfolioRAG(args.data_dir, index_dir=args.index_dir)
+
+    t0 = time.perf_counter()
+    loaded = rag.load()
+    load_ms = round((time.perf_counter() - t0) * 1000, 1)
+
+    if args.command == "build":
+        t0 = time.perf_counter()
+        published = rag.reindex(force=args.force)
+        result = {
+            "published": published,
+            "seconds": round(time.perf_counter() - t0, 2),
+            **rag.index_report(),
+        }
+        ok = rag.index is not None
+    elif args.command == "stats":
+        result = {"loaded": loaded, "load_ms": load_ms, **rag.index_report()}
+        ok = loaded
+    else:
+        result = {"load_ms": load_ms, **rag.verify(sample=args.sample)}
+        ok = result["ok"]
+
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -20,6 +22,66 @@ class Settings(BaseSettings):
     # Gemini AI Settings
     gemini_api_key: str = "your_google_api_key_here"
     gemini_model: str = "gemini-2.0-flash"
+
+    # RAG — versões do índice em disco (FAISS + chunks + BM25 + manifest) e reindex em background
+    rag_index_dir: str = "rag_index"
+    rag_index_mmap: bool = True              # índice FAISS via mmap: uma cópia física para todos os workers
+    rag_reindex_interval_seconds: int = 300  # verificação periódica de conteúdo alterado (0 = desativado)
+
+    # RAG — pipeline de embeddings do build do índice
+    rag_embed_batch_size: int = 32    # chunks por chamada embed_content (máx. 100 na API Gemini)
+    rag_embed_concurrency: int = 4    # lotes enviados em paralelo
+    rag_embed_max_retries: int = 5    # tentativas em 429/5xx com backoff exponencial
+    # Dimensão de saída do gemini-embedding-001 (3072 nativo; 1536/768 recomendados). None = nativa.
+    # Vetores truncados (MRL) são re-normalizados; mudar o valor força rebuild completo.
+    rag_embed_dimensions: Optional[int] = None
+    # Threshold L2 do embedder no índice exato (None = calibrado do modelo, 1.2 p/ gemini-embedding-001 768d)
+    rag_embed_max_l2_distance: Optional[float] = None
+
+    # RAG — chunking estrutural (headings/parágrafos/frases) com orçamento em tokens
+    rag_chunk_max_tokens: int = 800
+    rag_chunk_overlap_tokens: int = 80
+
+    # RAG — extração de texto dos PDFs (process pool + cache em disco por sha256)
+    rag_pdf_workers: int = 0          # processos simultâneos (0 = todos os cores)
+    rag_pdf_cache_dir: Optional[str] = None  # None = <rag_index_dir>/pdf_text_cache
+
+    # RAG — engine do índice FAISS: flat | hnsw | ivf_sq8 | ivf_pq
+    rag_index_engine: str = "flat"
+    rag_hnsw_m: int = 32
+    rag_hnsw_ef_search: int = 64
+    rag_ivf_nlist: int = 64
+    rag_ivf_nprobe: int = 8
+    # Precisão dos vetores no índice flat/hnsw: float32 | float16 (metade) | sq8 (1/4, aproximado)
+    rag_vector_storage: str = "float32"
+    # Threshold L2 final do retrieval; None = threshold do embedder + folga da engine (ENGINE_L2_SLACK)
+    rag_max_l2_distance: Optional[float] = None
+
+    # RAG — busca híbrida: BM25 + FAISS fundidos por Reciprocal Rank Fusion
+    rag_hybrid_enabled: bool = True
+    rag_rrf_k: int = 60                        # constante do RRF (maior = ranks mais "achatados")
+    rag_lexical_min_coverage: float = 0.5      # fração (IDF) dos termos da query que um hit léxico precisa cobrir
+    rag_lexical_strong_coverage: float = 0.85  # acima disto (com termo raro) o retrieval dispensa o embedding
+    rag_lexical_strong_min_idf: float = 2.5    # IDF mínimo do termo mais raro casado para o hit ser "forte"
+
+    # RAG — colapso de quase duplicatas no build (traduções PT/EN, currículo md/PDF)
+    rag_dedup_enabled: bool = True
+    rag_dedup_max_hamming: int = 6               # bits de diferença do SimHash (64 bits) para "texto quase igual"
+    rag_dedup_min_cosine: float = 0.95           # cosseno que confirma o texto quase igual
+    rag_dedup_translation_cosine: float = 0.88   # cosseno entre X.md e X-english.md para colapsar a tradução
+
+    # RAG — retrieval hierárquico: documentos (centroides por arquivo) → chunks desses documentos
+    rag_hierarchical_enabled: bool = False     # vale a pena com corpus grande (ver scripts/bench_rag_hierarchical.py)
+    rag_hierarchical_top_docs: int = 8         # documentos escolhidos no 1º estágio
+
+    # RAG — roteamento de intenção por centroides (reusa o vetor da query; keywords continuam como pré-filtro)
+    rag_intent_routing_enabled: bool = True
+    rag_intent_min_similarity: float = 0.6   # cosseno mínimo com o centroide vencedor
+    rag_intent_min_margin: float = 0.02      # vantagem mínima sobre o 2º centroide (senão: default)
+
+    # RAG — cache de embeddings de query (LRU + TTL)
+    rag_query_cache_size: int = 512
+    rag_query_cache_ttl_seconds: float = 3600.0
     
     # Owner / Controle de IA
     # JID do seu número NESTA instância (ex: "5521983866676@s.whatsapp.net")
@@ -34,6 +96,22 @@ class Settings(BaseSettings):
     # Se allowlist não estiver vazia, apenas esses números recebem resposta na instância 1
     ia_allowlist: str = ""  # Ex: "5521999999999,5511888888888" (vazio = todos)
     ia_blocklist: str = ""  # Ex: "5521000000000" (números sempre bloqueados)
+    # Snapshot em memória de bot_allow_block + bot_config por instância. Escritas pelo painel e
+    # pelos comandos /ia invalidam o worker que as fez; com UVICORN_WORKERS > 1 os demais conferem
+    # a versão das tabelas (contagem + max(updated_at)) a cada consulta e recarregam se mudou.
+    access_policy_ttl_seconds: float = 30.0
+
+    # Workers do uvicorn (o mesmo UVICORN_WORKERS do docker-entrypoint.sh). Com 1, os caches
+    # em memória veem todas as gravações; com mais, validam a versão no banco antes de servir.
+    uvicorn_workers: int = 1
+
+    # Histórico recente das conversas em memória (últimas mensagens por contato, LRU).
+    # Gravações do bot atualizam o worker que gravou; com UVICORN_WORKERS > 1, antes de servir
+    # um hit, o ID da última mensagem do contato (índice id_cliente+data_hora) detecta o que
+    # outro worker gravou. O TTL só libera memória.
+    history_cache_max_contacts: int = 1000
+    history_cache_max_chars: int = 2_000_000  # soma dos textos guardados (~ alguns MB por worker)
+    history_cache_ttl_seconds: float = 600.0
     
     @property
     def ia_allowlist_set(self) -> set[str]:
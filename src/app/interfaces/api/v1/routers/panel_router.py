@@ -20,6 +20,7 @@ from app.infrastructure.auth.panel_auth import (
     hash_password,
 )
 from app.infrastructure.database.session import async_session
+from app.application.services.message_unit_of_work import buscar_cliente, normalizar_contato_id
 from app.domain.entities.models import AdminUser, Cliente, Mensagem, BotConfig, AllowBlockEntry
 from app.infrastructure.config.settings import settings
 from app.infrastructure.external.evolution_client import EvolutionClient
@@ -286,18 +287,9 @@ async def panel_conversation_history(
 ):
     """Retorna histórico de mensagens de uma conversa."""
     chat_jid = chat_jid_encoded.replace("__at__", "@")
-    numero_base = chat_jid.split("@")[0].strip()
-    variantes = [chat_jid, numero_base]
-    if numero_base:
-        for sufixo in ("@s.whatsapp.net", "@lid"):
-            variante = f"{numero_base}{sufixo}"
-            if variante not in variantes:
-                variantes.append(variante)
 
     async with async_session() as session:
-        stmt = select(Cliente).where(Cliente.whatsapp_id.in_(variantes))
-        result = await session.execute(stmt)
-        cliente = result.scalar_one_or_none()
+        cliente = await buscar_cliente(session, normalizar_contato_id(chat_jid))
 
         if not cliente:
             return {"mensagens": [], "cliente": None}
@@ -332,6 +324,13 @@ async def panel_conversation_history(
 # API REST — controle de IA
 # ===========================================================================
 
+def _invalidar_politica(instancia: str) -> None:
+    """Descarta a política de acesso em memória da instância: a próxima mensagem relê o banco."""
+    from app.interfaces.api.v1.routers.webhook_router import atendimento_service
+
+    atendimento_service.access_policy.invalidate(instancia)
+
+
 @router.get("/api/panel/ia/config", tags=["Painel Admin"])
 async def panel_ia_config(current_user: str = Depends(get_current_user)):
     """Retorna todas as configurações de IA (global e por chat)."""
@@ -383,6 +382,7 @@ async def panel_ia_toggle(
             session.add(cfg)
 
         await session.commit()
+    _invalidar_politica(body.instancia)
 
     return {
         "ok": True,
@@ -408,6 +408,7 @@ async def panel_ia_reset(
         if cfg:
             await session.delete(cfg)
             await session.commit()
+    _invalidar_politica(body.instancia)
     return {"ok": True}
 
 
@@ -488,6 +489,7 @@ async def panel_update_allowlist(
             session.add_all(novas_entradas)
 
         await session.commit()
+    _invalidar_politica(body.instancia)
 
     logger.info(
         "[PAINEL] Allowlist/blocklist atualizado para instância %s por %s",
@@ -539,6 +541,33 @@ async def panel_instance_connect(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ===========================================================================
+# API REST — RAG
+# ===========================================================================
+
+@router.get("/api/panel/rag/stats", tags=["Painel Admin"])
+async def panel_rag_stats(current_user: str = Depends(get_current_user)):
+    """Métricas do RAG em memória (versão do índice, cache de embeddings de query e caminhos do retrieval)."""
+    from app.interfaces.api.v1.routers.webhook_router import atendimento_service
+
+    return {
+        "index": atendimento_service.rag.index_info(),
+        # Worker que atendeu esta requisição (com vários workers, cada chamada pode cair em outro)
+        "memory": atendimento_service.rag.memory_report(),
+        "query_cache": atendimento_service.rag.query_cache_stats(),
+        "retrieval": atendimento_service.rag.retrieval_stats(),
+    }
+
+
+@router.post("/api/panel/rag/reindex", tags=["Painel Admin"])
+async def panel_rag_reindex(force: bool = False, current_user: str = Depends(get_current_user)):
+    """Reindexa o portfólio agora (fora do caminho das mensagens) e publica a nova versão."""
+    from app.interfaces.api.v1.routers.webhook_router import atendimento_service
+
+    published = await atendimento_service.reindex_rag(force=force)
+    return {"published": published, "index": atendimento_service.rag.index_info()}
+
+
 # ===========================================================================
 # API REST — arquivar / excluir conversas
 # ===========================================================================
@@ -577,5 +606,8 @@ async def panel_excluir_conversa(
         await session.delete(cliente)
         await session.commit()
 
+    from app.interfaces.api.v1.routers.webhook_router import atendimento_service
+
+    atendimento_service.historico_cache.invalidate(cliente.contato_id)
     logger.info("[PAINEL] Conversa %s EXCLUÍDA por %s", cliente_id, current_user)
     return {"ok": True}
@@ -178,20 +178,20 @@ async def lifespan(app: FastAPI):
 
     watchdog_task = asyncio.create_task(_watchdog())
     cleanup_task = asyncio.create_task(_cleanup_old_messages())
-    rag_warmup_task = asyncio.create_task(atendimento_service.ensure_rag_ready())
-    logger.info("[Lifespan] Banco inicializado. Watchdog, cleanup e warmup do RAG ativos.")
+    rag_reindex_task = asyncio.create_task(atendimento_service.run_rag_reindexer())
+    logger.info("[Lifespan] Banco inicializado. Watchdog, cleanup e reindexador do RAG ativos.")
 
     yield
 
     watchdog_task.cancel()
     cleanup_task.cancel()
-    rag_warmup_task.cancel()
-    for task in (watchdog_task, cleanup_task, rag_warmup_task):
+    rag_reindex_task.cancel()
+    for task in (watchdog_task, cleanup_task, rag_reindex_task):
         try:
             await task
         except asyncio.CancelledError:
             pass
-    logger.info("[Lifespan] Watchdog, cleanup e warmup encerrados.")
+    logger.info("[Lifespan] Watchdog, cleanup e reindexador encerrados.")
 
 
 def create_app() -> FastAPI:
@@ -205,7 +205,10 @@ def create_app() -> FastAPI:
 
     @app.get("/health", tags=["Health"])
     async def health_check():
-        return {"status": "ok", "app": settings.project_name}
+        from app.interfaces.api.v1.routers.webhook_router import atendimento_service
+
+        # rag_ready=False: índice ainda em build, respostas usam o contexto de fallback
+        return {"status": "ok", "app": settings.project_name, "rag_ready": atendimento_service.rag_ready}
 
     from app.interfaces.api.v1.routers import whatsapp_router, webhook_router
     from app.interfaces.api.v1.routers.panel_router import router as panel_router
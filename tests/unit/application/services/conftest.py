@@ -0,0 +1,21 @@
+import pytest_asyncio
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.application.services import access_policy_service, message_unit_of_work
+from app.infrastructure.database.base import Base
+
+
+@pytest_asyncio.fixture
+async def banco(tmp_path, monkeypatch):
+    """Um banco SQLite compartilhado, como o Postgres entre os workers do uvicorn."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessoes = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(message_unit_of_work, "async_session", sessoes)
+    monkeypatch.setattr(access_policy_service, "async_session", sessoes)
+    # Os upserts usam o dialeto do PostgreSQL; o SQLite tem a mesma API de ON CONFLICT
+    monkeypatch.setattr(message_unit_of_work, "pg_insert", sqlite_insert)
+    yield engine
+    await engine.dispose()
@@ -0,0 +1,108 @@
+import uuid
+
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.application.services.access_policy_service import AccessPolicy, AccessPolicyService
+from app.domain.entities.models import AllowBlockEntry, BotConfig
+
+INSTANCIA = "wesley_bot_session"
+CHAT = "5511999999999@s.whatsapp.net"
+
+
+def _politica(ia_global=True, ia_por_chat=None, blocked=(), allowed=()) -> AccessPolicy:
+    return AccessPolicy(
+        blocked=frozenset(blocked),
+        allowed=frozenset(allowed),
+        ia_global=ia_global,
+        ia_por_chat=ia_por_chat or {},
+    )
+
+
+async def _gravar(engine, *objetos) -> None:
+    """Escrita feita por outro worker: direto no banco, sem `invalidate()`."""
+    async with AsyncSession(engine) as session:
+        session.add_all(objetos)
+        await session.commit()
+
+
+def _config(chat_jid, ativo) -> BotConfig:
+    return BotConfig(id=str(uuid.uuid4()), instancia=INSTANCIA, chat_jid=chat_jid, ia_ativa=ativo)
+
+
+class TestAccessPolicyPrecedencia:
+
+    def test_sem_config_ia_ativa_por_padrao(self):
+        assert _politica().ia_ativa_para(CHAT)
+        assert _politica().ia_ativa_para(None)
+
+    def test_global_vale_para_chats_sem_override(self):
+        politica = _politica(ia_global=False)
+
+        assert not politica.ia_ativa_para(CHAT)
+
+    def test_override_do_chat_vence_o_global(self):
+        ligado = _politica(ia_global=False, ia_por_chat={CHAT: True})
+        desligado = _politica(ia_global=True, ia_por_chat={CHAT: False})
+
+        assert ligado.ia_ativa_para(CHAT)
+        assert not desligado.ia_ativa_para(CHAT)
+        assert not ligado.ia_ativa_para("5521000000000@s.whatsapp.net")
+
+    def test_allowlist_vazia_libera_todos(self):
+        assert _politica().is_allowed("5521000000000")
+        assert not _politica(allowed={"5511999999999"}).is_allowed("5521000000000")
+        assert _politica(blocked={"5521000000000"}).is_blocked("5521000000000")
+
+
+class TestAccessPolicyServiceEntreWorkers:
+
+    @pytest.mark.asyncio
+    async def test_escrita_de_outro_worker_vale_na_proxima_consulta(self, banco):
+        worker = AccessPolicyService(ttl=3600, validar_versao=True)
+        assert (await worker.get(INSTANCIA)).ia_ativa_para(CHAT)
+
+        await _gravar(banco, _config(None, False))
+
+        assert not (await worker.get(INSTANCIA)).ia_ativa_para(CHAT)
+
+    @pytest.mark.asyncio
+    async def test_bloqueio_de_outro_worker(self, banco):
+        worker = AccessPolicyService(ttl=3600, validar_versao=True)
+        assert not (await worker.get(INSTANCIA)).is_blocked("5521000000000")
+
+        await _gravar(
+            banco, AllowBlockEntry(id=str(uuid.uuid4()), instancia=INSTANCIA, numero="5521000000000", tipo="block")
+        )
+
+        assert (await worker.get(INSTANCIA)).is_blocked("5521000000000")
+
+    @pytest.mark.asyncio
+    async def test_remocao_de_override_tambem_recarrega(self, banco):
+        await _gravar(banco, _config(None, True), _config(CHAT, False))
+        worker = AccessPolicyService(ttl=3600, validar_versao=True)
+        assert not (await worker.get(INSTANCIA)).ia_ativa_para(CHAT)
+
+        async with AsyncSession(banco) as session:
+            await session.execute(delete(BotConfig).where(BotConfig.chat_jid == CHAT))
+            await session.commit()
+
+        assert (await worker.get(INSTANCIA)).ia_ativa_para(CHAT)
+
+    @pytest.mark.asyncio
+    async def test_sem_mudanca_serve_o_mesmo_snapshot(self, banco):
+        worker = AccessPolicyService(ttl=3600, validar_versao=True)
+
+        primeira = await worker.get(INSTANCIA)
+
+        assert await worker.get(INSTANCIA) is primeira
+
+    @pytest.mark.asyncio
+    async def test_sem_validar_versao_espera_o_ttl(self, banco):
+        worker = AccessPolicyService(ttl=3600)
+        await worker.get(INSTANCIA)
+
+        await _gravar(banco, _config(None, False))
+
+        assert (await worker.get(INSTANCIA)).ia_ativa_para(CHAT)
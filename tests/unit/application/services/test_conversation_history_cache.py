@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.application.services.conversation_history_cache import ConversationHistoryCache
+from app.application.services.message_unit_of_work import HISTORICO_MAX, MessageUnitOfWork
+
+CONTATO = "5511999999999"
+
+
+async def _receber(cache: ConversationHistoryCache, texto: str, resposta: str) -> str:
+    """Processa uma mensagem recebida num "worker" e retorna o histórico que o prompt usaria."""
+    async with MessageUnitOfWork(CONTATO, cache) as uow:
+        assert await uow.iniciar("Cliente", texto, f"wa-{texto}")
+        historico = uow.historico(HISTORICO_MAX)
+        assert await uow.gravar_enviada(resposta)
+    return historico
+
+
+def _mensagens(*textos: str):
+    """Histórico como o lido do banco: objetos com `id`, `direcao` e `texto`."""
+    return [SimpleNamespace(id=f"id-{t}", direcao="RECEBIDA", texto=t) for t in textos]
+
+
+class TestConversationHistoryCacheLimites:
+
+    def test_max_chars_remove_os_contatos_menos_recentes(self):
+        cache = ConversationHistoryCache(HISTORICO_MAX, max_chars=25)
+        cache.put("a", _mensagens("x" * 10), cache.marcador())
+        cache.put("b", _mensagens("y" * 10), cache.marcador())
+        cache.get("a", "id-" + "x" * 10)  # "a" passa a ser o mais recente
+
+        cache.put("c", _mensagens("z" * 10), cache.marcador())
+
+        assert cache.contem("a") and cache.contem("c")
+        assert not cache.contem("b")
+        assert cache.stats()["chars"] == 20
+        assert cache.stats()["evictions"] == 1
+
+    def test_append_que_estoura_max_chars_tambem_remove(self):
+        cache = ConversationHistoryCache(HISTORICO_MAX, max_chars=25)
+        cache.put("a", _mensagens("x" * 10), cache.marcador())
+        cache.put("b", _mensagens("y" * 10), cache.marcador())
+
+        cache.append("b", "ENVIADA", "w" * 10, "id-w")
+
+        assert not cache.contem("a")
+        assert cache.stats()["chars"] == 20
+
+
+class TestConversationHistoryCacheCorrida:
+
+    def test_put_de_leitura_anterior_a_uma_escrita_e_descartado(self):
+        cache = ConversationHistoryCache(HISTORICO_MAX)
+        marcador = cache.marcador()  # task 1 vai ler o banco
+        cache.append("a", "RECEBIDA", "nova", "id-nova")  # task 2 grava no meio da leitura
+
+        cache.put("a", _mensagens("antiga"), marcador)  # leitura não viu "nova"
+
+        assert not cache.contem("a")
+
+    def test_put_posterior_a_escrita_entra(self):
+        cache = ConversationHistoryCache(HISTORICO_MAX)
+        cache.append("a", "RECEBIDA", "nova", "id-nova")
+        marcador = cache.marcador()
+
+        cache.put("a", _mensagens("antiga", "nova"), marcador)
+
+        assert [t.texto for t in cache.get("a", "id-nova")] == ["antiga", "nova"]
+
+
+class TestConversationHistoryCacheVersao:
+
+    def test_versao_diferente_descarta_a_entrada(self):
+        cache = ConversationHistoryCache(HISTORICO_MAX)
+        cache.put("a", _mensagens("oi"), cache.marcador())
+
+        assert cache.get("a", "id-de-outro-worker") is None
+        assert cache.stats()["stale"] == 1
+        assert not cache.contem("a")
+
+    def test_sem_validar_versao_serve_sem_consultar_o_banco(self):
+        cache = ConversationHistoryCache(HISTORICO_MAX, validar_versao=False)
+        cache.put("a", _mensagens("oi"), cache.marcador())
+
+        assert [t.texto for t in cache.get("a")] == ["oi"]
+
+
+class TestConversationHistoryCacheEntreWorkers:
+
+    @pytest.mark.asyncio
+    async def test_worker_com_cache_velho_rele_o_banco(self, banco):
+        worker_a = ConversationHistoryCache(HISTORICO_MAX)
+        worker_b = ConversationHistoryCache(HISTORICO_MAX)
+
+        await _receber(worker_a, "oi", "olá!")
+        await _receber(worker_b, "quais projetos?", "o bot de WhatsApp")
+        historico = await _receber(worker_a, "e o stack?", "Java e Python")
+
+        # O worker A tinha o contato em cache, mas sem as mensagens gravadas pelo B
+        assert "quais projetos?" in historico
+        assert "o bot de WhatsApp" in historico
+        assert worker_a.stats()["stale"] == 1
+
+    @pytest.mark.asyncio
+    async def test_cache_em_dia_e_servido(self, banco):
+        worker = ConversationHistoryCache(HISTORICO_MAX)
+
+        await _receber(worker, "oi", "olá!")
+        historico = await _receber(worker, "tudo bem?", "tudo!")
+
+        assert "olá!" in historico
+        assert worker.stats()["hits"] == 1
+        assert worker.stats()["stale"] == 0
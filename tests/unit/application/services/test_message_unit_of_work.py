@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.application.services.message_unit_of_work import MessageUnitOfWork, inserir_mensagem, resolver_cliente
+from app.domain.entities.models import Cliente, Mensagem
+
+CONTATO = "5511999999999"
+
+
+async def _textos(engine, direcao: str):
+    """Leitura por outra sessão, como outro worker veria o banco."""
+    async with async_sessionmaker(engine, class_=AsyncSession)() as session:
+        result = await session.execute(select(Mensagem.texto).where(Mensagem.direcao == direcao))
+        return sorted(result.scalars().all())
+
+
+class TestGravarEnviada:
+
+    @pytest.mark.asyncio
+    async def test_resposta_gravada_antes_do_fim_do_bloco(self, banco):
+        async with MessageUnitOfWork(CONTATO) as uow:
+            assert await uow.iniciar("Cliente", "oi", "wa-1")
+
+            assert await uow.gravar_enviada("olá!")
+
+            assert await _textos(banco, "ENVIADA") == ["olá!"]
+            assert "Assistente: olá!" in uow.historico(12)
+
+    @pytest.mark.asyncio
+    async def test_resposta_enviada_sobrevive_ao_cancelamento_do_fluxo(self, banco):
+        enviada = asyncio.Event()
+
+        async def fluxo():
+            async with MessageUnitOfWork(CONTATO) as uow:
+                await uow.iniciar("Cliente", "oi", "wa-1")
+                await uow.gravar_enviada("primeira parte")
+                enviada.set()
+                await asyncio.Event().wait()  # próxima chamada de rede (LLM/TTS) que não volta
+
+        task = asyncio.create_task(fluxo())
+        await enviada.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert await _textos(banco, "ENVIADA") == ["primeira parte"]
+
+
+async def _resolver_em_corrida(engine, nome_primeiro: str, nome_segundo: str):
+    """
+    Dois webhooks do mesmo contato novo: o primeiro faz o SELECT (não acha ninguém) e, antes do
+    INSERT dele, o segundo cria o contato e commita. O INSERT do primeiro cai no ON CONFLICT.
+    """
+    sessoes = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    leu = asyncio.Event()
+    pode_gravar = asyncio.Event()
+
+    async with sessoes() as primeiro, sessoes() as segundo:
+        execute = primeiro.execute
+
+        async def execute_pausado(*args, **kwargs):
+            result = await execute(*args, **kwargs)
+            if not leu.is_set():
+                leu.set()
+                await pode_gravar.wait()
+            return result
+
+        primeiro.execute = execute_pausado
+
+        async def webhook_1():
+            cliente_id = await resolver_cliente(primeiro, CONTATO, nome_primeiro)
+            await primeiro.commit()
+            return cliente_id
+
+        task = asyncio.create_task(webhook_1())
+        await leu.wait()
+        id_segundo = await resolver_cliente(segundo, CONTATO, nome_segundo)
+        await segundo.commit()
+        pode_gravar.set()
+        id_primeiro = await task
+
+    async with sessoes() as session:
+        clientes = (await session.execute(select(Cliente.id, Cliente.nome))).all()
+    return id_primeiro, id_segundo, clientes
+
+
+class TestOnConflict:
+
+    @pytest.mark.asyncio
+    async def test_mensagem_id_whatsapp_repetido_retorna_none(self, banco):
+        async with async_sessionmaker(banco, class_=AsyncSession)() as session:
+            cliente_id = await resolver_cliente(session, CONTATO, "Cliente")
+            primeiro = await inserir_mensagem(session, cliente_id, "oi", "RECEBIDA", "wa-1")
+            repetido = await inserir_mensagem(session, cliente_id, "oi", "RECEBIDA", "wa-1")
+            await session.commit()
+
+        assert primeiro is not None
+        assert repetido is None
+        assert await _textos(banco, "RECEBIDA") == ["oi"]
+
+    @pytest.mark.asyncio
+    async def test_webhook_repetido_nao_e_processado(self, banco):
+        async with MessageUnitOfWork(CONTATO) as uow:
+            assert await uow.iniciar("Cliente", "oi", "wa-1")
+        async with MessageUnitOfWork(CONTATO) as uow:
+            assert not await uow.iniciar("Cliente", "oi", "wa-1")
+
+        assert await _textos(banco, "RECEBIDA") == ["oi"]
+
+    @pytest.mark.asyncio
+    async def test_contato_novo_em_corrida_recebe_o_mesmo_id(self, banco):
+        id_primeiro, id_segundo, clientes = await _resolver_em_corrida(banco, "Maria", "Maria")
+
+        assert id_primeiro == id_segundo
+        assert [c.id for c in clientes] == [id_primeiro]
+
+    @pytest.mark.asyncio
+    async def test_nome_preenchido_no_conflito(self, banco):
+        _, _, clientes = await _resolver_em_corrida(banco, "Maria", "")
+
+        assert [c.nome for c in clientes] == ["Maria"]
+
+    @pytest.mark.asyncio
+    async def test_conflito_nao_sobrescreve_nome_existente(self, banco):
+        _, _, clientes = await _resolver_em_corrida(banco, "Outro Nome", "Maria")
+
+        assert [c.nome for c in clientes] == ["Maria"]
+
+    @pytest.mark.asyncio
+    async def test_nome_preenchido_quando_o_contato_ja_existe(self, banco):
+        async with async_sessionmaker(banco, class_=AsyncSession)() as session:
+            cliente_id = await resolver_cliente(session, CONTATO, "")
+            await session.commit()
+            assert await resolver_cliente(session, CONTATO, "Maria") == cliente_id
+            await session.commit()
+            assert (await session.execute(select(Cliente.nome))).scalar_one() == "Maria"
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from app.domain.services.rag_chunk_store import ChunkStore
+
+
+def _meta(chunk_id, texto, source, **extra):
+    meta = {
+        "id": chunk_id,
+        "text": texto,
+        "source": source,
+        "is_project": source.startswith("projects/"),
+        "is_fallback": source == "CURRICULO.md",
+        "chunk_hash": f"{chunk_id:064x}",
+        "token_count": len(texto.split()),
+        "duplicate_of": None,
+    }
+    meta.update(extra)
+    return meta
+
+
+@pytest.fixture
+def chunks():
+    # IDs fora de ordem e com buracos, como depois de um reindex incremental
+    return {
+        7: _meta(7, "Currículo: Java e Python — ação", "CURRICULO.md"),
+        2: _meta(2, "Bot de WhatsApp com RAG", "projects/bot.md"),
+        11: _meta(11, "WhatsApp bot with RAG", "projects/bot-english.md", duplicate_of=2),
+        4: _meta(4, "", "projects/bot.md"),
+    }
+
+
+@pytest.fixture
+def vectors(chunks):
+    return {i: np.full(3, float(i), dtype="float32") for i in chunks}
+
+
+class TestChunkStoreRoundTrip:
+
+    def test_metadata_volta_igual(self, tmp_path, chunks, vectors):
+        ChunkStore.write(tmp_path, chunks, vectors)
+        store = ChunkStore.open(tmp_path)
+
+        assert list(store) == [2, 4, 7, 11]
+        assert {i: store[i] for i in store} == chunks
+        store.close()
+
+    def test_vetores_e_duplicatas(self, tmp_path, chunks, vectors):
+        ChunkStore.write(tmp_path, chunks, vectors)
+        store = ChunkStore.open(tmp_path)
+
+        assert {i: v.tolist() for i, v in store.vector_map().items()} == {i: v.tolist() for i, v in vectors.items()}
+        assert store.canonical_ids().tolist() == [2, 4, 7]
+        assert store.alternates_of(2) == [11]
+        assert store.alternates_of(7) == []
+        store.close()
+
+    def test_id_inexistente(self, tmp_path, chunks, vectors):
+        ChunkStore.write(tmp_path, chunks, vectors)
+        store = ChunkStore.open(tmp_path)
+
+        assert 3 not in store and 100 not in store
+        assert store.get(3) is None
+        with pytest.raises(KeyError):
+            store[100]
+        store.close()
+
+    def test_vetores_float16(self, tmp_path, chunks, vectors):
+        ChunkStore.write(tmp_path, chunks, vectors, vector_dtype="float16")
+        store = ChunkStore.open(tmp_path)
+
+        assert store.vectors.dtype == np.float16
+        assert store.vector_map()[7].dtype == np.float32
+        assert store.vector_map()[7].tolist() == [7.0, 7.0, 7.0]
+        store.close()
+
+    def test_store_vazio(self, tmp_path):
+        ChunkStore.write(tmp_path, {}, {})
+        assert ChunkStore.exists(tmp_path)
+        store = ChunkStore.open(tmp_path)
+
+        assert len(store) == 0
+        assert list(store) == []
+        assert store.get(0) is None
+        assert store.vector_map() == {}
+        assert store.canonical_ids().tolist() == []
+        store.close()
+
+    def test_diretorio_sem_store(self, tmp_path):
+        assert not ChunkStore.exists(tmp_path)
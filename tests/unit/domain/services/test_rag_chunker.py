@@ -0,0 +1,43 @@
+from app.domain.services.rag_chunker import chunk_text, iter_blocks
+
+README = """# Projeto
+
+Como rodar:
+
+```bash
+# instala as dependências
+
+pip install -r requirements.txt
+```
+
+## Deploy
+
+~~~python
+# comentário python
+print("ok")
+~~~
+"""
+
+
+class TestIterBlocks:
+
+    def test_comentario_em_bloco_de_codigo_nao_vira_heading(self):
+        headings = [texto for tipo, texto in iter_blocks(README) if tipo == "heading"]
+        assert headings == ["# Projeto", "## Deploy"]
+
+    def test_bloco_de_codigo_fica_num_paragrafo_so(self):
+        paragrafos = [texto for tipo, texto in iter_blocks(README) if tipo == "paragraph"]
+        assert "```bash\n# instala as dependências\n\npip install -r requirements.txt\n```" in paragrafos
+        assert '~~~python\n# comentário python\nprint("ok")\n~~~' in paragrafos
+
+    def test_cerca_com_outro_caractere_nao_fecha(self):
+        texto = "```\n~~~\n# dentro\n```\n# Fora"
+        blocos = list(iter_blocks(texto))
+        assert blocos == [("paragraph", "```\n~~~\n# dentro\n```"), ("heading", "# Fora")]
+
+
+class TestChunkText:
+
+    def test_heading_path_ignora_comentarios_de_codigo(self):
+        chunks = list(chunk_text(README * 20, max_tokens=60))
+        assert not any(c.startswith("# instala") or c.startswith("# comentário") for c in chunks)
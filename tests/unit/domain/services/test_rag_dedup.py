@@ -0,0 +1,39 @@
+import numpy as np
+
+from app.domain.services.rag_dedup import DedupConfig, find_duplicates
+
+
+def _vetor(graus: float) -> np.ndarray:
+    rad = np.radians(graus)
+    return np.array([np.cos(rad), np.sin(rad), 0.0, 0.0], dtype="float32")
+
+
+class TestFindDuplicates:
+
+    def test_cadeia_nao_colapsa_transitivamente(self):
+        # Mesmo texto (SimHash igual); A≈B e B≈C pelo cosseno, mas A e C não (cos 30° ≈ 0,87)
+        texto = "Projeto de bot de atendimento no WhatsApp com FastAPI e RAG sobre o portfólio."
+        chunks = {
+            1: {"source": "projects/a.md", "text": texto},
+            2: {"source": "projects/b.md", "text": texto},
+            3: {"source": "projects/c.md", "text": texto},
+        }
+        vectors = {1: _vetor(0), 2: _vetor(15), 3: _vetor(30)}
+
+        duplicates = find_duplicates(chunks, vectors, DedupConfig())
+
+        assert duplicates == {2: 1}
+
+    def test_duplicatas_diretas_colapsam_no_canonico(self):
+        texto = "Certificado de Docker na prática com deploy em produção."
+        chunks = {
+            1: {"source": "CERTIFICADOS-english.md", "text": texto},
+            2: {"source": "CERTIFICADOS.md", "text": texto},
+            3: {"source": "curriculo.pdf", "text": texto},
+        }
+        vectors = {1: _vetor(0), 2: _vetor(1), 3: _vetor(2)}
+
+        duplicates = find_duplicates(chunks, vectors, DedupConfig())
+
+        # Canônico: PT e markdown antes de EN e PDF
+        assert duplicates == {1: 2, 3: 2}
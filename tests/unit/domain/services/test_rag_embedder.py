@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.domain.services.rag_embedder import GeminiEmbedder, QueryEmbeddingCache
+
+
+class _ClienteFalso:
+    """`client.models.embed_content` do SDK: vetor [número do texto, 1.0]; lotes lentos fora de ordem."""
+
+    def __init__(self, falhas_429: int = 0):
+        self.models = self
+        self.lotes = []
+        self.falhas_429 = falhas_429
+        self.em_paralelo = 0
+        self.max_em_paralelo = 0
+        self._lock = threading.Lock()
+
+    def embed_content(self, model, contents, config):
+        with self._lock:
+            self.lotes.append(list(contents))
+            self.em_paralelo += 1
+            self.max_em_paralelo = max(self.max_em_paralelo, self.em_paralelo)
+            falhar = self.falhas_429 > 0
+            self.falhas_429 -= falhar
+        try:
+            if falhar:
+                raise RuntimeError("429 RESOURCE_EXHAUSTED")
+            # O primeiro lote termina por último
+            time.sleep(0.05 if contents[0] == "t0" else 0.01)
+            return SimpleNamespace(embeddings=[SimpleNamespace(values=[float(t[1:]), 1.0]) for t in contents])
+        finally:
+            with self._lock:
+                self.em_paralelo -= 1
+
+
+class TestGeminiEmbedderLotes:
+
+    def test_lotes_em_paralelo_preservam_a_ordem(self):
+        cliente = _ClienteFalso()
+        embedder = GeminiEmbedder(client=cliente, batch_size=3, concurrency=4)
+        textos = [f"t{i}" for i in range(10)]
+
+        matriz = embedder.embed_documents(textos)
+
+        assert matriz[:, 0].tolist() == list(range(10))
+        assert sorted(len(lote) for lote in cliente.lotes) == [1, 3, 3, 3]
+        assert cliente.max_em_paralelo > 1
+
+    def test_batch_size_limitado_ao_maximo_da_api(self):
+        cliente = _ClienteFalso()
+        embedder = GeminiEmbedder(client=cliente, batch_size=500, concurrency=1)
+
+        embedder.embed_documents([f"t{i}" for i in range(150)])
+
+        assert [len(lote) for lote in cliente.lotes] == [100, 50]
+
+    def test_lote_com_rate_limit_e_re_tentado(self):
+        cliente = _ClienteFalso(falhas_429=1)
+        embedder = GeminiEmbedder(client=cliente, batch_size=2, concurrency=1, backoff_base=0.001)
+
+        matriz = embedder.embed_documents(["t0", "t1", "t2"])
+
+        assert matriz[:, 0].tolist() == [0, 1, 2]
+        assert len(cliente.lotes) == 3
+
+
+class TestQueryEmbeddingCacheSingleFlight:
+
+    @pytest.fixture
+    def cache(self):
+        return QueryEmbeddingCache(maxsize=8, ttl=60)
+
+    @pytest.mark.asyncio
+    async def test_cancelar_lider_nao_falha_quem_aguardava(self, cache):
+        chamadas = 0
+        liberar = asyncio.Event()
+
+        async def compute(query):
+            nonlocal chamadas
+            chamadas += 1
+            await liberar.wait()
+            return np.ones(4, dtype="float32")
+
+        lider = asyncio.create_task(cache.get_or_compute("projetos", compute))
+        await asyncio.sleep(0)
+        seguidor = asyncio.create_task(cache.get_or_compute("Projetos", compute))
+        await asyncio.sleep(0)
+
+        lider.cancel()
+        await asyncio.sleep(0)
+        liberar.set()
+
+        vec = await seguidor
+        assert np.array_equal(vec, np.ones(4))
+        assert chamadas == 1
+        with pytest.raises(asyncio.CancelledError):
+            await lider
+        assert cache.stats()["coalesced"] == 1
+
+    @pytest.mark.asyncio
+    async def test_calculo_compartilhado_cancelado_faz_retry(self, cache):
+        chamadas = 0
+
+        async def compute(query):
+            nonlocal chamadas
+            chamadas += 1
+            if chamadas == 1:
+                raise asyncio.CancelledError()
+            return np.full(4, 2.0, dtype="float32")
+
+        vec = await cache.get_or_compute("stack", compute)
+        assert np.array_equal(vec, np.full(4, 2.0))
+        assert chamadas == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelar_lider_do_lote_nao_falha_quem_aguardava(self, cache):
+        liberar = asyncio.Event()
+
+        async def compute_many(queries):
+            await liberar.wait()
+            return np.stack([np.full(4, float(len(q)), dtype="float32") for q in queries])
+
+        lider = asyncio.create_task(cache.get_or_compute_many(["java", "python"], compute_many))
+        await asyncio.sleep(0)
+        seguidor = asyncio.create_task(cache.get_or_compute_many(["python"], compute_many))
+        await asyncio.sleep(0)
+
+        lider.cancel()
+        await asyncio.sleep(0)
+        liberar.set()
+
+        (vec,) = await seguidor
+        assert np.array_equal(vec, np.full(4, 6.0))
+
+    @pytest.mark.asyncio
+    async def test_falha_propaga_e_nao_e_cacheada(self, cache):
+        async def compute(query):
+            raise RuntimeError("quota")
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_compute("x", compute)
+        assert cache.stats()["size"] == 0
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from app.domain.services.rag_chunk_store import ChunkStore
+from app.domain.services.rag_filters import ChunkPartitions, RetrievalFilter, source_kind, source_lang
+
+
+def _meta(source, is_project=False, is_fallback=False, duplicate_of=None):
+    return {
+        "text": source,
+        "source": source,
+        "is_project": is_project,
+        "is_fallback": is_fallback,
+        "chunk_hash": "",
+        "token_count": 1,
+        "duplicate_of": duplicate_of,
+    }
+
+
+CHUNKS = {
+    0: _meta("CURRICULO.md", is_fallback=True),
+    1: _meta("STACKS.md", is_fallback=True),
+    2: _meta("STACKS-english.md", duplicate_of=1),
+    3: _meta("projects/bot.md", is_project=True),
+    4: _meta("projects/bot-english.md", is_project=True),
+    5: _meta("Curriculo_Wesley.pdf"),
+    6: _meta("CERTIFICADOS.md"),
+}
+
+
+@pytest.fixture(params=["dict", "store"])
+def particoes(request, tmp_path):
+    """As partições vindas da metadata em dict (build) e do ChunkStore (servido) têm de bater."""
+    if request.param == "dict":
+        return ChunkPartitions(CHUNKS)
+    ChunkStore.write(tmp_path, CHUNKS, {i: np.zeros(2, dtype="float32") for i in CHUNKS})
+    return ChunkPartitions(ChunkStore.open(tmp_path))
+
+
+class TestClassificacaoDaFonte:
+
+    def test_tipo_e_idioma(self):
+        assert source_kind("projects/bot.md", True, False) == "project"
+        assert source_kind("Curriculo_Wesley.pdf", False, False) == "pdf"
+        assert source_kind("STACKS-english.md", False, False) == "core"
+        assert source_kind("CERTIFICADOS.md", False, False) == "doc"
+        assert source_lang("projects/bot-english.md") == "en"
+        assert source_lang("projects/bot.md") == "pt"
+
+    def test_filtro_invalido(self):
+        with pytest.raises(ValueError):
+            RetrievalFilter.of(kinds={"video"})
+        with pytest.raises(ValueError):
+            RetrievalFilter.of(lang="es")
+
+
+class TestChunkPartitions:
+
+    def test_so_os_tipos_pedidos(self, particoes):
+        assert particoes.ids(RetrievalFilter.of(kinds={"project"})).tolist() == [3, 4]
+        assert particoes.ids(RetrievalFilter.of(kinds={"pdf", "core"})).tolist() == [0, 1, 5]
+
+    def test_so_o_idioma_pedido(self, particoes):
+        assert particoes.ids(RetrievalFilter.of(kinds={"project"}, lang="en")).tolist() == [4]
+        assert particoes.ids(RetrievalFilter.of(kinds={"project"}, lang="pt")).tolist() == [3]
+
+    def test_duplicata_conta_pelo_id_canonico(self, particoes):
+        # STACKS-english.md não está no índice: o filtro "en" alcança o canônico STACKS.md
+        assert particoes.ids(RetrievalFilter.of(kinds={"core"}, lang="en")).tolist() == [1]
+
+    def test_particao_vazia(self, particoes):
+        assert particoes.ids(RetrievalFilter.of(kinds={"pdf"}, lang="en")).tolist() == []
+
+    def test_seletor_faiss_aceita_so_a_particao(self, particoes):
+        seletor = particoes.selector(RetrievalFilter.of(kinds={"project"}))
+
+        assert [i for i in CHUNKS if seletor.is_member(i)] == [3, 4]
@@ -0,0 +1,19 @@
+import pytest
+
+from app.domain.services.rag_embedder import HashingEmbedder
+from app.domain.services.rag_index_engine import ENGINE_L2_SLACK, IndexEngineConfig
+
+
+class TestMaxL2Distance:
+
+    def test_flat_usa_o_threshold_do_embedder(self):
+        embedder = HashingEmbedder(dimension=64, max_l2_distance=0.9)
+        assert IndexEngineConfig(engine="flat").max_l2_distance(embedder.max_l2_distance) == 0.9
+
+    @pytest.mark.parametrize("engine", ["ivf_sq8", "ivf_pq"])
+    def test_engines_quantizadas_somam_folga(self, engine):
+        assert IndexEngineConfig(engine=engine).max_l2_distance(1.0) == pytest.approx(1.0 + ENGINE_L2_SLACK[engine])
+
+    def test_storage_sq8_recebe_folga_do_ivf_sq8(self):
+        config = IndexEngineConfig(engine="hnsw", storage="sq8")
+        assert config.max_l2_distance(1.0) == pytest.approx(1.0 + ENGINE_L2_SLACK["ivf_sq8"])
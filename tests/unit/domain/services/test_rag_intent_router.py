@@ -0,0 +1,70 @@
+from app.domain.services.rag_embedder import HashingEmbedder
+from app.domain.services.rag_intent_router import INTENT_EXAMPLES, IntentCentroids, classify_message, keyword_intent
+
+
+class _EmbedderPorTask(HashingEmbedder):
+    """HashingEmbedder que registra por qual caminho (documento/query) os textos passaram."""
+
+    def __init__(self):
+        super().__init__(dimension=64)
+        self.documentos = 0
+        self.queries = 0
+
+    def embed_documents(self, texts):
+        self.documentos += len(texts)
+        return super().embed_documents(texts)
+
+    def embed_queries_sync(self, texts):
+        self.queries += len(texts)
+        return HashingEmbedder.embed_documents(self, texts)
+
+
+class TestIntentCentroidsBuild:
+
+    def test_exemplos_sao_embedados_como_query(self):
+        embedder = _EmbedderPorTask()
+
+        centroids = IntentCentroids.build(embedder)
+
+        assert embedder.queries == sum(len(v) for v in INTENT_EXAMPLES.values())
+        assert embedder.documentos == 0
+        assert set(centroids.names) == set(INTENT_EXAMPLES)
+
+
+class TestClassifyMessage:
+
+    def test_pedido_de_curriculo_para_vaga(self):
+        intencao = classify_message("Adapte o currículo dele para esta vaga, em inglês")
+
+        assert intencao.tailored_resume
+        assert intencao.intent == "resume_tailoring"
+        assert intencao.document_lang == "en"
+
+    def test_vaga_colada_sem_pedido_explicito(self):
+        vaga = "Sobre a vaga: " + "desenvolvimento backend com Java e Spring. " * 12 + "Requisitos: Docker."
+
+        assert classify_message(vaga).intent == "resume_tailoring"
+
+    def test_listagem_e_envio_de_documento(self):
+        listagem = classify_message("Quais certificados ele tem?")
+        envio = classify_message("me manda o currículo")
+
+        assert listagem.certificate_listing and listagem.intent == "document_request"
+        assert envio.send_request and envio.intent == "document_request"
+        assert classify_message("me manda os projetos dele").intent != "document_request"
+
+    def test_identidade(self):
+        assert classify_message("Qual seu nome?").identity == "assistant_name"
+        assert classify_message("qual o nome completo dele?").identity == "full_name"
+        assert classify_message("Quem é o Wesley?").identity == "wesley_name"
+        assert classify_message("Quem é o Wesley?").intent == "identity"
+
+    def test_formato_da_resposta(self):
+        assert classify_message("me manda em áudio").wants_audio
+        assert classify_message("gera uma tabela dos projetos").wants_spreadsheet
+        assert not classify_message("o que tem na tabela periódica?").wants_spreadsheet
+
+    def test_keywords_do_rag_continuam(self):
+        assert keyword_intent("quais projetos ele fez?") == "project_listing"
+        assert keyword_intent("qual a stack dele?") == "stack"
+        assert keyword_intent("me conta uma curiosidade") is None
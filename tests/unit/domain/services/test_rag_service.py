@@ -0,0 +1,422 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from app.domain.services.rag_embedder import HashingEmbedder
+from app.domain.services.rag_filters import RetrievalFilter
+from app.domain.services.rag_service import PortfolioRAG, ProjectDetector
+from app.infrastructure.config.settings import settings
+
+
+class _EmbedderContado(HashingEmbedder):
+    """HashingEmbedder que conta as queries e registra os textos embedados no build."""
+
+    def __init__(self):
+        super().__init__(dimension=64)
+        self.queries_embedadas = 0
+        self.documentos_embedados = []
+
+    def embed_documents(self, texts):
+        self.documentos_embedados.extend(texts)
+        return super().embed_documents(texts)
+
+    async def embed_query(self, text):
+        self.queries_embedadas += 1
+        return await super().embed_query(text)
+
+    async def embed_queries(self, texts):
+        self.queries_embedadas += len(texts)
+        return await super().embed_queries(texts)
+
+
+@pytest.fixture
+def rag(tmp_path):
+    conteudo = tmp_path / "docs" / "portfolio-content"
+    (conteudo / "projects").mkdir(parents=True)
+    (conteudo / "CURRICULO.md").write_text(
+        "# Currículo\n\nDesenvolvedor backend com experiência em Java e Python.\n", encoding="utf-8"
+    )
+    (conteudo / "STACKS.md").write_text("# Stacks\n\nJava, Spring Boot, Angular, Python.\n", encoding="utf-8")
+    # Tradução com o mesmo texto: colapsa no STACKS.md (canônico PT) como duplicata EN
+    (conteudo / "STACKS-english.md").write_text("# Stacks\n\nJava, Spring Boot, Angular, Python.\n", encoding="utf-8")
+    (conteudo / "projects" / "bot.md").write_text(
+        "# Bot\n\nAssistente de WhatsApp com RAG e FastAPI.\n", encoding="utf-8"
+    )
+    (conteudo / "CERTIFICADOS.md").write_text(
+        "# Certificados\n\nCurso de Docker na prática pela FULLCYCLE, com deploy em produção.\n", encoding="utf-8"
+    )
+    # Corpus com volume suficiente para o IDF de um termo raro passar de rag_lexical_strong_min_idf
+    for i in range(30):
+        (conteudo / "projects" / f"projeto_{i}.md").write_text(
+            f"# Projeto {i}\n\nSistema web número {i} com API REST, banco relacional e testes.\n", encoding="utf-8"
+        )
+    embedder = _EmbedderContado()
+    rag = PortfolioRAG(str(conteudo), embedder=embedder, index_dir=str(tmp_path / "rag_index"))
+    rag.load()
+    rag.reindex()
+    assert rag.is_ready and rag._snapshot.intents is not None
+    embedder.documentos_embedados.clear()
+    return rag
+
+
+def _avancar_mtime(path):
+    """mtime 1s adiante: o relógio do filesystem pode não andar entre duas escritas seguidas."""
+    mtime_ns = path.stat().st_mtime_ns + 1_000_000_000
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def _ids_da_fonte(rag, source):
+    return rag._snapshot.manifest["files"][source]["ids"]
+
+
+def _ids_no_faiss(rag):
+    """IDs que o índice FAISS devolve numa busca exaustiva."""
+    _, ids = rag.index.search(np.zeros((1, rag.embedder.dimension), dtype="float32"), rag.index.ntotal)
+    return set(ids[0].tolist()) - {-1}
+
+
+class TestPdfTextCacheDir:
+
+    def test_cache_fica_no_diretorio_do_indice(self, tmp_path):
+        rag = PortfolioRAG(str(tmp_path / "conteudo"), embedder=HashingEmbedder(dimension=8), index_dir=str(tmp_path / "idx"))
+
+        assert rag.pdf_cache.cache_dir == tmp_path / "idx" / "pdf_text_cache"
+
+    def test_diretorio_configurado(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "rag_pdf_cache_dir", str(tmp_path / "pdfs"))
+        rag = PortfolioRAG(str(tmp_path / "conteudo"), embedder=HashingEmbedder(dimension=8), index_dir=str(tmp_path / "idx"))
+
+        assert rag.pdf_cache.cache_dir == tmp_path / "pdfs"
+
+
+class TestReindexIncremental:
+
+    def test_sem_mudanca_nao_publica_nem_embeda(self, rag):
+        versao = rag._snapshot.version
+
+        assert not rag.reindex()
+
+        assert rag._snapshot.version == versao
+        assert rag.embedder.documentos_embedados == []
+
+    def test_arquivo_alterado_re_embeda_so_ele(self, rag):
+        bot = rag.data_dir / "projects" / "bot.md"
+        ids_bot = _ids_da_fonte(rag, "projects/bot.md")
+        ids_curriculo = _ids_da_fonte(rag, "CURRICULO.md")
+        vetores_antes = rag._snapshot.chunks.vector_map()
+
+        bot.write_text("# Bot\n\nAssistente de WhatsApp com RAG, FastAPI e PostgreSQL.\n", encoding="utf-8")
+        assert rag.reindex()
+
+        novos = [rag.chunks_metadata[i]["text"] for i in _ids_da_fonte(rag, "projects/bot.md")]
+        assert rag.embedder.documentos_embedados == novos
+        assert all("PostgreSQL" in texto for texto in rag.embedder.documentos_embedados)
+        # Chunks dos arquivos inalterados mantêm IDs e vetores
+        assert _ids_da_fonte(rag, "CURRICULO.md") == ids_curriculo
+        vetores_depois = rag._snapshot.chunks.vector_map()
+        for chunk_id in ids_curriculo:
+            assert np.array_equal(vetores_depois[chunk_id], vetores_antes[chunk_id])
+        # IDs antigos saem do store e do FAISS
+        assert not set(ids_bot) & set(rag.chunks_metadata)
+        assert not set(ids_bot) & _ids_no_faiss(rag)
+        assert set(_ids_da_fonte(rag, "projects/bot.md")) <= _ids_no_faiss(rag)
+
+    def test_arquivo_removido_sai_do_indice(self, rag):
+        ids_bot = _ids_da_fonte(rag, "projects/bot.md")
+        total = rag.index.ntotal
+
+        (rag.data_dir / "projects" / "bot.md").unlink()
+        assert rag.reindex()
+
+        assert "projects/bot.md" not in rag._snapshot.manifest["files"]
+        assert not set(ids_bot) & set(rag.chunks_metadata)
+        assert not set(ids_bot) & _ids_no_faiss(rag)
+        assert rag.index.ntotal == total - len(ids_bot)
+        assert rag.embedder.documentos_embedados == []
+
+    def test_chunk_com_texto_igual_reaproveita_o_vetor(self, rag):
+        """Arquivo com sha novo, mas chunk de texto idêntico: o vetor vem do store, não do embedder."""
+        bot = rag.data_dir / "projects" / "bot.md"
+        ids_bot = _ids_da_fonte(rag, "projects/bot.md")
+        vetor = rag._snapshot.chunks.vector_map()[ids_bot[0]]
+        # Conteúdo diferente só em comentário HTML: o sha do arquivo muda, o texto do chunk não
+        bot.write_text(bot.read_text(encoding="utf-8") + "<!-- revisado -->\n", encoding="utf-8")
+
+        assert rag.reindex()
+
+        (novo_id,) = _ids_da_fonte(rag, "projects/bot.md")
+        assert novo_id not in ids_bot
+        assert np.array_equal(rag._snapshot.chunks.vector_map()[novo_id], vetor)
+        assert rag.embedder.documentos_embedados == []
+
+
+class TestHotSwap:
+
+    @pytest.mark.asyncio
+    async def test_retrieve_em_andamento_termina_no_snapshot_antigo(self, rag, monkeypatch):
+        monkeypatch.setattr(settings, "rag_hybrid_enabled", False)  # força o await no embedder
+        embedando = asyncio.Event()
+        liberar = asyncio.Event()
+        embed_queries = rag.embedder.embed_queries
+
+        async def embed_lento(texts):
+            embedando.set()
+            await liberar.wait()
+            return await embed_queries(texts)
+
+        monkeypatch.setattr(rag.embedder, "embed_queries", embed_lento)
+        versao_antiga = rag._snapshot.version
+        trace = {}
+        task = asyncio.create_task(rag.retrieve("assistente de whatsapp com RAG", top_k=3, trace=trace))
+        await embedando.wait()
+
+        (rag.data_dir / "projects" / "bot.md").write_text(
+            "# Bot\n\nAssistente de Telegram com RAG e FastAPI.\n", encoding="utf-8"
+        )
+        assert rag.reindex()
+        assert rag._snapshot.version != versao_antiga
+        liberar.set()
+        contexto = await task
+
+        assert "Assistente de WhatsApp" in contexto
+        assert "Telegram" not in contexto
+        assert "Telegram" in await rag.retrieve("assistente de telegram com RAG", top_k=3)
+
+
+class TestRetrieveHibrido:
+
+    @pytest.mark.asyncio
+    async def test_hit_lexico_forte_responde_sem_embedding(self, rag):
+        trace = {}
+        contexto = await rag.retrieve("Docker FULLCYCLE", top_k=3, trace=trace)
+
+        assert "FULLCYCLE" in contexto
+        assert trace["mode"] == "lexical"
+        assert trace["sources"][0] == "CERTIFICADOS.md"
+        assert rag.embedder.queries_embedadas == 0
+        assert rag.retrieval_stats()["lexical"] == 1
+
+    @pytest.mark.asyncio
+    async def test_termos_comuns_vao_para_o_hibrido(self, rag):
+        trace = {}
+        await rag.retrieve("sistema web com API REST", top_k=3, trace=trace)
+
+        assert trace["mode"] == "hybrid"
+        assert rag.embedder.queries_embedadas == 1
+
+    @pytest.mark.asyncio
+    async def test_sem_hibrido_sempre_embeda(self, rag, monkeypatch):
+        monkeypatch.setattr(settings, "rag_hybrid_enabled", False)
+        trace = {}
+        await rag.retrieve("Docker FULLCYCLE", top_k=3, trace=trace)
+
+        assert trace["mode"] == "vector"
+        assert rag.embedder.queries_embedadas == 1
+
+
+class TestRetrieveFiltrado:
+
+    @pytest.mark.asyncio
+    async def test_so_fontes_do_tipo_pedido(self, rag):
+        query = "sistema web com API REST, Java e Python"
+        sem_filtro, filtrado = {}, {}
+        await rag.retrieve(query, top_k=5, trace=sem_filtro)
+        await rag.retrieve(query, top_k=5, filters=RetrievalFilter.of(kinds={"project"}), trace=filtrado)
+
+        assert not all(source.startswith("projects/") for source in sem_filtro["sources"])
+        assert filtrado["mode"] != "fallback"
+        assert all(source.startswith("projects/") for source in filtrado["sources"])
+
+    @pytest.mark.asyncio
+    async def test_filtro_de_idioma_serve_a_duplicata_no_idioma(self, rag):
+        trace = {}
+        filtro = RetrievalFilter.of(kinds={"core"}, lang="en")
+        await rag.retrieve("Java Spring Boot Angular", top_k=3, filters=filtro, trace=trace)
+
+        assert trace["sources"] == ["STACKS-english.md"]
+
+    @pytest.mark.asyncio
+    async def test_particao_vazia_busca_sem_filtro(self, rag):
+        trace = {}
+        filtro = RetrievalFilter.of(kinds={"pdf"})  # nenhum PDF no corpus
+        contexto = await rag.retrieve("Docker FULLCYCLE", top_k=3, filters=filtro, trace=trace)
+
+        assert "FULLCYCLE" in contexto
+        assert trace["mode"] != "fallback"
+
+
+class TestBuscaHierarquica:
+
+    QUERIES = [
+        "Assistente de WhatsApp com RAG e FastAPI",
+        "curso de Docker com deploy em produção",
+        "desenvolvedor backend Java e Python",
+        "sistema web número 17 com API REST",
+    ]
+
+    @pytest.mark.asyncio
+    async def test_com_todos_os_documentos_e_igual_a_busca_plana(self, rag, monkeypatch):
+        snapshot = rag._snapshot
+        monkeypatch.setattr(settings, "rag_hierarchical_top_docs", len(snapshot.documents))
+        vecs = await rag.embedder.embed_queries(self.QUERIES)
+
+        plana = rag._vector_search(snapshot, vecs, 9)
+        hierarquica = [rag._hierarchical_search(snapshot, vec, 9) for vec in vecs]
+
+        assert hierarquica == plana
+
+    @pytest.mark.asyncio
+    async def test_retrieve_em_dois_estagios_responde_como_o_plano(self, rag, monkeypatch):
+        planos = [await rag.retrieve(query, top_k=3) for query in self.QUERIES]
+        monkeypatch.setattr(settings, "rag_hierarchical_enabled", True)
+        assert rag._usa_hierarquico(rag._snapshot)
+
+        hierarquicos = [await rag.retrieve(query, top_k=3) for query in self.QUERIES]
+
+        assert hierarquicos == planos
+
+    @pytest.mark.asyncio
+    async def test_filtro_restringe_os_documentos_do_primeiro_estagio(self, rag):
+        vec = await rag.embedder.embed_query("sistema web com API REST, Java e Python")
+
+        ids = rag._hierarchical_search(rag._snapshot, vec, 5, RetrievalFilter.of(kinds={"project"}))
+
+        assert ids
+        assert all(rag.chunks_metadata[i]["source"].startswith("projects/") for i in ids)
+
+
+class TestRetrieveMany:
+
+    QUERIES = [
+        "Docker FULLCYCLE",  # resolve pelo BM25
+        "Assistente de WhatsApp com RAG",
+        "o que ele sabe fazer de bom?",
+        "What is his stack with Java and Spring Boot?",
+        "Assistente de WhatsApp com RAG",  # repetida na mesma rodada
+    ]
+
+    @pytest.mark.asyncio
+    async def test_igual_a_n_chamadas_de_retrieve(self, rag):
+        traces_lote = [{} for _ in self.QUERIES]
+        lote = await rag.retrieve_many(self.QUERIES, top_k=3, traces=traces_lote)
+        rag.query_cache.clear()
+
+        traces_um_a_um = [{} for _ in self.QUERIES]
+        um_a_um = [await rag.retrieve(q, top_k=3, trace=t) for q, t in zip(self.QUERIES, traces_um_a_um)]
+
+        assert lote == um_a_um
+        assert traces_lote == traces_um_a_um
+
+    @pytest.mark.asyncio
+    async def test_um_lote_de_embeddings_so_com_o_que_nao_resolveu_no_lexico(self, rag, monkeypatch):
+        lotes = []
+        embed_queries = rag.embedder.embed_queries
+
+        async def registrar(texts):
+            lotes.append(list(texts))
+            return await embed_queries(texts)
+
+        monkeypatch.setattr(rag.embedder, "embed_queries", registrar)
+
+        traces = [{} for _ in self.QUERIES]
+        await rag.retrieve_many(self.QUERIES, top_k=3, traces=traces)
+
+        nao_lexicas = {q for q, t in zip(self.QUERIES, traces) if t["mode"] != "lexical"}
+        assert "Docker FULLCYCLE" not in nao_lexicas and nao_lexicas
+        assert len(lotes) == 1
+        assert sorted(lotes[0]) == sorted(nao_lexicas)
+
+    @pytest.mark.asyncio
+    async def test_lista_vazia(self, rag):
+        assert await rag.retrieve_many([]) == []
+
+
+class TestRouteIntent:
+
+    @pytest.mark.asyncio
+    async def test_hit_lexico_forte_nao_chama_o_embedder(self, rag):
+        trace = {}
+        contexto = await rag.retrieve_smart("FULLCYCLE", trace=trace)
+
+        assert "FULLCYCLE" in contexto
+        assert trace["intent_origin"] == "lexical"
+        assert trace["mode"] == "lexical"
+        assert rag.embedder.queries_embedadas == 0
+
+    @pytest.mark.asyncio
+    async def test_sem_hit_forte_roteia_por_embedding(self, rag):
+        trace = {}
+        await rag.retrieve_smart("o que ele sabe fazer de bom?", trace=trace)
+
+        assert trace["intent_origin"] in ("embedding", "default")
+        assert rag.embedder.queries_embedadas >= 1
+
+
+class TestIdiomaDoContexto:
+
+    @pytest.mark.asyncio
+    async def test_pergunta_em_ingles_recebe_a_duplicata_em_ingles(self, rag):
+        trace = {}
+        await rag.retrieve("What is his stack with Java and Spring Boot?", top_k=3, trace=trace)
+
+        assert "STACKS-english.md" in trace["sources"]
+        assert "STACKS.md" not in trace["sources"]
+
+    @pytest.mark.asyncio
+    async def test_pergunta_em_portugues_recebe_o_canonico(self, rag):
+        trace = {}
+        await rag.retrieve("Qual é a stack dele com Java e Spring Boot?", top_k=3, trace=trace)
+
+        assert "STACKS.md" in trace["sources"]
+        assert "STACKS-english.md" not in trace["sources"]
+
+
+class TestProjectDetector:
+
+    @pytest.fixture
+    def projetos(self, tmp_path):
+        projetos = tmp_path / "projects"
+        projetos.mkdir()
+        # "aaa-matchmaker" vem antes na ordem do catálogo e casa "matchmaking" só por fuzzy
+        (projetos / "aaa-matchmaker.md").write_text("# Matchmaker\n", encoding="utf-8")
+        (projetos / "lol-matchmaking-fazenda.md").write_text("# LoL Matchmaking\n", encoding="utf-8")
+        (projetos / "lol-matchmaking-fazenda-english.md").write_text("# LoL Matchmaking EN\n", encoding="utf-8")
+        return projetos
+
+    def test_exato_vence_fuzzy_anterior_no_catalogo(self, projetos):
+        detector = ProjectDetector(projetos)
+
+        assert "Projeto: lol-matchmaking-fazenda" in detector.detect("me fala do matchmaking")
+
+    def test_fuzzy_quando_nao_ha_exato(self, projetos):
+        detector = ProjectDetector(projetos)
+
+        assert "Projeto: lol-matchmaking-fazenda" in detector.detect("e aquele da fazneda")
+        assert detector.detect("quais tecnologias ele usa?") is None
+
+    def test_variante_em_ingles_nao_entra_no_catalogo(self, projetos):
+        detector = ProjectDetector(projetos)
+        detector.load()
+
+        assert "lol-matchmaking-fazenda-english" not in detector._cache
+
+    def test_projeto_novo_entra_quando_o_diretorio_muda(self, projetos):
+        detector = ProjectDetector(projetos)
+        assert detector.detect("e o kanban?") is None
+
+        (projetos / "kanban-board.md").write_text("# Kanban\n", encoding="utf-8")
+        _avancar_mtime(projetos)
+
+        assert "# Kanban" in detector.detect("e o kanban?")
+
+    def test_conteudo_relido_quando_o_arquivo_muda(self, projetos):
+        detector = ProjectDetector(projetos)
+        assert "# LoL Matchmaking\n" in detector.detect("matchmaking")
+
+        arquivo = projetos / "lol-matchmaking-fazenda.md"
+        arquivo.write_text("# LoL Matchmaking v2\n", encoding="utf-8")
+        _avancar_mtime(arquivo)
+
+        assert "v2" in detector.detect("matchmaking")
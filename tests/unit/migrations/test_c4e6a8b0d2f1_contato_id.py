@@ -0,0 +1,166 @@
+import importlib.util
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+import sqlalchemy as sa
+
+from app.application.services.message_unit_of_work import normalizar_contato_id
+from app.domain.entities.models import Mensagem
+
+MIGRATION = Path(__file__).resolve().parents[3] / "alembic" / "versions" / "c4e6a8b0d2f1_add_contato_id_to_bot_clientes.py"
+
+NUMERO = "5511999999999"
+
+
+def _carregar_migration():
+    spec = importlib.util.spec_from_file_location("c4e6a8b0d2f1", MIGRATION)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+migration = _carregar_migration()
+
+
+def _split_part(texto, delimitador, n):
+    partes = texto.split(delimitador)
+    return partes[n - 1] if n <= len(partes) else ""
+
+
+def _regexp_replace(texto, padrao, substituto, flags=""):
+    return re.sub(padrao, substituto, texto, count=0 if "g" in flags else 1)
+
+
+def _funcoes_do_postgres(dbapi_connection, _):
+    """As funções de string do Postgres usadas no CONTATO_ID_SQL, com a mesma semântica."""
+    dbapi_connection.create_function("split_part", 3, _split_part)
+    dbapi_connection.create_function("regexp_replace", 4, _regexp_replace)
+    dbapi_connection.create_function("btrim", 1, lambda texto: texto.strip(" "))
+
+
+@pytest.fixture
+def banco(tmp_path):
+    """SQLite com o schema de antes da migration: bot_clientes ainda sem contato_id."""
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'migration.db'}")
+    sa.event.listen(engine, "connect", _funcoes_do_postgres)
+    metadata = sa.MetaData()
+    clientes = sa.Table(
+        "bot_clientes",
+        metadata,
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("whatsapp_id", sa.String(50), unique=True, nullable=False),
+        sa.Column("nome", sa.String(100)),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("oculta", sa.Boolean, nullable=False, server_default="0"),
+    )
+    Mensagem.__table__.to_metadata(metadata)
+    metadata.create_all(engine)
+    yield engine, clientes, metadata.tables["bot_mensagens"]
+    engine.dispose()
+
+
+def _migrar(conn) -> None:
+    """Os passos de dados do upgrade(); o NOT NULL e o índice único vêm depois, como lá."""
+    conn.exec_driver_sql("ALTER TABLE bot_clientes ADD COLUMN contato_id VARCHAR(50)")
+    for sql in migration.MERGE_SQL:
+        conn.exec_driver_sql(sql)
+    conn.exec_driver_sql("CREATE UNIQUE INDEX ix_bot_clientes_contato_id ON bot_clientes (contato_id)")
+
+
+def _semear(conn, clientes, mensagens, linhas) -> None:
+    """Cada linha: (id, whatsapp_id, nome, oculta); created_at em ordem, e duas mensagens por cliente."""
+    inicio = datetime(2026, 1, 1)
+    for pos, (cliente_id, whatsapp_id, nome, oculta) in enumerate(linhas):
+        conn.execute(
+            clientes.insert().values(
+                id=cliente_id, whatsapp_id=whatsapp_id, nome=nome, oculta=oculta, created_at=inicio + timedelta(days=pos)
+            )
+        )
+        for n in range(2):
+            conn.execute(
+                mensagens.insert().values(
+                    id=f"{cliente_id}-{n}",
+                    id_cliente=cliente_id,
+                    texto=f"{whatsapp_id} #{n}",
+                    mensagem_id_whatsapp=f"wa-{cliente_id}-{n}",
+                    direcao="RECEBIDA",
+                    data_hora=inicio + timedelta(days=pos, minutes=n),
+                )
+            )
+
+
+class TestMergeDeContatos:
+
+    def test_variantes_do_jid_viram_um_cliente_com_todo_o_historico(self, banco):
+        engine, clientes, mensagens = banco
+        with engine.begin() as conn:
+            _semear(
+                conn,
+                clientes,
+                mensagens,
+                [
+                    ("c-numero", NUMERO, None, True),
+                    ("c-jid", f"{NUMERO}@s.whatsapp.net", "Maria", False),
+                    ("c-lid", f"{NUMERO}@lid", "Maria Silva", True),
+                    ("c-outro", "5521888888888@s.whatsapp.net", "João", False),
+                ],
+            )
+            _migrar(conn)
+
+            restantes = conn.execute(
+                sa.text("SELECT id, contato_id, nome, oculta FROM bot_clientes ORDER BY contato_id")
+            ).all()
+            por_cliente = dict(
+                conn.execute(sa.text("SELECT id_cliente, count(*) FROM bot_mensagens GROUP BY id_cliente")).all()
+            )
+
+        # O mais antigo sobrevive; nome do mais recente com nome; visível porque nem todos estavam ocultos
+        assert restantes == [
+            ("c-numero", NUMERO, "Maria Silva", False),
+            ("c-outro", "5521888888888", "João", False),
+        ]
+        assert por_cliente == {"c-numero": 6, "c-outro": 2}
+
+    def test_contato_oculto_em_todas_as_linhas_continua_oculto(self, banco):
+        engine, clientes, mensagens = banco
+        with engine.begin() as conn:
+            _semear(
+                conn,
+                clientes,
+                mensagens,
+                [("c-numero", NUMERO, "Maria", True), ("c-jid", f"{NUMERO}@s.whatsapp.net", None, True)],
+            )
+            _migrar(conn)
+
+            restantes = conn.execute(sa.text("SELECT id, nome, oculta FROM bot_clientes")).all()
+
+        assert restantes == [("c-numero", "Maria", True)]
+
+
+class TestContatoIdSql:
+
+    @pytest.mark.parametrize(
+        "whatsapp_id",
+        [
+            NUMERO,
+            f"{NUMERO}@s.whatsapp.net",
+            f"{NUMERO}@lid",
+            f"{NUMERO}:12@s.whatsapp.net",
+            "120363025246125486@g.us",
+            "+55 (11) 99999-9999",
+            "status@broadcast",
+            " contato sem numero @s.whatsapp.net",
+            "",
+        ],
+    )
+    def test_mesma_regra_de_normalizar_contato_id(self, banco, whatsapp_id):
+        engine, _, _ = banco
+        with engine.connect() as conn:
+            via_sql = conn.execute(
+                sa.text(f"SELECT {migration.CONTATO_ID_SQL} FROM (SELECT :whatsapp_id AS whatsapp_id)"),
+                {"whatsapp_id": whatsapp_id},
+            ).scalar_one()
+
+        assert via_sql == normalizar_contato_id(whatsapp_id)